@@ -26,6 +26,8 @@
         'views/project_list_view_inherit.xml',
         'views/create_project_wizard_view.xml',
         'views/purchase_order_view.xml',
+        'views/sync_queue_views.xml',
+        'data/ir_cron.xml',
        
         
         
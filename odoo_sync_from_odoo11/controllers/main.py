@@ -1,7 +1,14 @@
-from odoo import http, SUPERUSER_ID
+from odoo import http, api, SUPERUSER_ID
+from odoo.exceptions import AccessError
 from odoo.http import request
+from odoo.service.model import PG_CONCURRENCY_EXCEPTIONS_TO_RETRY
+from ..tools.payload_archive import archive_payload
+from ..tools.payload_schema import validate_payload, invalid_result
+from ..tools.stream_payload import spool_body, read_header, iter_line_chunks
+from ..tools.sync_metrics import CallProbe, metrics_buffer
 import logging
 import json
+import random
 
 _logger = logging.getLogger(__name__)
 
@@ -9,331 +16,245 @@ class OdooSyncController(http.Controller):
 
     @http.route('/odoo_sync/sale_order', type='json', auth='public', csrf=False, methods=['POST'])
     def receive_sale_order(self, **post):
-        try:
-            # Récupération du payload JSON
-            raw_data = request.httprequest.data.decode('utf-8')
-            data = json.loads(raw_data) if raw_data else {}
-            _logger.info("SaleOrder reçu : %s", json.dumps(data, indent=2))
-
-            # Vérif partner_id
-            if not data.get("partner_id"):
-                return {"status": "error", "message": "partner_id manquant dans la requête"}
-
-            # Client
-            partner_id, partner_name = data['partner_id']
-            partner = request.env['res.partner'].sudo().search([('id', '=', partner_id)], limit=1)
-            if not partner:
-                partner = request.env['res.partner'].sudo().create({'name': partner_name})
-                _logger.info("Client créé : %s", partner.name)
-
-            # Entrepôt
-            warehouse = False
-            if data.get('warehouse_id'):
-                warehouse_id, warehouse_name = data['warehouse_id']
-                warehouse = request.env['stock.warehouse'].sudo().search([('id', '=', warehouse_id)], limit=1)
-                if not warehouse:
-                    warehouse = request.env['stock.warehouse'].sudo().create({
-                        'name': warehouse_name,
-                        'code': warehouse_name[:5].upper(),
-                    })
-                    _logger.info("Entrepôt créé : %s", warehouse.name)
-
-            # Utilisateur
-            user = None
-            if data.get('user_id'):
-                user_id, user_name = data['user_id']
-                user = request.env['res.users'].sudo().search([('id', '=', user_id)], limit=1)
-            if not user:
-                user = request.env['res.users'].sudo().browse(SUPERUSER_ID)
-                _logger.warning("Utilisateur non trouvé, utilisation admin : %s", user.login)
-
-            # Vérifier si le SaleOrder existe déjà (évite les doublons)
-            sale_order = request.env['sale.order'].sudo().search([('name', '=', data['name'])], limit=1)
-            if sale_order:
-                _logger.info("SaleOrder %s déjà existant, aucun doublon créé.", data['name'])
-                return {"status": "success", "sale_order_id": sale_order.id}
-
-            # Création du SaleOrder
-            sale_order_vals = {
-                'name': data['name'],
-                'partner_id': partner.id,
-                'user_id': user.id,
-                'amount_total': data.get('amount_total', 0),
-                'warehouse_id': warehouse.id if warehouse else False,
-                'project_name': data.get('project', False),
-            }
-            sale_order = request.env['sale.order'].sudo().create(sale_order_vals)
-            _logger.info("SaleOrder créé localement : %s", sale_order.name)
-
-            # Création des lignes de commande
-            for line in data.get('order_lines_data', []):
-                # Toujours créer le produit
-                product_id, product_name = line['product_id']
-                product = request.env['product.product'].sudo().create({
-                    'name': product_name,
-                    'list_price': line.get('price_unit', 0),
-                })
-                _logger.info("Produit créé : %s", product.name)
-
-                # Ligne de commande
-                line_vals = {
-                    'order_id': sale_order.id,
-                    'product_id': product.id,
-                    'product_uom_qty': line.get('product_uom_qty', 1),
-                    'price_unit': line.get('price_unit', 0),
-                    'name': line.get('name', 'Produit inconnu'),
-                    'tax_id': line.get('taxes_id', []),
-                }
-                request.env['sale.order.line'].sudo().create(line_vals)
-
-            return {"status": "success", "sale_order_id": sale_order.id}
+        return self._receive('sale_order', 'SaleOrder', self._handle_sale_order)
 
-        except Exception as e:
-            _logger.exception("Erreur reception SaleOrder : %s", e)
-            return {"status": "error", "message": str(e)}
+    @http.route('/odoo_sync/sale_order/batch', type='json', auth='public', csrf=False, methods=['POST'])
+    def receive_sale_order_batch(self, **post):
+        """Reçoit un lot de SaleOrder : {"orders": [{...}, {...}]}"""
+        return self._receive('sale_order_batch', 'lot SaleOrder', self._handle_sale_order_batch)
 
     @http.route('/odoo_sync/account_invoice', type='json', auth='user', csrf=False, methods=['POST'])
     def receive_account_invoice(self, **post):
-        try:
-            raw_data = request.httprequest.data.decode('utf-8')
-            data = json.loads(raw_data) if raw_data else {}
-            _logger.info("AccountInvoice reçu : %s", json.dumps(data, indent=2))
-
-            # Vérif partenaire
-            if not data.get("partner_id"):
-                return {"status": "error", "message": "partner_id manquant dans la requête"}
-
-            partner = request.env['res.partner'].sudo().search([('id', '=', data['partner_id'][0])], limit=1)
-            if not partner:
-                partner = request.env['res.partner'].sudo().create({'name': data['partner_id'][1]})
-                _logger.info("Client créé : %s", partner.name)
-
-            # Utilisateur
-            user = False
-            if data.get('user_id'):
-                user = request.env['res.users'].sudo().search([('id', '=', data['user_id'][0])], limit=1)
-            if not user:
-                user = request.env['res.users'].sudo().browse(SUPERUSER_ID)
-                _logger.warning("Utilisateur non trouvé, utilisation admin : %s", user.login)
-
-            # Création de la facture
-            invoice_vals = {
-                'move_type': 'out_invoice',
-                'partner_id': partner.id,
-                'invoice_date': data.get('date_invoice', None),
-                'invoice_origin': data.get('origin', ''),
-                'amount_total': data.get('amount_total', 0),
-            }
-            invoice = request.env['account.move'].sudo().create(invoice_vals)
-            _logger.info("AccountInvoice créé localement : %s", invoice.name)
-
-            return {"status": "success", "invoice_id": invoice.id}
+        return self._receive('account_invoice', 'AccountInvoice', self._handle_account_invoice)
+
+    @http.route('/odoo_sync/account_invoice/batch', type='json', auth='user', csrf=False, methods=['POST'])
+    def receive_account_invoice_batch(self, **post):
+        """Reçoit un lot d'AccountInvoice : {"invoices": [{...}, {...}]}"""
+        return self._receive('account_invoice_batch', 'lot AccountInvoice', self._handle_account_invoice_batch)
 
-        except Exception as e:
-            _logger.exception("Erreur reception AccountInvoice : %s", e)
-            return {"status": "error", "message": str(e)}
-        
     @http.route('/odoo_sync/purchase_order', type='json', auth='public', csrf=False, methods=['POST'])
     def receive_purchase_data(self, **post):
+        return self._receive('purchase_order', 'PurchaseOrder', self._handle_purchase_order)
+
+    @http.route('/odoo_sync/purchase_order/stream', type='http', auth='public', csrf=False, methods=['POST'])
+    def receive_purchase_stream(self, **post):
+        """PurchaseOrder volumineux : corps JSON brut, éventuellement compressé (Content-Encoding
+        gzip ou deflate), dont les lignes sont lues et créées par blocs.
+
+        Toujours traité immédiatement : la file d'attente conserverait le payload entier.
+        """
+        result = self._receive('purchase_order_stream', 'PurchaseOrder', self._handle_purchase_order, streamed=True)
+        return request.make_json_response(result)
+
+    @http.route('/odoo_sync/metrics', type='json', auth='user', methods=['POST'])
+    def sync_metrics(self, hours=24, **post):
+        """Durées, requêtes SQL et créations par route sur les dernières heures (p50/p95/p99)"""
+        if not request.env.user.has_group('base.group_system'):
+            raise AccessError("Réservé aux administrateurs")
+        self._flush_metrics(force=True)
+        return request.env['odoo.sync.metric'].sudo()._get_stats(int(hours))
+
+    def _handle_sale_order(self, data):
+        if self._is_async():
+            return self._enqueue('sale_order', [data])
+        return self._processor()._process_sale_orders([data])[0]
+
+    def _handle_sale_order_batch(self, data):
+        orders = data.get('orders') or []
+        if self._is_async():
+            return self._enqueue('sale_order', orders)
+        results = self._processor()._process_sale_orders(orders)
+        error_count = len([r for r in results if r['status'] == 'error'])
+        return {
+            "status": "success" if not error_count else "partial",
+            "count": len(results),
+            "error_count": error_count,
+            "results": results,
+        }
+
+    def _handle_account_invoice(self, data):
+        if self._is_async():
+            return self._enqueue('account_invoice', [data])
+        return self._processor()._process_account_invoice(data)
+
+    def _handle_account_invoice_batch(self, data):
+        invoices = data.get('invoices') or []
+        if self._is_async():
+            return self._enqueue('account_invoice', invoices)
+        results = self._processor()._process_account_invoices(invoices)
+        error_count = len([r for r in results if r['status'] == 'error'])
+        return {
+            "status": "success" if not error_count else "partial",
+            "count": len(results),
+            "error_count": error_count,
+            "results": results,
+        }
+
+    def _handle_purchase_order(self, data, line_chunks=None):
+        if line_chunks is None and self._is_async():
+            return self._enqueue('purchase_order', [data])
+        # Traitement des données
+        return self._processor()._process_purchase_order(data, line_chunks=line_chunks)
+
+    def _receive(self, route, label, handler, streamed=False):
+        """Lecture du payload, déduplication, traitement et journal d'une route de synchronisation.
+
+        En mode streamed, le corps est lu depuis le flux HTTP (décompressé si besoin)
+        et le handler reçoit les lignes par blocs en plus de l'en-tête du document.
+        """
+        probe = CallProbe(request.env.cr)
+        data = None
+        result = None
+        counter = {'lines': 0}
+        size = 0
         try:
-            _logger.info("Début réception PurchaseOrder")
-            raw_data = request.httprequest.data.decode('utf-8')
-            data = json.loads(raw_data) if raw_data else {}
-            _logger.info("PurchaseOrder reçu : %s", json.dumps(data, indent=2))
-
-            # Traitement des données
-            result = self._process_purchase_order(data)
-            return result
-
-        except Exception as e:
-            _logger.exception("Erreur reception PurchaseOrder : %s", e)
-            return {"status": "error", "message": str(e)}
-
-    def _process_purchase_order(self, data):
-        """Traite et crée la commande d'achat dans Odoo 18"""
-        try:
-            # Rechercher le fournisseur
-            partner_id = self._find_partner(data.get('partner_id'))
-            if not partner_id:
-                return {"status": "error", "message": "Fournisseur non trouvé"}
-
-            # Vérifier si la commande existe déjà
-            existing_order = request.env['purchase.order'].sudo().search([
-                ('name', '=', data.get('name'))
-            ], limit=1)
-
-            if existing_order:
-                _logger.info("Commande existe déjà: %s", data.get('name'))
-                return {"status": "success", "message": "Commande déjà existante", "purchase_id": existing_order.id}
-
-            # Gérer le dossier
-            dossier_name = self._extract_dossier_name(data.get('dossier_data'))
-
-            # Préparer les valeurs pour la commande
-            order_vals = {
-                'name': data.get('name'),
-                'partner_id': partner_id,
-                'date_order': data.get('date_order'),
-                'partner_ref': data.get('partner_ref', ''),
-                'date_approve': data.get('date_approve'),
-                'currency_id': self._find_currency(data.get('currency_id')),
-                'notes': data.get('notes', ''),
-                'origin': f"Sync Odoo11: {data.get('name')}",
-                'company_id': request.env.company.id,
-            }
-
-            # Ajouter partner_ref s'il existe
-            if data.get('partner_ref'):
-                order_vals['partner_ref'] = data.get('partner_ref')
-
-            # Ajouter le dossier_id (nom du dossier)
-            if dossier_name:
-                order_vals['dossier_id'] = dossier_name
-
-            # Créer la commande
-            purchase_order = request.env['purchase.order'].sudo().create(order_vals)
-
-            # Créer les lignes de commande
-            order_lines_data = data.get('order_lines_data', [])
-            for line_data in order_lines_data:
-                self._create_order_line(purchase_order.id, line_data)
-
-            # Confirmer la commande
-            purchase_order.button_confirm()
-
-            _logger.info("✅ Commande créée avec succès: %s (ID: %s, Dossier: %s)", purchase_order.name, purchase_order.id, dossier_name)
-
-            return {
-                "status": "success", 
-                "message": "Commande créée avec succès", 
-                "purchase_id": purchase_order.id,
-                "purchase_name": purchase_order.name,
-                "dossier_id": dossier_name
-            }
-
+            if streamed:
+                ICP = request.env['ir.config_parameter'].sudo()
+                environ = request.httprequest.environ
+                if 'odoo_sync.spool' not in environ:
+                    # Conservé sur la requête : le flux HTTP est consommé, et Odoo peut
+                    # rejouer la requête après une erreur de concurrence
+                    environ['odoo_sync.spool'] = spool_body(
+                        request.httprequest.stream,
+                        request.httprequest.headers.get('Content-Encoding'),
+                        int(ICP.get_param('odoo_sync_from_odoo11.stream_max_size', 1024 ** 3)),
+                    )
+                spool, size = environ['odoo_sync.spool']
+            else:
+                raw_data = request.httprequest.data
+                size = len(raw_data or b'')
+
+            # Relivraison : réponse mémorisée, sans décoder le payload
+            idempotency_key = self._idempotency_key(route)
+            result = self._stored_response(idempotency_key)
+            if result is not None:
+                result = dict(result, duplicate=True)
+                return result
+
+            if streamed:
+                data = read_header(spool, 'order_lines_data')
+                self._log_payload_body(route, data)
+                chunk_size = int(ICP.get_param('odoo_sync_from_odoo11.stream_chunk_size', 500))
+                result = handler(data, self._count_lines(iter_line_chunks(spool, 'order_lines_data', chunk_size), counter))
+            else:
+                # Récupération du payload JSON
+                data = json.loads(raw_data.decode('utf-8')) if raw_data else {}
+                self._log_payload_body(route, data)
+                result = handler(data)
+            return self._remember(idempotency_key, route, result)
+
+        except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+            # Laissé à Odoo, qui rejoue la requête
+            raise
         except Exception as e:
-            _logger.exception("Erreur traitement PurchaseOrder: %s", str(e))
-            return {"status": "error", "message": f"Erreur traitement: {str(e)}"}
-
-    def _extract_dossier_name(self, dossier_data):
-        """Extrait le nom du dossier depuis les données"""
-        if not dossier_data:
-            return False
-
-        # Priorité: name, puis project_name
-        dossier_name = dossier_data.get('name')
-        if not dossier_name:
-            dossier_name = dossier_data.get('project_name')
-
-        return dossier_name
-
-    def _find_partner(self, partner_data):
-        """Trouve le fournisseur par nom"""
-        if not partner_data:
-            return False
-
-        partner_name = partner_data[1] if isinstance(partner_data, list) else str(partner_data)
-
-        # Rechercher par nom exact
-        partner = request.env['res.partner'].sudo().search([
-            ('name', '=ilike', partner_name)
-        ], limit=1)
-
-        if not partner:
-            # Créer le fournisseur
-            partner = request.env['res.partner'].sudo().create({
-                'name': partner_name,
-                'company_type': 'company',
-                'supplier_rank': 1,
-            })
-            _logger.info("Nouveau fournisseur créé: %s", partner_name)
-
-        return partner.id
-
-    def _find_currency(self, currency_data):
-        """Trouve la devise par nom"""
-        if not currency_data:
-            return request.env.company.currency_id.id
-
-        currency_name = currency_data[1] if isinstance(currency_data, list) else str(currency_data)
-        
-        # Rechercher la devise
-        currency = request.env['res.currency'].sudo().search([
-            ('name', '=ilike', currency_name)
-        ], limit=1)
-
-        return currency.id if currency else request.env.company.currency_id.id
-
-    def _create_order_line(self, order_id, line_data):
-        """Crée une ligne de commande d'achat"""
+            _logger.exception("Erreur reception %s : %s", label, e)
+            result = {"status": "error", "message": str(e)}
+            return result
+        finally:
+            measure = probe.stop()
+            self._log_summary(route, size, data, result, measure, counter['lines'])
+            metrics_buffer.record(request.env.cr.dbname, route, measure, not result or result.get('status') == 'error')
+            self._flush_metrics()
+
+    def _count_lines(self, line_chunks, counter):
+        for chunk in line_chunks:
+            counter['lines'] += len(chunk)
+            yield chunk
+
+    def _processor(self):
+        return request.env['odoo.sync.processor'].sudo()
+
+    def _is_async(self):
+        return request.env['odoo.sync.queue'].sudo()._is_async_enabled()
+
+    def _enqueue(self, kind, payloads):
+        """Met les payloads valides en file d'attente et répond immédiatement.
+
+        Une réponse JSON-RPC est toujours en HTTP 200 : l'acceptation (202) est
+        donc signalée dans le corps de la réponse. Les payloads invalides sont
+        rejetés avant toute écriture, avec la liste de leurs violations.
+        """
+        checked = [(payload, validate_payload(kind, payload)) for payload in payloads]
+        rejected = [{"index": index, "errors": errors} for index, (payload, errors) in enumerate(checked) if errors]
+        if len(payloads) == 1 and rejected:
+            return invalid_result(rejected[0]['errors'])
+        queue = request.env['odoo.sync.queue'].sudo()._enqueue(kind, [payload for payload, errors in checked if not errors])
+        _logger.info("%s payload(s) %s mis en file d'attente", len(queue), kind)
+        result = {"status": "accepted", "code": 202, "queue_ids": queue.ids}
+        if rejected:
+            result["rejected"] = rejected
+        return result
+
+    def _idempotency_key(self, route):
+        """Clé fournie par l'émetteur (en-tête Idempotency-Key), ou None.
+
+        Le corps ne sert pas de clé : un document revenu à un état déjà envoyé
+        (A, puis B, puis A) doit être traité de nouveau, pas resservi.
+        """
+        key = request.httprequest.headers.get('Idempotency-Key')
+        return '%s:%s' % (route, key) if key else None
+
+    def _stored_response(self, idempotency_key):
+        """Réponse déjà envoyée pour ce payload : la relivraison ne touche aucune table métier"""
+        if not idempotency_key:
+            return None
+        return request.env['odoo.sync.idempotency'].sudo()._get_response(idempotency_key)
+
+    def _remember(self, idempotency_key, route, result):
+        """Mémorise les réponses définitives ; les erreurs restent rejouables"""
+        if idempotency_key and result.get('status') in ('success', 'accepted'):
+            request.env['odoo.sync.idempotency'].sudo()._store_response(idempotency_key, route, result)
+        return result
+
+    def _log_payload_body(self, route, data):
+        """Corps complet journalisé en DEBUG ou par échantillonnage, et archivé si configuré.
+
+        Paramètres système : odoo_sync_from_odoo11.payload_log_sample_rate (0 à 1)
+        et odoo_sync_from_odoo11.payload_archive_dir.
+        """
+        ICP = request.env['ir.config_parameter'].sudo()
+        sample_rate = float(ICP.get_param('odoo_sync_from_odoo11.payload_log_sample_rate', 0) or 0)
+        if _logger.isEnabledFor(logging.DEBUG) or (sample_rate and random.random() < sample_rate):
+            _logger.info("Payload %s reçu : %s", route, json.dumps(data))
+
+        archive_dir = ICP.get_param('odoo_sync_from_odoo11.payload_archive_dir')
+        if archive_dir:
+            try:
+                archive_payload(archive_dir, request.env.cr.dbname, route, data)
+            except OSError as e:
+                _logger.warning("Archivage du payload %s impossible : %s", route, e)
+
+    def _log_summary(self, route, size, data, result, measure, streamed_lines=0):
+        """Une ligne structurée par appel : route, document, lignes, taille, durée, SQL, issue"""
+        if isinstance(data, dict) and 'orders' in data:
+            orders = data.get('orders') or []
+            name = '%s commandes' % len(orders)
+            line_count = sum(len(order.get('order_lines_data') or []) for order in orders if isinstance(order, dict))
+        elif isinstance(data, dict) and 'invoices' in data:
+            invoices = data.get('invoices') or []
+            name = '%s factures' % len(invoices)
+            line_count = sum(len(invoice.get('invoice_lines_data') or []) for invoice in invoices if isinstance(invoice, dict))
+        else:
+            name = (data.get('name') or data.get('number')) if isinstance(data, dict) else None
+            line_count = len(data.get('order_lines_data') or data.get('invoice_lines_data') or []) if isinstance(data, dict) else 0
+            line_count += streamed_lines
+        if result and result.get('duplicate'):
+            outcome = 'duplicate'
+        else:
+            outcome = result.get('status') if result else 'exception'
+        _logger.info(
+            "odoo_sync route=%s name=%s lines=%s size=%s duration_ms=%.1f sql=%s sql_ms=%.1f outcome=%s",
+            route, name, line_count, size,
+            measure['wall_ms'], measure['sql_count'], measure['sql_time_ms'], outcome,
+        )
+
+    def _flush_metrics(self, force=False):
+        """Fusionne les mesures du worker dans odoo.sync.metric, dans un curseur séparé"""
+        stats = metrics_buffer.drain(request.env.cr.dbname, force=force)
+        if not stats:
+            return
         try:
-            # Trouver ou créer le produit
-            product_id = self._find_or_create_product(line_data.get('product_id'))
-
-            # Préparer les valeurs de la ligne
-            line_vals = {
-                'order_id': order_id,
-                'product_id': product_id,
-                'product_qty': line_data.get('product_qty', 1.0),
-                'price_unit': line_data.get('price_unit', 0.0),
-                'name': line_data.get('name', ''),
-                'date_planned': line_data.get('date_planned'),
-            }
-
-            # Créer la ligne
-            order_line = request.env['purchase.order.line'].sudo().create(line_vals)
-
-            # Gérer les taxes si disponibles
-            taxes_data = line_data.get('taxes_id')
-            if taxes_data and isinstance(taxes_data, list) and len(taxes_data) > 2:
-                tax_ids = taxes_data[2]  # Récupérer les IDs de taxes
-                if tax_ids:
-                    # Chercher les taxes par nom (approximatif)
-                    taxes = request.env['account.tax'].sudo().search([
-                        ('type_tax_use', '=', 'purchase')
-                    ], limit=1)
-                    if taxes:
-                        order_line.taxes_id = taxes
-
-            return order_line.id
-
+            with request.env.registry.cursor() as cr:
+                api.Environment(cr, SUPERUSER_ID, {})['odoo.sync.metric']._merge(stats)
         except Exception as e:
-            _logger.error("Erreur création ligne commande: %s", str(e))
-            return False
-
-    def _find_or_create_product(self, product_data):
-        """Trouve ou crée un produit par nom"""
-        if not product_data:
-            # Retourner un produit générique si non spécifié
-            generic_product = request.env['product.product'].sudo().search([
-                ('default_code', '=', 'GENERIC')
-            ], limit=1)
-            
-            if not generic_product:
-                generic_product = request.env['product.product'].sudo().create({
-                    'name': 'Produit Générique',
-                    'default_code': 'GENERIC',
-                    'type': 'service',
-                    'purchase_ok': True,
-                })
-            return generic_product.id
-
-        product_name = product_data[1] if isinstance(product_data, list) else str(product_data)
-
-        # Rechercher par nom
-        product = request.env['product.product'].sudo().search([
-            ('name', '=ilike', product_name)
-        ], limit=1)
-
-        if not product:
-            # Créer le produit
-            product = request.env['product.product'].sudo().create({
-                'name': product_name,
-                'type': 'service',  # ou 'product' selon le besoin
-                'purchase_ok': True,
-                'sale_ok': False,
-                'default_code': f"PROD_{product_name[:20]}",
-            })
-            _logger.info("Nouveau produit créé: %s", product_name)
-
-        return product.id
\ No newline at end of file
+            _logger.warning("Enregistrement des mesures de synchronisation impossible : %s", e)
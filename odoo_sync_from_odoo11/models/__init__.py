@@ -3,3 +3,17 @@
 from . import inherit_project
 from  . import sale_project
 from . import inherit_purchase
+from . import sync_mapping
+from . import sync_name_key
+from . import inherit_product
+from . import sync_processor
+from . import sync_queue
+from . import sync_idempotency
+from . import inherit_account_tax
+from . import inherit_account_move
+from . import inherit_base
+from . import sync_metric
+from . import sync_pull
+from . import sync_outbox
+from . import sync_error
+from . import sync_replay
@@ -0,0 +1,22 @@
+from odoo import models, fields
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    sync_source_ref = fields.Char(
+        string='Référence Odoo11', copy=False, index=True,
+        help="Numéro (à défaut origine) de la facture dans Odoo11",
+    )
+    sync_fingerprint = fields.Char(string='Empreinte sync', copy=False, help="Empreinte de la dernière version reçue d'Odoo11")
+    sync_date = fields.Datetime(
+        string='Dernière synchronisation', copy=False, readonly=True,
+        help="Réception de la dernière version d'Odoo11 appliquée ; le rejeu de l'archive ignore les versions antérieures",
+    )
+
+
+class AccountMoveLine(models.Model):
+    _inherit = 'account.move.line'
+
+    sync_line_key = fields.Char(string='Clé sync', copy=False, help="Identifiant de la ligne dans Odoo11 (id, sinon position)")
+    sync_fingerprint = fields.Char(string='Empreinte sync', copy=False)
@@ -0,0 +1,17 @@
+from odoo import models
+
+
+class AccountTax(models.Model):
+    _name = 'account.tax'
+    _inherit = ['account.tax', 'odoo.sync.name.mixin']
+
+    def write(self, vals):
+        # Le type, la société ou l'archivage d'une taxe changent la taxe d'achat à retenir.
+        # Vidé dans tous les workers (voir SyncCache)
+        if {'active', 'type_tax_use', 'company_id'} & set(vals):
+            self.env.registry.clear_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super().unlink()
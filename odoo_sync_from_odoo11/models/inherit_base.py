@@ -0,0 +1,15 @@
+from odoo import models, api
+import threading
+
+
+class Base(models.AbstractModel):
+    _inherit = 'base'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        # Comptage par modèle pendant un appel de synchronisation instrumenté (voir CallProbe)
+        created = getattr(threading.current_thread(), 'odoo_sync_created', None)
+        if created is not None:
+            created[self._name] = created.get(self._name, 0) + len(records)
+        return records
@@ -0,0 +1,22 @@
+from odoo import models
+
+
+class ProductTemplate(models.Model):
+    # La clé est portée par le modèle, les variantes la lisent par délégation
+    _name = 'product.template'
+    _inherit = ['product.template', 'odoo.sync.name.mixin']
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    def write(self, vals):
+        # Le cache ne contient que des ids : seuls l'archivage et la suppression le rendent obsolète.
+        # Vidé dans tous les workers (voir SyncCache)
+        if 'active' in vals:
+            self.env.registry.clear_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super().unlink()
@@ -1,4 +1,7 @@
 from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
 
 class PurchaseOrder(models.Model):
     _inherit = 'purchase.order'
@@ -13,6 +16,50 @@ class PurchaseOrder(models.Model):
         ('annule', 'Annulé'),
         ('placee', 'Placée')
     ], string='Statut de Livraison', default='en_attente')
+    sync_fingerprint = fields.Char(string='Empreinte sync', copy=False, help="Empreinte de la dernière version reçue d'Odoo11")
+    sync_date = fields.Datetime(
+        string='Dernière synchronisation', copy=False, readonly=True,
+        help="Réception de la dernière version d'Odoo11 appliquée ; le rejeu de l'archive ignore les versions antérieures",
+    )
+    sync_to_confirm = fields.Boolean(
+        string='À confirmer (sync)', copy=False, index=True,
+        help="Commande synchronisée depuis Odoo11, confirmée par le cron de confirmation groupée",
+    )
+
+    @api.model
+    def _cron_confirm_synced_orders(self, batch_size=None):
+        """Confirme les commandes synchronisées par lots, un button_confirm() par société"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = batch_size or int(ICP.get_param('odoo_sync_from_odoo11.po_confirm_batch_size', 50))
+        while True:
+            orders = self.search([('sync_to_confirm', '=', True)], limit=batch_size, order='id')
+            if not orders:
+                break
+            to_confirm = orders.filtered(lambda o: o.state in ('draft', 'sent'))
+            for company, company_orders in to_confirm.grouped('company_id').items():
+                company_orders = company_orders.with_company(company)
+                try:
+                    with self.env.cr.savepoint():
+                        company_orders.button_confirm()
+                except Exception:
+                    # Repli commande par commande pour isoler les commandes en erreur
+                    for order in company_orders:
+                        try:
+                            with self.env.cr.savepoint():
+                                order.button_confirm()
+                        except Exception as e:
+                            _logger.error("Erreur confirmation commande %s: %s", order.name, str(e))
+                            order.message_post(body="Confirmation automatique impossible : %s" % e)
+            orders.write({'sync_to_confirm': False})
+            # Commit par lot : les commandes confirmées ne sont pas rejouées en cas d'arrêt
+            self.env.cr.commit()
     
 
-  
\ No newline at end of file
+  
+
+
+class PurchaseOrderLine(models.Model):
+    _inherit = 'purchase.order.line'
+
+    sync_line_key = fields.Char(string='Clé sync', copy=False, help="Identifiant de la ligne dans Odoo11 (id, sinon position)")
+    sync_fingerprint = fields.Char(string='Empreinte sync', copy=False)
@@ -7,6 +7,11 @@ class SaleOrder(models.Model):
     circuit = fields.Selection(string='Circuit', selection=[('fast', 'Fast Track'), ('normal', 'Normal')], default='normal')
     delaicontractuel = fields.Date(string='Délai Contractuel')
     priorite = fields.Selection([('urgent', 'Urgent'), ('normal', 'Normal'), ('basse', 'Basse')], string='Priorité', default='normal')
+    sync_fingerprint = fields.Char(string='Empreinte sync', copy=False, help="Empreinte de la dernière version reçue d'Odoo11")
+    sync_date = fields.Datetime(
+        string='Dernière synchronisation', copy=False, readonly=True,
+        help="Réception de la dernière version d'Odoo11 appliquée ; le rejeu de l'archive ignore les versions antérieures",
+    )
 
     # Méthode appelée par le bouton "Créer un projet"
     def action_open_create_project_wizard(self):
@@ -32,4 +37,11 @@ class SaleOrder(models.Model):
             'view_mode': 'form',
             'res_id': wizard.id,
             'target': 'new', # 'new' pour ouvrir en pop-up
-        }
\ No newline at end of file
+        }
+
+
+class SaleOrderLine(models.Model):
+    _inherit = 'sale.order.line'
+
+    sync_line_key = fields.Char(string='Clé sync', copy=False, help="Identifiant de la ligne dans Odoo11 (id, sinon position)")
+    sync_fingerprint = fields.Char(string='Empreinte sync', copy=False)
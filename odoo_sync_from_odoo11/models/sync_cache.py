@@ -0,0 +1,57 @@
+from odoo.tools.lru import LRU
+
+
+class SyncCache:
+    """Cache LRU par worker et par base : (portée, id Odoo11) -> id local.
+
+    Les valeurs ne sont ajoutées qu'après commit, pour ne jamais garder un
+    enregistrement annulé par un rollback.
+
+    Le cache de chaque base est rattaché à une génération tenue par un ormcache
+    (odoo.sync.mapping._cache_generation) : registry.clear_cache(), appelé par
+    le worker qui archive, supprime ou modifie, vide donc aussi les caches des
+    autres workers, par la signalisation du registre.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._caches = {}
+
+    def _lru(self, env):
+        """LRU de la base, vidé si la génération a changé depuis son remplissage"""
+        generation = env['odoo.sync.mapping']._cache_generation()
+        cache = self._caches.get(env.cr.dbname)
+        if cache is None or cache[0] is not generation:
+            cache = self._caches[env.cr.dbname] = (generation, LRU(self._size))
+        return cache
+
+    def get_many(self, env, source_ids):
+        """Retourne ({id Odoo11: id local} trouvés dans le cache, ids Odoo11 absents)"""
+        lru = self._lru(env)[1]
+        found, missing = {}, []
+        for source_id in source_ids:
+            local_id = lru.get(source_id)
+            if local_id:
+                found[source_id] = local_id
+            else:
+                missing.append(source_id)
+        return found, missing
+
+    def set_many(self, env, local_ids):
+        generation, lru = self._lru(env)
+        dbname = env.cr.dbname
+
+        def _fill():
+            # Cache vidé entre la lecture et le commit : les valeurs sont peut-être obsolètes
+            if self._caches.get(dbname, (None,))[0] is generation:
+                for source_id, local_id in local_ids.items():
+                    lru[source_id] = local_id
+
+        env.cr.postcommit.add(_fill)
+
+
+# Un cache par modèle résolu depuis Odoo11, invalidé par les modèles hérités
+SYNC_CACHES = {
+    'product.product': SyncCache(8192),
+    'account.tax': SyncCache(1024),
+}
@@ -0,0 +1,49 @@
+from odoo import models, fields, api
+from datetime import timedelta
+
+
+class OdooSyncError(models.Model):
+    """Erreurs de traitement par document et par ligne.
+
+    Écrites dans la transaction du traitement, après le savepoint du document
+    en échec : elles sont conservées avec les documents valides du même lot.
+    """
+    _name = 'odoo.sync.error'
+    _description = "Erreurs de synchronisation Odoo11 par document"
+    _order = 'id desc'
+
+    kind = fields.Selection([
+        ('sale_order', 'Commande client'),
+        ('purchase_order', "Commande d'achat"),
+        ('account_invoice', 'Facture client'),
+    ], string='Type', required=True, index=True)
+    name = fields.Char(string='Document', index=True)
+    line = fields.Integer(string='Ligne', help="Numéro de la ligne dans le payload ; 0 pour le document entier")
+    message = fields.Text(string='Erreur')
+
+    @api.model
+    def _add(self, kind, documents):
+        """Enregistre les échecs des résultats [(nom Odoo11, résultat)] : document en
+        erreur, ou lignes en erreur (line_errors) d'un document traité
+        """
+        vals_list = []
+        for name, result in documents:
+            if not result:
+                continue
+            if result.get('status') == 'error':
+                vals_list.append({'kind': kind, 'name': name, 'line': 0, 'message': result.get('message')})
+            vals_list += [
+                {'kind': kind, 'name': name, 'line': line_error['line'], 'message': line_error['message']}
+                for line_error in result.get('line_errors') or []
+            ]
+        return self.create(vals_list)
+
+    @api.model
+    def _cron_purge(self):
+        """Supprime les erreurs plus anciennes que odoo_sync_from_odoo11.error_retention_days"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        retention_days = int(ICP.get_param('odoo_sync_from_odoo11.error_retention_days', 30))
+        self.env.cr.execute(
+            "DELETE FROM odoo_sync_error WHERE create_date < %s",
+            (fields.Datetime.now() - timedelta(days=retention_days),),
+        )
@@ -0,0 +1,45 @@
+from odoo import models, fields, api
+from odoo.tools import mute_logger
+from datetime import timedelta
+import logging
+import json
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+
+class OdooSyncIdempotency(models.Model):
+    _name = 'odoo.sync.idempotency'
+    _description = 'Réponses déjà envoyées aux synchronisations Odoo11'
+    _rec_name = 'key'
+
+    key = fields.Char(string='Clé', required=True)
+    route = fields.Char(string='Route')
+    response = fields.Text(string='Réponse', required=True)
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', "Cette clé d'idempotence existe déjà."),
+    ]
+
+    @api.model
+    def _get_response(self, key):
+        """Retourne la réponse déjà envoyée pour cette clé, ou None"""
+        record = self.search([('key', '=', key)], limit=1)
+        return json.loads(record.response) if record else None
+
+    @api.model
+    def _store_response(self, key, route, response):
+        """Mémorise la réponse ; une livraison concurrente déjà enregistrée est conservée"""
+        try:
+            with mute_logger('odoo.sql_db'), self.env.cr.savepoint():
+                self.create({'key': key, 'route': route, 'response': json.dumps(response)})
+        except psycopg2.IntegrityError:
+            _logger.info("Clé d'idempotence %s déjà enregistrée", key)
+
+    @api.model
+    def _cron_purge(self):
+        """Supprime les clés plus anciennes que la fenêtre de rétention"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        retention_days = int(ICP.get_param('odoo_sync_from_odoo11.idempotency_retention_days', 30))
+        limit_date = fields.Datetime.now() - timedelta(days=retention_days)
+        self.search([('create_date', '<', limit_date)]).unlink()
@@ -0,0 +1,101 @@
+from odoo import models, fields, api
+from odoo.tools import ormcache
+
+
+class OdooSyncMapping(models.Model):
+    _name = 'odoo.sync.mapping'
+    _description = 'Correspondance des identifiants Odoo11 / locaux'
+
+    model = fields.Char(string='Modèle', required=True)
+    source_id = fields.Integer(string='ID Odoo11', required=True)
+    res_id = fields.Many2oneReference(string='ID local', model_field='model', required=True)
+    res_name = fields.Char(string='Enregistrement local', compute='_compute_res_name')
+    scope = fields.Char(
+        string='Portée', compute='_compute_scope', store=True,
+        help="Taxes : société et usage de la taxe locale (ex. 1/sale), une taxe Odoo11 pouvant "
+             "correspondre à une taxe différente par société et par usage ; * pour les autres modèles",
+    )
+
+    _sql_constraints = [
+        ('source_uniq', 'unique(model, scope, source_id)', "Un enregistrement Odoo11 ne peut être associé qu'une seule fois par portée."),
+    ]
+
+    @api.depends('model', 'res_id')
+    def _compute_res_name(self):
+        for mapping in self:
+            record = self.env[mapping.model].browse(mapping.res_id) if mapping.model in self.env and mapping.res_id else None
+            mapping.res_name = record.sudo().display_name if record and record.exists() else False
+
+    @api.depends('model', 'res_id')
+    def _compute_scope(self):
+        for mapping in self:
+            tax = self.env['account.tax'].sudo().browse(mapping.res_id) if mapping.model == 'account.tax' and mapping.res_id else None
+            mapping.scope = self._tax_scope(tax.company_id.id, tax.type_tax_use) if tax and tax.exists() else '*'
+
+    @api.model
+    def _tax_scope(self, company_id, tax_use):
+        return '%s/%s' % (company_id, tax_use)
+
+    @api.model
+    @ormcache()
+    def _cache_generation(self):
+        """Jeton renouvelé à chaque registry.clear_cache(), dans tous les workers (voir SyncCache)"""
+        return object()
+
+    def write(self, vals):
+        self.env.registry.clear_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super().unlink()
+
+    @api.model
+    def _get_local_ids(self, model_name, source_ids, scope='*'):
+        """Retourne {id Odoo11: id local} pour les ids déjà synchronisés (recherche indexée)"""
+        source_ids = [source_id for source_id in source_ids if source_id]
+        if not source_ids:
+            return {}
+        mappings = self.search([('model', '=', model_name), ('scope', '=', scope), ('source_id', 'in', source_ids)])
+        existing = set(self.env[model_name].browse(mappings.mapped('res_id')).exists().ids)
+
+        # Les correspondances vers des enregistrements supprimés sont purgées
+        stale = mappings.filtered(lambda m: m.res_id not in existing)
+        if stale:
+            stale.unlink()
+        return {m.source_id: m.res_id for m in mappings - stale}
+
+    @api.model
+    def _get_local_id(self, model_name, source_id):
+        """Retourne l'id local associé à un id Odoo11, ou False"""
+        return self._get_local_ids(model_name, [source_id]).get(source_id, False)
+
+    @api.model
+    def _set_local_ids(self, model_name, local_ids, scope='*'):
+        """Enregistre les correspondances {id Odoo11: id local} ; retourne celles en vigueur.
+
+        INSERT ... ON CONFLICT DO NOTHING : une correspondance déjà enregistrée
+        est conservée et retournée à la place de la nouvelle. Si elle vient d'une
+        livraison concurrente pas encore visible, PostgreSQL lève une erreur de
+        sérialisation : Odoo rejoue la requête, qui lit alors la correspondance.
+        """
+        if not local_ids:
+            return {}
+        source_ids = list(local_ids)
+        self.env.cr.execute("""
+            INSERT INTO odoo_sync_mapping (model, scope, source_id, res_id, create_uid, create_date, write_uid, write_date)
+            SELECT %s, %s, source_id, res_id, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+              FROM unnest(%s::int[], %s::int[]) AS t(source_id, res_id)
+                ON CONFLICT (model, scope, source_id) DO NOTHING
+         RETURNING source_id
+        """, (model_name, scope, self.env.uid, self.env.uid, source_ids, [local_ids[source_id] for source_id in source_ids]))
+        inserted = {row[0] for row in self.env.cr.fetchall()}
+        stored = {source_id: local_ids[source_id] for source_id in inserted}
+        conflicts = [source_id for source_id in source_ids if source_id not in inserted]
+        if conflicts:
+            self.env.cr.execute(
+                "SELECT source_id, res_id FROM odoo_sync_mapping WHERE model = %s AND scope = %s AND source_id = ANY(%s)",
+                (model_name, scope, conflicts),
+            )
+            stored.update(self.env.cr.fetchall())
+        return stored
@@ -0,0 +1,108 @@
+from odoo import models, fields, api
+from ..tools.sync_metrics import LATENCY_BUCKETS_MS, SQL_COUNT_BUCKETS, WORKER, percentile
+from datetime import timedelta
+import json
+
+
+class OdooSyncMetric(models.Model):
+    _name = 'odoo.sync.metric'
+    _description = 'Mesures des routes de synchronisation Odoo11'
+    _order = 'period_start desc'
+
+    route = fields.Char(string='Route', required=True)
+    period_start = fields.Datetime(string='Heure', required=True, index=True)
+    worker = fields.Char(string='Worker', required=True)
+    call_count = fields.Integer(string='Appels')
+    error_count = fields.Integer(string='Erreurs')
+    wall_time_total = fields.Float(string='Durée totale (ms)')
+    sql_count_total = fields.Integer(string='Requêtes SQL')
+    sql_time_total = fields.Float(string='Temps SQL total (ms)')
+    latency_histogram = fields.Text(string='Histogramme des durées')
+    sql_histogram = fields.Text(string='Histogramme des requêtes SQL')
+    created_records = fields.Text(string='Enregistrements créés')
+
+    _sql_constraints = [
+        ('period_uniq', 'unique(route, period_start, worker)', 'Une seule ligne par route, heure et worker.'),
+    ]
+
+    @api.model
+    def _merge(self, stats_by_route):
+        """Ajoute les cumuls d'un worker à sa ligne de l'heure courante et purge les heures expirées"""
+        period_start = fields.Datetime.now().replace(minute=0, second=0, microsecond=0)
+        for route, stats in stats_by_route.items():
+            metric = self.search([
+                ('route', '=', route), ('period_start', '=', period_start), ('worker', '=', WORKER),
+            ], limit=1)
+            if not metric:
+                metric = self.create({
+                    'route': route,
+                    'period_start': period_start,
+                    'worker': WORKER,
+                    'latency_histogram': json.dumps([0] * (len(LATENCY_BUCKETS_MS) + 1)),
+                    'sql_histogram': json.dumps([0] * (len(SQL_COUNT_BUCKETS) + 1)),
+                    'created_records': '{}',
+                })
+            created = json.loads(metric.created_records)
+            for model_name, count in stats['created_records'].items():
+                created[model_name] = created.get(model_name, 0) + count
+            metric.write({
+                'call_count': metric.call_count + stats['call_count'],
+                'error_count': metric.error_count + stats['error_count'],
+                'wall_time_total': metric.wall_time_total + stats['wall_time_total'],
+                'sql_count_total': metric.sql_count_total + stats['sql_count_total'],
+                'sql_time_total': metric.sql_time_total + stats['sql_time_total'],
+                'latency_histogram': json.dumps([
+                    a + b for a, b in zip(json.loads(metric.latency_histogram), stats['latency_histogram'])
+                ]),
+                'sql_histogram': json.dumps([
+                    a + b for a, b in zip(json.loads(metric.sql_histogram), stats['sql_histogram'])
+                ]),
+                'created_records': json.dumps(created),
+            })
+
+        ICP = self.env['ir.config_parameter'].sudo()
+        retention_hours = int(ICP.get_param('odoo_sync_from_odoo11.metrics_retention_hours', 168))
+        self.search([('period_start', '<', period_start - timedelta(hours=retention_hours))]).unlink()
+
+    @api.model
+    def _get_stats(self, hours=24):
+        """Statistiques glissantes par route sur les dernières heures (p50/p95/p99 par histogramme)"""
+        since = fields.Datetime.now() - timedelta(hours=hours)
+        stats = {}
+        for metric in self.search([('period_start', '>=', since)]):
+            totals = stats.setdefault(metric.route, {
+                'call_count': 0, 'error_count': 0, 'wall_time_total': 0.0,
+                'sql_count_total': 0, 'sql_time_total': 0.0,
+                'latency_histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                'sql_histogram': [0] * (len(SQL_COUNT_BUCKETS) + 1),
+                'created_records': {},
+            })
+            for field_name in ('call_count', 'error_count', 'wall_time_total', 'sql_count_total', 'sql_time_total'):
+                totals[field_name] += metric[field_name]
+            for field_name in ('latency_histogram', 'sql_histogram'):
+                totals[field_name] = [a + b for a, b in zip(totals[field_name], json.loads(metric[field_name]))]
+            for model_name, count in json.loads(metric.created_records).items():
+                totals['created_records'][model_name] = totals['created_records'].get(model_name, 0) + count
+
+        result = {}
+        for route, totals in stats.items():
+            calls = totals['call_count'] or 1
+            result[route] = {
+                'calls': totals['call_count'],
+                'errors': totals['error_count'],
+                'latency_ms': {
+                    'avg': totals['wall_time_total'] / calls,
+                    'p50': percentile(LATENCY_BUCKETS_MS, totals['latency_histogram'], 0.50),
+                    'p95': percentile(LATENCY_BUCKETS_MS, totals['latency_histogram'], 0.95),
+                    'p99': percentile(LATENCY_BUCKETS_MS, totals['latency_histogram'], 0.99),
+                },
+                'sql_count': {
+                    'avg': totals['sql_count_total'] / calls,
+                    'p50': percentile(SQL_COUNT_BUCKETS, totals['sql_histogram'], 0.50),
+                    'p95': percentile(SQL_COUNT_BUCKETS, totals['sql_histogram'], 0.95),
+                    'p99': percentile(SQL_COUNT_BUCKETS, totals['sql_histogram'], 0.99),
+                },
+                'sql_time_ms_avg': totals['sql_time_total'] / calls,
+                'created_records': totals['created_records'],
+            }
+        return result
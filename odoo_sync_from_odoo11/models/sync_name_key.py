@@ -0,0 +1,189 @@
+from odoo import models, fields, api
+from odoo.osv import expression
+from odoo.tools import SQL, mute_logger, str2bool
+from odoo.tools.sql import create_index, make_index_name
+from ..tools.name_key import normalize_name
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class OdooSyncNameMixin(models.AbstractModel):
+    """Clé de nom normalisée, stockée et indexée, pour les rapprochements par nom.
+
+    Un =ilike sur le nom ne peut pas utiliser d'index btree ; la clé, elle,
+    se compare par égalité. Un index trigramme (pg_trgm) est ajouté lorsque
+    l'extension est disponible, pour le rapprochement approché.
+
+    Pour un nom traduit, la clé est celle de la valeur en_US, quelle que soit
+    la langue de l'écriture ; les autres traductions ne sont comparées que sur
+    option (odoo.sync.name.matcher._match_translations).
+    """
+    _name = 'odoo.sync.name.mixin'
+    _description = 'Clé de nom normalisée'
+
+    sync_name_key = fields.Char(
+        string='Clé de nom', compute='_compute_sync_name_key', store=True, index=True,
+        help="Nom en minuscules, sans accents ni espaces multiples",
+    )
+
+    @api.depends('name')
+    def _compute_sync_name_key(self):
+        for record in self.with_context(lang='en_US'):
+            record.sync_name_key = normalize_name(record.name)
+
+    def init(self):
+        super().init()
+        if self._abstract:
+            return
+        registry = self.env.registry
+        if not registry.has_trigram:
+            try:
+                with self.env.cr.savepoint(), mute_logger('odoo.sql_db'):
+                    self.env.cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                registry.has_trigram = True
+            except Exception as e:
+                _logger.info("Extension pg_trgm indisponible, pas d'index trigramme sur %s : %s", self._table, e)
+                return
+        create_index(
+            self.env.cr, make_index_name(self._table, 'sync_name_key_trgm'), self._table,
+            ['sync_name_key gin_trgm_ops'], method='gin',
+        )
+
+
+class OdooSyncNameMatcher(models.AbstractModel):
+    _name = 'odoo.sync.name.matcher'
+    _description = 'Rapprochement par nom'
+
+    @api.model
+    def _match(self, model_name, names, domain=None):
+        """Retourne {nom: id} pour les noms reconnus dans le modèle.
+
+        Égalité sur la clé normalisée (index btree), puis, pour un nom traduit et
+        si odoo_sync_from_odoo11.match_translations est activé, égalité sans casse
+        avec l'une de ses traductions. Pour les noms restants
+        et si odoo_sync_from_odoo11.fuzzy_match_threshold est renseigné (0 à 1),
+        meilleure similarité trigramme au-dessus du seuil (index GIN).
+        """
+        keys = {}
+        for name in names:
+            key = normalize_name(name)
+            if key:
+                keys.setdefault(key, []).append(name)
+        if not keys:
+            return {}
+
+        Model = self.env[model_name].sudo()
+        matches = {}
+        for record in Model.search(expression.AND([[('sync_name_key', 'in', list(keys))], domain or []]), order='id'):
+            for name in keys.pop(record.sync_name_key, []):
+                matches[name] = record.id
+
+        ICP = self.env['ir.config_parameter'].sudo()
+        if keys and Model._fields['name'].translate and str2bool(ICP.get_param('odoo_sync_from_odoo11.match_translations', 'False'), False):
+            translated = self._match_translations(Model, [name for key_names in keys.values() for name in key_names], domain)
+            for key in list(keys):
+                for name in keys[key]:
+                    if name in translated:
+                        matches[name] = translated[name]
+                if all(name in translated for name in keys[key]):
+                    del keys[key]
+
+        threshold = float(ICP.get_param('odoo_sync_from_odoo11.fuzzy_match_threshold', 0) or 0)
+        if keys and threshold and self.env.registry.has_trigram:
+            for key, record_id in self._match_fuzzy(Model, list(keys), domain, threshold).items():
+                for name in keys[key]:
+                    matches[name] = record_id
+        return matches
+
+    @api.model
+    def _match_translations(self, Model, names, domain):
+        """{nom: id} par égalité sans casse avec l'une des traductions du nom (comme =ilike).
+
+        Sans index : un seul parcours de la table pour tous les noms du lot que la
+        clé en_US n'a pas reconnus, d'où l'option odoo_sync_from_odoo11.match_translations.
+        """
+        by_lower = {}
+        for name in names:
+            by_lower.setdefault(name.lower(), []).append(name)
+        Owner, link = self._name_owner(Model)
+        self.env.cr.execute(SQL("""
+            SELECT DISTINCT lower(tr.value), t.id
+              FROM %s t, jsonb_each_text(t.name) tr
+             WHERE lower(tr.value) = ANY(%s)
+             ORDER BY t.id
+        """, SQL.identifier(Owner._table), list(by_lower)))
+        rows = self.env.cr.fetchall()
+        allowed = self._allowed_ids(Model, link, {owner_id for value, owner_id in rows}, domain)
+        matches = {}
+        for value, owner_id in rows:
+            if owner_id in allowed:
+                for name in by_lower.get(value, []):
+                    matches.setdefault(name, allowed[owner_id])
+        return matches
+
+    @api.model
+    def _name_owner(self, Model):
+        """(modèle qui stocke le nom, champ de délégation) : product.product lit celui du modèle"""
+        field = Model._fields['sync_name_key']
+        link = field.related.split('.')[0] if field.inherited else None
+        return (self.env[Model._fields[link].comodel_name] if link else Model), link
+
+    @api.model
+    def _allowed_ids(self, Model, link, owner_ids, domain):
+        """{id propriétaire: id de Model} des candidats qui respectent le domaine (société, archivage, ...)"""
+        if not owner_ids:
+            return {}
+        allowed = {}
+        for record in Model.search(expression.AND([[(link or 'id', 'in', list(owner_ids))], domain or []]), order='id'):
+            allowed.setdefault(record[link].id if link else record.id, record.id)
+        return allowed
+
+    @api.model
+    def _match_fuzzy(self, Model, keys, domain, threshold, candidates=5):
+        """{clé: id} par similarité trigramme, en une requête pour toutes les clés"""
+        Owner, link = self._name_owner(Model)
+        self.env.cr.execute(SQL("""
+            SELECT n.key, m.id
+              FROM unnest(%s::varchar[]) AS n(key)
+             CROSS JOIN LATERAL (
+                    SELECT t.id
+                      FROM %s t
+                     WHERE t.sync_name_key %% n.key
+                       AND similarity(t.sync_name_key, n.key) >= %s
+                     ORDER BY similarity(t.sync_name_key, n.key) DESC, t.id
+                     LIMIT %s
+             ) m
+        """, keys, SQL.identifier(Owner._table), threshold, candidates))
+        rows = self.env.cr.fetchall()
+        allowed = self._allowed_ids(Model, link, {owner_id for key, owner_id in rows}, domain)
+        matches = {}
+        for key, owner_id in rows:
+            if key not in matches and owner_id in allowed:
+                matches[key] = allowed[owner_id]
+        return matches
+
+
+class ResPartner(models.Model):
+    _name = 'res.partner'
+    _inherit = ['res.partner', 'odoo.sync.name.mixin']
+
+
+class ResCurrency(models.Model):
+    _name = 'res.currency'
+    _inherit = ['res.currency', 'odoo.sync.name.mixin']
+
+
+class ResCountry(models.Model):
+    _name = 'res.country'
+    _inherit = ['res.country', 'odoo.sync.name.mixin']
+
+
+class ResPartnerCategory(models.Model):
+    _name = 'res.partner.category'
+    _inherit = ['res.partner.category', 'odoo.sync.name.mixin']
+
+
+class StockWarehouse(models.Model):
+    _name = 'stock.warehouse'
+    _inherit = ['stock.warehouse', 'odoo.sync.name.mixin']
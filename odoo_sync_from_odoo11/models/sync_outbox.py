@@ -0,0 +1,212 @@
+from odoo import models, fields, api
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from ..tools.odoo_rpc import get_session, post_json
+import hashlib
+import json
+import logging
+import random
+
+_logger = logging.getLogger(__name__)
+
+
+class OdooSyncOutbox(models.Model):
+    """Statuts de traitement à renvoyer à Odoo11.
+
+    Les statuts sont insérés dans la transaction du traitement : ils n'existent
+    que si le résultat est validé. L'ingestion ne fait qu'insérer ; l'envoi,
+    par cron, ne bloque donc jamais la réception même si Odoo11 est lent.
+    """
+    _name = 'odoo.sync.outbox'
+    _description = "Statuts de synchronisation à renvoyer à Odoo11"
+    _order = 'id desc'
+
+    destination = fields.Char(string='Destination', required=True, index=True)
+    kind = fields.Selection([
+        ('sale_order', 'Commande client'),
+        ('purchase_order', "Commande d'achat"),
+        ('account_invoice', 'Facture client'),
+    ], string='Type', required=True)
+    name = fields.Char(string='Document', required=True)
+    status = fields.Char(string='Statut')
+    payload = fields.Text(string='Payload', required=True)
+    state = fields.Selection([
+        ('pending', 'À envoyer'),
+        ('sent', 'Envoyé'),
+        ('error', 'En erreur'),
+    ], string='État', default='pending', required=True, index=True)
+    attempt_count = fields.Integer(string='Tentatives', default=0)
+    next_attempt = fields.Datetime(string='Prochaine tentative', default=fields.Datetime.now, index=True)
+    last_error = fields.Text(string='Dernière erreur')
+    sent_date = fields.Datetime(string='Envoyé le')
+
+    @api.model
+    def _add(self, kind, documents):
+        """Enregistre le statut de chaque document [(nom Odoo11, résultat)].
+
+        Sans destination (paramètre odoo_sync_from_odoo11.feedback_url), rien n'est enregistré.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        destination = ICP.get_param('odoo_sync_from_odoo11.feedback_url')
+        if not destination:
+            return self.browse()
+        now = fields.Datetime.now()
+        return self.create([{
+            'destination': destination,
+            'kind': kind,
+            'name': name,
+            'status': result.get('status'),
+            'payload': json.dumps({
+                'kind': kind,
+                'name': name,
+                'status': result.get('status'),
+                'message': result.get('message'),
+                'local_id': result.get('sale_order_id') or result.get('purchase_id') or result.get('invoice_id'),
+                'updated': bool(result.get('updated')),
+                'processed_at': fields.Datetime.to_string(now),
+            }),
+        } for name, result in documents if name and result])
+
+    @api.model
+    def _cron_send(self):
+        """Envoie les statuts dus, groupés par destination.
+
+        Paramètres système (préfixe odoo_sync_from_odoo11.) : feedback_batch_size,
+        feedback_max_concurrency (envois simultanés par destination, tous workers
+        confondus), feedback_timeout, feedback_max_attempts, feedback_token.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = int(ICP.get_param('odoo_sync_from_odoo11.feedback_batch_size', 100))
+        max_concurrency = int(ICP.get_param('odoo_sync_from_odoo11.feedback_max_concurrency', 2))
+        # Destinations saturées ou en échec : laissées à la prochaine exécution du cron
+        skipped = set()
+        while True:
+            # Réservation sans attente : plusieurs crons peuvent vider la file en parallèle.
+            # Requête SQL directe : les écritures ORM en attente doivent être visibles
+            self.flush_model(['state', 'next_attempt', 'destination'])
+            self.env.cr.execute("""
+                SELECT id FROM odoo_sync_outbox
+                 WHERE state = 'pending' AND next_attempt <= %s AND destination != ALL(%s)
+                 ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, (fields.Datetime.now(), list(skipped), batch_size * max_concurrency * 5))
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            if not ids:
+                break
+            skipped |= self.browse(ids)._send(batch_size, max_concurrency)
+            self.env.cr.commit()
+        self._purge_sent()
+
+    def _send(self, batch_size, max_concurrency):
+        """Envoie les statuts réservés ; retourne les destinations saturées ou en échec"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        timeout = int(ICP.get_param('odoo_sync_from_odoo11.feedback_timeout', 30))
+        token = ICP.get_param('odoo_sync_from_odoo11.feedback_token')
+        headers = {'Authorization': 'Bearer %s' % token} if token else None
+
+        lanes = []
+        skipped = set()
+        for destination, records in self.grouped('destination').items():
+            # Dernier statut de chaque document ; les précédents sont remplacés par lui
+            latest = {}
+            for record in records.sorted('id'):
+                latest[(record.kind, record.name)] = record
+            latest_records = self.browse([record.id for record in latest.values()])
+            (records - latest_records).write({'state': 'sent', 'sent_date': fields.Datetime.now(), 'last_error': False})
+
+            slots = self._acquire_slots(destination, max_concurrency)
+            if not slots:
+                _logger.info("Statuts Odoo11 vers %s : envois simultanés au maximum, report", destination)
+                skipped.add(destination)
+                continue
+            batches = [latest_records[offset:offset + batch_size] for offset in range(0, len(latest_records), batch_size)]
+            for slot in range(slots):
+                lanes.append((destination, [
+                    (batch.ids, [json.loads(payload) for payload in batch.mapped('payload')])
+                    for batch in batches[slot::slots]
+                ]))
+        if not lanes:
+            return skipped
+
+        # HTTP seulement dans les threads : aucun accès à la base hors du thread du cron
+        session = get_session(max(len(lanes), 10))
+        with ThreadPoolExecutor(max_workers=len(lanes)) as executor:
+            outcomes = list(executor.map(
+                lambda lane: self._send_lane(session, lane[0], lane[1], timeout, headers), lanes,
+            ))
+
+        for (destination, batches), outcome in zip(lanes, outcomes):
+            for ids, error in outcome:
+                records = self.browse(ids)
+                if error is None:
+                    records.write({'state': 'sent', 'sent_date': fields.Datetime.now(), 'last_error': False})
+                else:
+                    records._schedule_retry(error)
+                    skipped.add(destination)
+            if len(outcome) < len(batches):
+                skipped.add(destination)
+        return skipped
+
+    @api.model
+    def _send_lane(self, session, url, batches, timeout, headers):
+        """Envoie les lots d'une file d'envoi l'un après l'autre, sans accès à la base.
+
+        Après un échec, les lots restants ne sont pas tentés : ils restent en
+        attente sans consommer de tentative.
+        """
+        outcome = []
+        for ids, statuses in batches:
+            try:
+                post_json(session, url, {'statuses': statuses}, timeout=timeout, headers=headers)
+            except Exception as e:
+                _logger.warning("Envoi de %s statut(s) vers %s échoué : %s", len(ids), url, e)
+                outcome.append((ids, str(e)))
+                break
+            outcome.append((ids, None))
+        return outcome
+
+    def _acquire_slots(self, destination, max_concurrency):
+        """Réserve jusqu'à max_concurrency places d'envoi vers la destination (verrous
+        consultatifs libérés en fin de transaction)
+        """
+        key = int.from_bytes(hashlib.sha256(destination.encode()).digest()[:4], 'big', signed=True)
+        slots = 0
+        for slot in range(max_concurrency):
+            self.env.cr.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", (key, slot))
+            if self.env.cr.fetchone()[0]:
+                slots += 1
+        return slots
+
+    def _schedule_retry(self, error):
+        """Nouvelle tentative avec attente exponentielle (30 s, 1 min, 2 min... plafonnée à 6 h)"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_attempts = int(ICP.get_param('odoo_sync_from_odoo11.feedback_max_attempts', 12))
+        now = fields.Datetime.now()
+        for record in self:
+            attempt_count = record.attempt_count + 1
+            delay = min(30 * 2 ** (attempt_count - 1), 6 * 3600) * random.uniform(0.8, 1.2)
+            record.write({
+                'state': 'error' if attempt_count >= max_attempts else 'pending',
+                'attempt_count': attempt_count,
+                'next_attempt': now + timedelta(seconds=delay),
+                'last_error': error,
+            })
+
+    @api.model
+    def _purge_sent(self):
+        """Supprime les statuts envoyés au-delà de odoo_sync_from_odoo11.feedback_retention_days"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        retention_days = int(ICP.get_param('odoo_sync_from_odoo11.feedback_retention_days', 7))
+        self.env.cr.execute(
+            "DELETE FROM odoo_sync_outbox WHERE state = 'sent' AND sent_date < %s",
+            (fields.Datetime.now() - timedelta(days=retention_days),),
+        )
+
+    def action_retry(self):
+        """Remet les statuts en erreur dans la file d'envoi"""
+        self.filtered(lambda r: r.state == 'error').write({
+            'state': 'pending',
+            'attempt_count': 0,
+            'next_attempt': fields.Datetime.now(),
+        })
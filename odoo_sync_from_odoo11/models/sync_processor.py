@@ -0,0 +1,1312 @@
+from odoo import models, fields, SUPERUSER_ID
+from odoo.exceptions import UserError
+from odoo.service.model import PG_CONCURRENCY_EXCEPTIONS_TO_RETRY
+from odoo.tools import str2bool
+import hashlib
+import json
+import logging
+import psycopg2
+from .sync_cache import SYNC_CACHES
+from ..tools.payload_schema import validate_payload, validate_purchase_line, invalid_result
+
+_logger = logging.getLogger(__name__)
+
+# En-tête de facture sans effet comptable : écrit sans repasser la facture en brouillon
+INVOICE_INFO_FIELDS = ('invoice_user_id', 'invoice_origin', 'sync_source_ref')
+
+# Type de document -> (modèle local, champ de l'identifiant local dans le résultat, champ de la clé Odoo11)
+SYNCED_DOCUMENTS = {
+    'sale_order': ('sale.order', 'sale_order_id', 'name'),
+    'purchase_order': ('purchase.order', 'purchase_id', 'name'),
+    'account_invoice': ('account.move', 'invoice_id', 'sync_source_ref'),
+}
+
+
+class OdooSyncProcessor(models.AbstractModel):
+    """Traitement des payloads Odoo11, partagé par les routes HTTP et la file d'attente"""
+    _name = 'odoo.sync.processor'
+    _description = 'Traitement des synchronisations Odoo11'
+
+    def _process_payload(self, kind, data):
+        """Traite un payload selon son type ('sale_order', 'purchase_order', 'account_invoice')"""
+        if kind == 'sale_order':
+            return self._process_sale_orders([data])[0]
+        if kind == 'purchase_order':
+            return self._process_purchase_order(data)
+        if kind == 'account_invoice':
+            return self._process_account_invoice(data)
+        raise ValueError("Type de payload inconnu : %s" % kind)
+
+    def _lock_documents(self, model_name, names):
+        """Verrous consultatifs PostgreSQL par document, libérés en fin de transaction.
+
+        La clé est le hash de « modèle:nom Odoo11 » : des documents différents
+        restent traités en parallèle. Une livraison concurrente du même document
+        attend la fin de la première puis lève une erreur de concurrence ; Odoo
+        rejoue alors la requête avec un instantané neuf, qui voit le document
+        créé entre-temps et prend le chemin « déjà existant ».
+        """
+        # Ordre stable pour éviter les interblocages entre lots
+        keys = sorted({
+            int.from_bytes(hashlib.sha256(('%s:%s' % (model_name, name)).encode()).digest()[:8], 'big', signed=True)
+            for name in names if name
+        })
+        for key in keys:
+            self.env.cr.execute("SELECT pg_try_advisory_xact_lock(%s)", (key,))
+            if not self.env.cr.fetchone()[0]:
+                self.env.cr.execute("SELECT pg_advisory_xact_lock(%s)", (key,))
+                raise psycopg2.errors.SerializationFailure(
+                    "Document %s synchronisé en parallèle, nouvelle tentative" % model_name
+                )
+
+    def _process_sale_orders(self, orders):
+        """Crée un lot de SaleOrder, un résultat par commande reçue (même ordre)"""
+        results = [None] * len(orders)
+
+        # Validation du schéma, avant toute requête SQL
+        valid_indexes = []
+        for index, data in enumerate(orders):
+            errors = validate_payload('sale_order', data)
+            if errors:
+                results[index] = invalid_result(errors)
+            else:
+                valid_indexes.append(index)
+        if not valid_indexes:
+            self._record_results('sale_order', [(self._payload_name(data), result) for data, result in zip(orders, results)])
+            return results
+
+        self._lock_documents('sale.order', [orders[i]['name'] for i in valid_indexes])
+
+        # Clients, entrepôts et utilisateurs résolus une seule fois pour tout le lot ;
+        # une référence impossible à créer n'écarte que les commandes qui l'utilisent
+        refs = {'partners': {}, 'warehouses': {}, 'users': {}}
+
+        def resolve(indexes):
+            resolved = self._resolve_sale_references([orders[i] for i in indexes])
+            self.env.flush_all()
+            for key, local_ids in resolved.items():
+                refs[key].update(local_ids)
+        ref_errors = self._run_per_document(valid_indexes, resolve, 'références SaleOrder')
+        for index, message in ref_errors.items():
+            results[index] = {"status": "error", "message": message}
+        valid_indexes = [index for index in valid_indexes if index not in ref_errors]
+
+        # Vérifier si les SaleOrder existent déjà (évite les doublons), en une seule requête
+        names = list({orders[i]['name'] for i in valid_indexes})
+        existing = {
+            order.name: order
+            for order in self.env['sale.order'].sudo().search([('name', 'in', names)])
+        }
+        to_create = []
+        to_update = []
+        to_adopt = []
+        duplicates = {}
+        first_index = {}
+        for index in valid_indexes:
+            name = orders[index]['name']
+            if name in first_index:
+                # Même commande présente plusieurs fois dans le lot
+                duplicates[index] = first_index[name]
+                continue
+            first_index[name] = index
+            sale_order = existing.get(name)
+            if not sale_order:
+                to_create.append(index)
+            elif sale_order.sync_fingerprint == self._order_fingerprint(orders[index]):
+                _logger.info("SaleOrder %s déjà existant et inchangé.", name)
+                results[index] = {"status": "success", "sale_order_id": sale_order.id}
+            elif not sale_order.sync_fingerprint:
+                to_adopt.append(index)
+            else:
+                to_update.append(index)
+
+        # Produits de toutes les lignes résolus une seule fois pour le lot
+        products = self._resolve_sale_products([
+            line for index in to_create + to_update for line in orders[index].get('order_lines_data') or []
+        ])
+
+        # Création : groupée ou isolée par document selon le mode d'isolation
+        mode = self._isolation_mode()
+        errors = self._run_per_document(
+            to_create,
+            lambda indexes: self._create_sale_orders(orders, indexes, refs, results, products, per_line=mode == 'line'),
+            'SaleOrder', batch_first=mode == 'batch',
+        )
+
+        # Commandes modifiées dans Odoo11 depuis la dernière synchronisation
+        def update(indexes):
+            for index in indexes:
+                results[index] = self._update_sale_order(existing[orders[index]['name']], orders[index], refs, products)
+        errors.update(self._run_per_document(to_update, update, 'SaleOrder', batch_first=False))
+
+        # Commandes synchronisées avant les empreintes : rattachées, sans réécriture
+        def adopt(indexes):
+            for index in indexes:
+                sale_order = existing[orders[index]['name']]
+                self._adopt_legacy_order(sale_order, orders[index], [orders[index].get('order_lines_data') or []])
+                _logger.info("SaleOrder %s synchronisé avant les empreintes : rattaché sans modification.", sale_order.name)
+                results[index] = {"status": "success", "sale_order_id": sale_order.id, "adopted": True}
+        errors.update(self._run_per_document(to_adopt, adopt, 'SaleOrder', batch_first=False))
+        for index, message in errors.items():
+            results[index] = {"status": "error", "message": message}
+
+        for index, original_index in duplicates.items():
+            results[index] = results[original_index]
+        self._record_results('sale_order', [
+            (self._payload_name(data), result)
+            for index, (data, result) in enumerate(zip(orders, results)) if index not in duplicates
+        ])
+        return results
+
+    def _isolation_mode(self):
+        """Mode d'isolation des documents d'un lot (paramètre odoo_sync_from_odoo11.isolation_mode) :
+
+        - 'batch' (défaut) : création groupée, reprise document par document si elle échoue ;
+        - 'document' : un savepoint par document, sans tentative groupée ;
+        - 'line' : comme 'document', et un savepoint par ligne de commande.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        mode = ICP.get_param('odoo_sync_from_odoo11.isolation_mode', 'batch')
+        return mode if mode in ('batch', 'document', 'line') else 'batch'
+
+    def _run_per_document(self, indexes, func, label, batch_first=True):
+        """Appelle func(indexes) dans des savepoints ; retourne {index: message} des documents en échec.
+
+        Avec batch_first, un seul appel pour tous les documents, repris document par
+        document s'il échoue ; sinon directement un savepoint par document. Une erreur
+        ne laisse jamais le curseur inutilisable pour les documents suivants ; seules
+        les erreurs de concurrence remontent, pour que la transaction soit rejouée.
+        """
+        errors = {}
+        if not indexes:
+            return errors
+        if batch_first:
+            try:
+                with self.env.cr.savepoint():
+                    func(indexes)
+                return errors
+            except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+                raise
+            except Exception as e:
+                _logger.warning("Traitement groupé de %s %s échoué (%s), repli unitaire", len(indexes), label, e)
+        for index in indexes:
+            try:
+                with self.env.cr.savepoint():
+                    func([index])
+            except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+                raise
+            except Exception as e:
+                _logger.exception("Erreur traitement %s (document %s du lot) : %s", label, index, e)
+                errors[index] = str(e)
+        return errors
+
+    def _create_lines(self, Line, vals_list, per_line=False):
+        """Crée les lignes [(numéro, valeurs)] d'un bloc, ou une par savepoint (per_line, ou
+        après l'échec du bloc) ; retourne les erreurs par ligne
+        """
+        errors = []
+        if not per_line:
+            try:
+                with self.env.cr.savepoint():
+                    Line.create([line_vals for index, line_vals in vals_list])
+                return errors
+            except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+                raise
+            except Exception as e:
+                _logger.warning("Création groupée de %s ligne(s) échouée (%s), repli ligne par ligne", len(vals_list), e)
+        for index, line_vals in vals_list:
+            try:
+                with self.env.cr.savepoint():
+                    Line.create(line_vals)
+            except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+                raise
+            except Exception as e:
+                _logger.error("Erreur création ligne %s: %s", index, str(e))
+                errors.append({"line": index, "message": str(e)})
+        return errors
+
+    def _payload_name(self, data):
+        return (data.get('name') or False) if isinstance(data, dict) else False
+
+    def _record_results(self, kind, documents):
+        """Résultats [(nom Odoo11, résultat)], dans la transaction du traitement : statuts à
+        renvoyer à Odoo11 et, pour les échecs, table des erreurs par document
+        """
+        self.env['odoo.sync.outbox'].sudo()._add(kind, documents)
+        self.env['odoo.sync.error'].sudo()._add(kind, documents)
+        self._stamp_synced(kind, [result for name, result in documents])
+
+    def _stamp_synced(self, kind, results, sync_date=None):
+        """Date de la version appliquée (sync_date) sur les documents traités avec succès.
+
+        Par défaut la réception du payload (contexte sync_received_at, posé par la
+        file d'attente), sinon maintenant ; le rejeu y écrit la réception archivée.
+        """
+        model_name, id_field = SYNCED_DOCUMENTS[kind][:2]
+        ids = {result[id_field] for result in results if result.get('status') == 'success' and result.get(id_field)}
+        if ids:
+            sync_date = sync_date or self.env.context.get('sync_received_at') or fields.Datetime.now()
+            self.env[model_name].sudo().browse(sorted(ids)).write({'sync_date': sync_date})
+
+    def _resolve_sale_references(self, orders):
+        """Résout clients, entrepôts et utilisateurs de tout un lot en une requête par modèle"""
+        partners = self._resolve_refs(
+            'res.partner',
+            {data['partner_id'][0]: data['partner_id'][1] for data in orders},
+            lambda name: {'name': name},
+        )
+        warehouses = self._resolve_refs(
+            'stock.warehouse',
+            {data['warehouse_id'][0]: data['warehouse_id'][1] for data in orders if data.get('warehouse_id')},
+            self._warehouse_vals_factory(),
+        )
+        users = self._resolve_refs(
+            'res.users',
+            {data['user_id'][0]: data['user_id'][1] for data in orders if data.get('user_id')},
+        )
+        return {'partners': partners, 'warehouses': warehouses, 'users': users}
+
+    def _warehouse_vals_factory(self):
+        """Valeurs de création des entrepôts inconnus, avec un code court (5 caractères)
+        unique dans la société : « Abidjan Nord » et « Abidjan Sud » donnent ABIDJ et ABID1.
+        Les codes existants ne sont lus qu'à la première création.
+        """
+        taken = None
+
+        def warehouse_vals(name):
+            nonlocal taken
+            if taken is None:
+                Warehouse = self.env['stock.warehouse'].sudo().with_context(active_test=False)
+                taken = {
+                    code.upper()
+                    for code in Warehouse.search([('company_id', '=', self.env.company.id)]).mapped('code') if code
+                }
+            base = ''.join(char for char in name.upper() if char.isalnum())[:5] or 'WH'
+            code, number = base, 0
+            while code in taken:
+                number += 1
+                code = base[:5 - len(str(number))] + str(number)
+            taken.add(code)
+            return {'name': name, 'code': code}
+        return warehouse_vals
+
+    def _resolve_refs(self, model_name, names_by_id, create_vals=None, domain=None, scope='*'):
+        """Retourne {id Odoo11: id local} via la table de correspondance.
+
+        Les ids inconnus (premier contact) sont rapprochés par clé de nom, dans le
+        domaine éventuel, puis, si create_vals est fourni, créés d'un bloc ; la
+        correspondance est ensuite enregistrée pour que les envois suivants se
+        résolvent par l'index.
+        """
+        if not names_by_id:
+            return {}
+        Mapping = self.env['odoo.sync.mapping'].sudo()
+        local_ids = Mapping._get_local_ids(model_name, list(names_by_id), scope)
+        missing = {source_id: name for source_id, name in names_by_id.items() if source_id not in local_ids}
+        if not missing:
+            return local_ids
+
+        Model = self.env[model_name].sudo()
+        new_ids = {}
+        by_name = self._match_names(model_name, {name for name in missing.values() if name}, domain)
+        to_create = []
+        for source_id, name in missing.items():
+            if name in by_name:
+                new_ids[source_id] = by_name[name]
+            elif create_vals and name:
+                to_create.append(source_id)
+        if to_create:
+            created = Model.create([create_vals(missing[source_id]) for source_id in to_create])
+            for source_id, record in zip(to_create, created):
+                new_ids[source_id] = record.id
+                _logger.info("%s créé : %s", Model._description, record.display_name)
+
+        # Correspondance déjà enregistrée entre-temps : la sienne l'emporte
+        local_ids.update(Mapping._set_local_ids(model_name, new_ids, scope))
+        return local_ids
+
+    def _match_names(self, model_name, names, domain=None):
+        """{nom: id local} par clé de nom normalisée (voir odoo.sync.name.matcher)"""
+        return self.env['odoo.sync.name.matcher']._match(model_name, names, domain)
+
+    def _resolve_cached_refs(self, model_name, names_by_id, create_vals=None, domain=None, scope='*'):
+        """Comme _resolve_refs, précédé du cache LRU du worker (produits, taxes).
+
+        Un enregistrement déjà connu du worker est servi sans requête SQL ; les
+        autres passent par la table de correspondance. Le cache est indexé par
+        (portée, id Odoo11), comme la correspondance.
+        """
+        cache = SYNC_CACHES[model_name]
+        source_ids = {(scope, source_id): source_id for source_id in names_by_id}
+        found, missing = cache.get_many(self.env, source_ids)
+        local_ids = {source_ids[key]: local_id for key, local_id in found.items()}
+        if missing:
+            resolved = self._resolve_refs(
+                model_name, {source_ids[key]: names_by_id[source_ids[key]] for key in missing}, create_vals, domain, scope,
+            )
+            cache.set_many(self.env, {(scope, source_id): local_id for source_id, local_id in resolved.items()})
+            local_ids.update(resolved)
+        return local_ids
+
+    def _prepare_sale_order_vals(self, data, refs):
+        """Prépare les valeurs d'un SaleOrder à partir des références résolues"""
+        user_id = refs['users'].get(data['user_id'][0]) if data.get('user_id') else None
+        if not user_id:
+            user_id = SUPERUSER_ID
+            _logger.warning("Utilisateur non trouvé pour %s, utilisation admin", data['name'])
+
+        return {
+            'name': data['name'],
+            'partner_id': refs['partners'][data['partner_id'][0]],
+            'user_id': user_id,
+            'amount_total': data.get('amount_total', 0),
+            'warehouse_id': refs['warehouses'][data['warehouse_id'][0]] if data.get('warehouse_id') else False,
+            'project_name': data.get('project', False),
+        }
+
+    def _create_sale_orders(self, orders, indexes, refs, results, products=None, per_line=False):
+        """Crée les SaleOrder puis toutes leurs lignes en create() multi-enregistrements.
+
+        Avec per_line, chaque ligne est créée dans son savepoint : une ligne en
+        erreur est signalée dans line_errors sans faire échouer la commande.
+        """
+        if not indexes:
+            return
+        sale_orders = self.env['sale.order'].sudo().create([
+            dict(self._prepare_sale_order_vals(orders[index], refs), sync_fingerprint=self._order_fingerprint(orders[index]))
+            for index in indexes
+        ])
+
+        # Lignes de commande
+        SaleLine = self.env['sale.order.line'].sudo()
+        line_errors = {}
+        if per_line:
+            for index, sale_order in zip(indexes, sale_orders):
+                entries = self._line_entries(orders[index].get('order_lines_data', []))
+                vals_list = self._prepare_sale_line_vals([(sale_order, entry) for entry in entries], products)
+                line_errors[index] = self._create_lines(SaleLine, [
+                    (entry[0], line_vals) for entry, line_vals in zip(entries, vals_list)
+                ], per_line=True)
+                if line_errors[index]:
+                    sale_order.sync_fingerprint = self._written_fingerprint(
+                        orders[index], [entry[3] for entry in entries], line_errors[index],
+                    )
+        else:
+            SaleLine.create(self._prepare_sale_line_vals([
+                (sale_order, entry)
+                for index, sale_order in zip(indexes, sale_orders)
+                for entry in self._line_entries(orders[index].get('order_lines_data', []))
+            ], products))
+
+        for index, sale_order in zip(indexes, sale_orders):
+            _logger.info("SaleOrder créé localement : %s", sale_order.name)
+            results[index] = {"status": "success", "sale_order_id": sale_order.id}
+            if line_errors.get(index):
+                results[index]["line_errors"] = line_errors[index]
+
+    def _resolve_sale_products(self, lines_data):
+        """{id produit Odoo11: id local} des lignes de vente ou de facture.
+
+        Produits résolus par le cache / la correspondance, créés seulement s'ils sont inconnus.
+        """
+        lines_data = [line for line in lines_data if isinstance(line.get('product_id'), list)]
+        price_by_name = {line['product_id'][1]: line.get('price_unit', 0) for line in lines_data}
+        return self._resolve_cached_refs(
+            'product.product',
+            {line['product_id'][0]: line['product_id'][1] for line in lines_data},
+            lambda name: {'name': name, 'list_price': price_by_name[name]},
+        )
+
+    def _prepare_sale_line_vals(self, lines, products=None):
+        """Valeurs des lignes [(commande, entrée de _line_entries)], produits résolus en une fois
+        (ou fournis, déjà résolus pour tout le lot)
+        """
+        if products is None:
+            products = self._resolve_sale_products([entry[1] for sale_order, entry in lines])
+        taxes = self._resolve_taxes([entry[1] for sale_order, entry in lines], 'sale')
+        vals_list = []
+        for sale_order, (index, line, key, fingerprint) in lines:
+            line_vals = {
+                'order_id': sale_order.id,
+                'product_id': products[line['product_id'][0]],
+                'product_uom_qty': line.get('product_uom_qty', 1),
+                'price_unit': line.get('price_unit', 0),
+                'name': line.get('name', 'Produit inconnu'),
+                'sync_line_key': key,
+                'sync_fingerprint': fingerprint,
+            }
+            # Taxes Odoo11 si elles sont transmises, sinon celles du produit
+            if 'taxes_id' in line:
+                line_vals['tax_id'] = [(6, 0, self._line_tax_ids(line, taxes))]
+            vals_list.append(line_vals)
+        return vals_list
+
+    def _update_sale_order(self, sale_order, data, refs, products=None):
+        """Met à jour un SaleOrder déjà synchronisé : seuls les champs et lignes modifiés sont écrits"""
+        synced_lines = self._synced_lines(sale_order)
+        entries = self._line_entries(data.get('order_lines_data', []))
+        changes = [entry for entry in entries if self._is_line_changed(synced_lines, entry)]
+        self._apply_line_changes(sale_order, synced_lines, self._prepare_sale_line_vals([(sale_order, entry) for entry in changes], products))
+        self._remove_stale_lines(sale_order, {entry[2] for entry in entries}, 'product_uom_qty', sale_order.state == 'sale')
+
+        vals = self._changed_vals(sale_order, self._prepare_sale_order_vals(data, refs))
+        vals['sync_fingerprint'] = self._order_fingerprint(data)
+        sale_order.write(vals)
+        _logger.info("SaleOrder mis à jour : %s (%s)", sale_order.name, ', '.join(vals))
+        return {"status": "success", "sale_order_id": sale_order.id, "updated": True}
+
+    def _process_account_invoice(self, data):
+        """Crée ou met à jour la facture client reçue d'Odoo11"""
+        return self._process_account_invoices([data])[0]
+
+    def _process_account_invoices(self, invoices):
+        """Crée ou met à jour un lot de factures client, un résultat par facture reçue (même ordre).
+
+        Les factures sont identifiées par leur numéro Odoo11, à défaut leur origine ;
+        la validation est faite par lots, une fois toutes les factures écrites.
+        """
+        results = [None] * len(invoices)
+
+        # Validation du schéma, avant toute requête SQL
+        valid_indexes = []
+        for index, data in enumerate(invoices):
+            errors = validate_payload('account_invoice', data)
+            if errors:
+                results[index] = invalid_result(errors)
+            else:
+                valid_indexes.append(index)
+        if not valid_indexes:
+            self._record_results('account_invoice', [
+                (self._invoice_key(data) if isinstance(data, dict) else False, result)
+                for data, result in zip(invoices, results)
+            ])
+            return results
+
+        keys = list({self._invoice_key(invoices[i]) for i in valid_indexes} - {False})
+        self._lock_documents('account.move', keys)
+
+        # Clients et utilisateurs résolus une seule fois pour tout le lot
+        refs = self._resolve_invoice_references([invoices[i] for i in valid_indexes])
+
+        # Factures déjà synchronisées, en une seule requête
+        existing = {}
+        if keys:
+            existing = {
+                invoice.sync_source_ref: invoice
+                for invoice in self.env['account.move'].sudo().search([
+                    ('sync_source_ref', 'in', keys),
+                    ('move_type', '=', 'out_invoice'),
+                ])
+            }
+        to_create = []
+        to_update = []
+        # Factures à valider, créées, modifiées ou inchangées mais validées depuis dans Odoo11
+        created = []
+        duplicates = {}
+        first_index = {}
+        for index in valid_indexes:
+            key = self._invoice_key(invoices[index])
+            if key in first_index:
+                # Même facture présente plusieurs fois dans le lot
+                duplicates[index] = first_index[key]
+                continue
+            if key:
+                first_index[key] = index
+            invoice = existing.get(key)
+            if not invoice:
+                to_create.append(index)
+            elif invoice.sync_fingerprint == self._invoice_fingerprint(invoices[index]):
+                _logger.info("AccountInvoice %s déjà existante et inchangée.", key)
+                results[index] = {"status": "success", "invoice_id": invoice.id}
+                if self._is_invoice_to_post(invoices[index]):
+                    created.append(invoice)
+            else:
+                to_update.append(index)
+
+        # Création : groupée ou isolée par facture selon le mode d'isolation (les lignes
+        # d'une facture sont créées avec elle, le mode 'line' vaut ici 'document')
+        def create(indexes):
+            created.append(self._create_invoices(invoices, indexes, refs, results))
+        errors = self._run_per_document(
+            to_create, create, 'AccountInvoice', batch_first=self._isolation_mode() == 'batch',
+        )
+
+        # Factures modifiées dans Odoo11 depuis la dernière synchronisation
+        def update(indexes):
+            for index in indexes:
+                invoice = existing[self._invoice_key(invoices[index])]
+                results[index] = self._update_invoice(invoice, invoices[index], refs)
+                if results[index]['status'] == 'success' and self._is_invoice_to_post(invoices[index]):
+                    created.append(invoice)
+        errors.update(self._run_per_document(to_update, update, 'AccountInvoice', batch_first=False))
+        for index, message in errors.items():
+            results[index] = {"status": "error", "message": message}
+
+        # Validation groupée, à la fin du lot
+        to_post = self.env['account.move'].sudo().union(*created)
+        post_errors = self._post_invoices(to_post.exists())
+        for result in results:
+            if result and result.get('invoice_id') in post_errors:
+                result['post_error'] = post_errors[result['invoice_id']]
+
+        for index, original_index in duplicates.items():
+            results[index] = results[original_index]
+        self._record_results('account_invoice', [
+            (self._invoice_key(data) if isinstance(data, dict) else False, result)
+            for index, (data, result) in enumerate(zip(invoices, results)) if index not in duplicates
+        ])
+        return results
+
+    def _invoice_key(self, data):
+        """Identifiant Odoo11 d'une facture : numéro, à défaut origine"""
+        return data.get('number') or data.get('origin') or False
+
+    def _invoice_fingerprint(self, data):
+        """Empreinte d'une facture, sans son état : une validation ou un paiement dans Odoo11
+        ne la modifie pas (la validation locale suit _is_invoice_to_post)
+        """
+        return self._order_fingerprint(
+            {key: value for key, value in data.items() if key != 'state'}, lines_key='invoice_lines_data',
+        )
+
+    def _is_invoice_to_post(self, data):
+        """Facture à valider : ouverte ou payée dans Odoo11, et avec des lignes"""
+        return bool(data.get('invoice_lines_data')) and data.get('state') not in ('draft', 'cancel')
+
+    def _resolve_invoice_references(self, invoices):
+        """Résout clients et utilisateurs de tout un lot de factures en une requête par modèle"""
+        partners = self._resolve_refs(
+            'res.partner',
+            {data['partner_id'][0]: data['partner_id'][1] for data in invoices},
+            lambda name: {'name': name},
+        )
+        users = self._resolve_refs(
+            'res.users',
+            {data['user_id'][0]: data['user_id'][1] for data in invoices if data.get('user_id')},
+        )
+        return {'partners': partners, 'users': users}
+
+    def _prepare_invoice_vals(self, data, refs):
+        """Prépare l'en-tête d'une facture client à partir des références résolues"""
+        user_id = refs['users'].get(data['user_id'][0]) if data.get('user_id') else None
+        if not user_id:
+            user_id = SUPERUSER_ID
+            _logger.warning("Utilisateur non trouvé pour %s, utilisation admin", self._invoice_key(data))
+
+        invoice_vals = {
+            'move_type': 'out_invoice',
+            'partner_id': refs['partners'][data['partner_id'][0]],
+            'invoice_user_id': user_id,
+            'invoice_date': data.get('date_invoice', None),
+            'invoice_origin': data.get('origin', ''),
+            'sync_source_ref': self._invoice_key(data),
+        }
+        if not data.get('invoice_lines_data'):
+            # Facture sans lignes : le montant reçu est repris tel quel
+            invoice_vals['amount_total'] = data.get('amount_total', 0)
+        return invoice_vals
+
+    def _create_invoices(self, invoices, indexes, refs, results):
+        """Crée les factures et leurs lignes en un create() ; retourne celles à valider"""
+        if not indexes:
+            return self.env['account.move'].sudo()
+        entries_by_index = {
+            index: self._line_entries(invoices[index].get('invoice_lines_data') or [])
+            for index in indexes
+        }
+        # Produits et taxes résolus une seule fois pour toutes les lignes du lot
+        lines_vals = iter(self._prepare_invoice_line_vals([
+            entry for index in indexes for entry in entries_by_index[index]
+        ]))
+
+        vals_list = []
+        for index in indexes:
+            invoice_vals = self._prepare_invoice_vals(invoices[index], refs)
+            invoice_vals['sync_fingerprint'] = self._invoice_fingerprint(invoices[index])
+            invoice_vals['invoice_line_ids'] = [(0, 0, next(lines_vals)) for entry in entries_by_index[index]]
+            vals_list.append(invoice_vals)
+        created = self.env['account.move'].sudo().create(vals_list)
+
+        to_post = self.env['account.move'].sudo()
+        for index, invoice in zip(indexes, created):
+            _logger.info("AccountInvoice créé localement : %s", invoice.sync_source_ref or invoice.name)
+            results[index] = {"status": "success", "invoice_id": invoice.id}
+            if self._is_invoice_to_post(invoices[index]):
+                to_post |= invoice
+        return to_post
+
+    def _prepare_invoice_line_vals(self, entries):
+        """Valeurs des lignes de facture (entrées de _line_entries), produits et taxes résolus en une fois"""
+        lines_data = [entry[1] for entry in entries]
+        products = self._resolve_sale_products(lines_data)
+        taxes = self._resolve_taxes(lines_data, 'sale')
+        vals_list = []
+        for index, line_data, key, fingerprint in entries:
+            product_data = line_data.get('product_id') if isinstance(line_data.get('product_id'), list) else None
+            line_vals = {
+                'product_id': products[product_data[0]] if product_data else False,
+                'name': line_data.get('name') or (product_data[1] if product_data else '/'),
+                'quantity': line_data.get('quantity', 1),
+                'price_unit': line_data.get('price_unit', 0),
+                'discount': line_data.get('discount', 0),
+                'sync_line_key': key,
+                'sync_fingerprint': fingerprint,
+            }
+            # Taxes Odoo11 si elles sont transmises, sinon celles du produit
+            if 'taxes_id' in line_data:
+                line_vals['tax_ids'] = [(6, 0, self._line_tax_ids(line_data, taxes))]
+            vals_list.append(line_vals)
+        return vals_list
+
+    def _update_invoice(self, invoice, data, refs):
+        """Met à jour une facture déjà synchronisée en une seule écriture : champs modifiés et
+        lignes ajoutées, modifiées ou supprimées.
+
+        Une facture validée ne repasse en brouillon (puis est revalidée avec le lot) que si
+        un champ comptable ou une ligne change, et jamais si elle est lettrée ou dans une
+        période verrouillée : la modification est alors refusée en erreur de synchronisation.
+        """
+        synced_lines = self._synced_lines(invoice, 'invoice_line_ids')
+        entries = self._line_entries(data.get('invoice_lines_data') or [])
+        changes = [entry for entry in entries if self._is_line_changed(synced_lines, entry)]
+        commands = []
+        for line_vals in self._prepare_invoice_line_vals(changes):
+            line = synced_lines.get(line_vals['sync_line_key'])
+            if not line:
+                commands.append((0, 0, line_vals))
+                continue
+            changed = self._changed_vals(line, line_vals)
+            if changed:
+                commands.append((1, line.id, changed))
+        seen_keys = {entry[2] for entry in entries}
+        # Lignes sans clé (saisies localement ou d'avant les empreintes) : jamais supprimées
+        commands += [
+            (2, line.id) for line in invoice.invoice_line_ids
+            if line.display_type == 'product' and line.sync_line_key and line.sync_line_key not in seen_keys
+        ]
+
+        vals = self._changed_vals(invoice, self._prepare_invoice_vals(data, refs))
+        if invoice.state != 'draft' and (commands or set(vals) - set(INVOICE_INFO_FIELDS)):
+            blocked = self._invoice_reset_blocked(invoice)
+            if blocked:
+                _logger.warning("AccountInvoice %s non modifiée : %s", invoice.sync_source_ref, blocked)
+                return {"status": "error", "invoice_id": invoice.id, "message": blocked}
+            invoice.button_draft()
+
+        vals['sync_fingerprint'] = self._invoice_fingerprint(data)
+        if commands:
+            vals['invoice_line_ids'] = commands
+        invoice.write(vals)
+        _logger.info("AccountInvoice mise à jour : %s (%s)", invoice.sync_source_ref, ', '.join(vals))
+        return {"status": "success", "invoice_id": invoice.id, "updated": True}
+
+    def _invoice_reset_blocked(self, invoice):
+        """Motif empêchant de repasser une facture validée en brouillon, ou False.
+
+        button_draft() délettrerait les paiements ; une période verrouillée ne doit pas bouger.
+        """
+        if invoice.line_ids.matched_debit_ids or invoice.line_ids.matched_credit_ids:
+            return "Facture lettrée (paiement ou avoir) : modification Odoo11 non reportée"
+        violated = invoice.company_id._get_violated_lock_dates(invoice.date, bool(invoice.line_ids.tax_ids))
+        if violated:
+            return "Facture du %s dans une période verrouillée (%s) : modification Odoo11 non reportée" % (
+                invoice.date, ', '.join(str(lock_date) for lock_date, lock_type in violated),
+            )
+        return False
+
+    def _post_invoices(self, invoices):
+        """Valide les factures par lots (paramètre odoo_sync_from_odoo11.invoice_post_batch_size).
+
+        Un lot en échec est repris facture par facture ; retourne {id facture: erreur}
+        pour celles restées en brouillon.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = int(ICP.get_param('odoo_sync_from_odoo11.invoice_post_batch_size', 200))
+        invoices = invoices.filtered(lambda invoice: invoice.state == 'draft')
+        errors = {}
+        for offset in range(0, len(invoices), batch_size):
+            batch = invoices[offset:offset + batch_size]
+            try:
+                with self.env.cr.savepoint():
+                    batch.action_post()
+            except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+                raise
+            except Exception as e:
+                _logger.warning("Validation groupée de %s facture(s) échouée (%s), repli unitaire", len(batch), e)
+                for invoice in batch:
+                    try:
+                        with self.env.cr.savepoint():
+                            invoice.action_post()
+                    except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+                        raise
+                    except Exception as e:
+                        _logger.error("Validation de la facture %s impossible : %s", invoice.sync_source_ref, e)
+                        errors[invoice.id] = str(e)
+        return errors
+
+    def _process_purchase_order(self, data, line_chunks=None):
+        """Traite et crée (ou met à jour) la commande d'achat dans Odoo 18.
+
+        line_chunks permet de fournir les lignes par blocs (lecture en flux)
+        au lieu de data['order_lines_data'].
+        """
+        # Validation du schéma, avant toute requête SQL (en flux : en-tête seul, lignes par bloc)
+        errors = validate_payload('purchase_order', data)
+        if errors:
+            result = invalid_result(errors)
+        else:
+            self._lock_documents('purchase.order', [data.get('name')])
+            # Savepoint par document : une erreur ORM n'empêche pas d'enregistrer le résultat
+            try:
+                with self.env.cr.savepoint():
+                    result = self._sync_purchase_order(data, line_chunks)
+            except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+                raise
+            except Exception as e:
+                _logger.exception("Erreur traitement PurchaseOrder: %s", str(e))
+                result = {"status": "error", "message": f"Erreur traitement: {str(e)}"}
+        self._record_results('purchase_order', [(self._payload_name(data), result)])
+        return result
+
+    def _sync_purchase_order(self, data, line_chunks=None):
+        """Crée ou met à jour la commande d'achat ; le document est déjà verrouillé"""
+        # Rechercher le fournisseur
+        partner_id = self._find_partner(data.get('partner_id'))
+        if not partner_id:
+            return {"status": "error", "message": "Fournisseur non trouvé"}
+
+        # Vérifier si la commande existe déjà
+        existing_order = self.env['purchase.order'].sudo().search([
+            ('name', '=', data.get('name'))
+        ], limit=1)
+
+        # Gérer le dossier
+        dossier_name = self._extract_dossier_name(data.get('dossier_data'))
+
+        # Préparer les valeurs pour la commande
+        order_vals = {
+            'name': data.get('name'),
+            'partner_id': partner_id,
+            'date_order': data.get('date_order'),
+            'partner_ref': data.get('partner_ref', ''),
+            'date_approve': data.get('date_approve'),
+            'currency_id': self._find_currency(data.get('currency_id')),
+            'notes': data.get('notes', ''),
+            'origin': f"Sync Odoo11: {data.get('name')}",
+            'company_id': self.env.company.id,
+            'sync_to_confirm': self._is_confirmation_deferred(),
+        }
+
+        # Ajouter partner_ref s'il existe
+        if data.get('partner_ref'):
+            order_vals['partner_ref'] = data.get('partner_ref')
+
+        # Ajouter le dossier_id (nom du dossier)
+        if dossier_name:
+            order_vals['dossier_id'] = dossier_name
+
+        if existing_order:
+            return self._update_purchase_order(existing_order, data, order_vals, line_chunks)
+
+        # Créer la commande
+        purchase_order = self.env['purchase.order'].sudo().create(order_vals)
+
+        # Créer les lignes de commande
+        streamed = line_chunks is not None
+        if not streamed:
+            line_chunks = [data.get('order_lines_data', [])]
+        line_errors = []
+        line_fingerprints = []
+        for lines_data in line_chunks:
+            entries = self._line_entries(lines_data, offset=len(line_fingerprints))
+            line_errors += self._create_order_lines(purchase_order, entries)
+            line_fingerprints += [entry[3] for entry in entries]
+            if streamed:
+                # Mémoire bornée : le cache ORM des lignes déjà écrites est libéré à chaque bloc
+                self.env.invalidate_all()
+        purchase_order.sync_fingerprint = self._written_fingerprint(data, line_fingerprints, line_errors)
+
+        # Confirmer la commande, sauf si la confirmation est confiée au cron
+        if not purchase_order.sync_to_confirm:
+            purchase_order.button_confirm()
+
+        _logger.info("✅ Commande créée avec succès: %s (ID: %s, Dossier: %s)", purchase_order.name, purchase_order.id, dossier_name)
+
+        result = {
+            "status": "success", 
+            "message": "Commande créée avec succès", 
+            "purchase_id": purchase_order.id,
+            "purchase_name": purchase_order.name,
+            "dossier_id": dossier_name
+        }
+        if line_errors:
+            result["line_errors"] = line_errors
+        return result
+
+    def _is_confirmation_deferred(self):
+        """Confirmation groupée par cron (paramètre odoo_sync_from_odoo11.defer_po_confirmation)"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        return str2bool(ICP.get_param('odoo_sync_from_odoo11.defer_po_confirmation', 'False'), False)
+
+    def _extract_dossier_name(self, dossier_data):
+        """Extrait le nom du dossier depuis les données"""
+        if not dossier_data:
+            return False
+
+        # Priorité: name, puis project_name
+        dossier_name = dossier_data.get('name')
+        if not dossier_name:
+            dossier_name = dossier_data.get('project_name')
+
+        return dossier_name
+
+    def _find_partner(self, partner_data):
+        """Trouve le fournisseur par correspondance Odoo11, sinon par nom"""
+        if not partner_data:
+            return False
+
+        if isinstance(partner_data, list):
+            partner_source_id, partner_name = partner_data
+            return self._resolve_refs('res.partner', {partner_source_id: partner_name}, lambda name: {
+                'name': name,
+                'company_type': 'company',
+                'supplier_rank': 1,
+            })[partner_source_id]
+
+        partner_name = str(partner_data)
+
+        # Rechercher par nom
+        partner_id = self._match_names('res.partner', [partner_name]).get(partner_name)
+
+        if not partner_id:
+            # Créer le fournisseur
+            partner_id = self.env['res.partner'].sudo().create({
+                'name': partner_name,
+                'company_type': 'company',
+                'supplier_rank': 1,
+            }).id
+            _logger.info("Nouveau fournisseur créé: %s", partner_name)
+
+        return partner_id
+
+    def _find_currency(self, currency_data):
+        """Trouve la devise par correspondance Odoo11, sinon par nom"""
+        if not currency_data:
+            return self.env.company.currency_id.id
+
+        if isinstance(currency_data, list):
+            currency_source_id, currency_name = currency_data
+            currency_id = self._resolve_refs('res.currency', {currency_source_id: currency_name}).get(currency_source_id)
+            return currency_id or self.env.company.currency_id.id
+
+        currency_name = str(currency_data)
+
+        # Rechercher la devise
+        currency_id = self._match_names('res.currency', [currency_name]).get(currency_name)
+
+        return currency_id or self.env.company.currency_id.id
+
+    def _create_order_lines(self, purchase_order, entries):
+        """Crée toutes les lignes d'une commande d'achat en un seul create().
+
+        entries vient de _line_entries ; retourne la liste des erreurs par ligne,
+        une ligne en erreur est ignorée sans bloquer les autres.
+        """
+        vals_list, errors = self._prepare_purchase_line_vals(purchase_order, entries)
+
+        # Création groupée ; en cas d'échec (ou en mode 'line'), une ligne par savepoint
+        PurchaseLine = self.env['purchase.order.line'].sudo()
+        return errors + self._create_lines(PurchaseLine, vals_list, per_line=self._isolation_mode() == 'line')
+
+    def _prepare_purchase_line_vals(self, purchase_order, entries):
+        """Valeurs des lignes d'achat [(numéro, valeurs)] et erreurs de préparation par ligne"""
+        errors = []
+        # Lignes lues en flux : non vérifiées avec l'en-tête, elles le sont ici
+        valid_entries = []
+        for entry in entries:
+            violations = validate_purchase_line(entry[1])
+            if violations:
+                errors.append({"line": entry[0], "message": '; '.join(violations)})
+            else:
+                valid_entries.append(entry)
+        entries = valid_entries
+        lines_data = [entry[1] for entry in entries]
+        taxes = self._resolve_taxes(lines_data, 'purchase')
+        products = self._resolve_cached_refs('product.product', {
+            line_data['product_id'][0]: line_data['product_id'][1]
+            for line_data in lines_data if isinstance(line_data.get('product_id'), list)
+        }, self._purchase_product_vals)
+
+        vals_list = []
+        for index, line_data, key, fingerprint in entries:
+            try:
+                product_data = line_data.get('product_id')
+                if isinstance(product_data, list):
+                    product_id = products[product_data[0]]
+                else:
+                    product_id = self._find_or_create_product(product_data)
+
+                # Préparer les valeurs de la ligne
+                line_vals = {
+                    'order_id': purchase_order.id,
+                    'product_id': product_id,
+                    'product_qty': line_data.get('product_qty', 1.0),
+                    'price_unit': line_data.get('price_unit', 0.0),
+                    'name': line_data.get('name', ''),
+                    'date_planned': line_data.get('date_planned'),
+                    'sync_line_key': key,
+                    'sync_fingerprint': fingerprint,
+                }
+
+                # Gérer les taxes si disponibles
+                tax_ids = self._line_tax_ids(line_data, taxes)
+                if tax_ids:
+                    line_vals['taxes_id'] = [(6, 0, tax_ids)]
+                vals_list.append((index, line_vals))
+            except Exception as e:
+                _logger.error("Erreur création ligne commande %s: %s", index, str(e))
+                errors.append({"line": index, "message": str(e)})
+        return vals_list, errors
+
+    def _update_purchase_order(self, purchase_order, data, order_vals, line_chunks=None):
+        """Met à jour une commande d'achat déjà synchronisée.
+
+        Une relivraison identique se résume à une comparaison d'empreinte ; sinon
+        seuls les champs et lignes modifiés sont écrits. En lecture en flux,
+        l'empreinte complète n'est connue qu'à la fin : les lignes sont alors
+        comparées une à une à leur propre empreinte.
+        """
+        streamed = line_chunks is not None
+        if not streamed:
+            fingerprint = self._order_fingerprint(data)
+            if purchase_order.sync_fingerprint == fingerprint:
+                _logger.info("Commande existe déjà et inchangée: %s", purchase_order.name)
+                return {"status": "success", "message": "Commande déjà existante", "purchase_id": purchase_order.id}
+            line_chunks = [data.get('order_lines_data', [])]
+
+        if not purchase_order.sync_fingerprint:
+            # Synchronisée avant les empreintes : rattachée, sans réécriture
+            self._adopt_legacy_order(purchase_order, data, line_chunks)
+            _logger.info("Commande %s synchronisée avant les empreintes : rattachée sans modification.", purchase_order.name)
+            return {
+                "status": "success",
+                "message": "Commande existante rattachée",
+                "purchase_id": purchase_order.id,
+                "purchase_name": purchase_order.name,
+                "adopted": True,
+            }
+
+        synced_lines = self._synced_lines(purchase_order)
+        line_errors = []
+        line_fingerprints = []
+        seen_keys = set()
+        for lines_data in line_chunks:
+            entries = self._line_entries(lines_data, offset=len(line_fingerprints))
+            changes = [entry for entry in entries if self._is_line_changed(synced_lines, entry)]
+            vals_list, errors = self._prepare_purchase_line_vals(purchase_order, changes)
+            self._apply_line_changes(purchase_order, synced_lines, [line_vals for index, line_vals in vals_list])
+            line_errors += errors
+            line_fingerprints += [entry[3] for entry in entries]
+            seen_keys.update(entry[2] for entry in entries)
+            if streamed:
+                self.env.invalidate_all()
+        self._remove_stale_lines(purchase_order, seen_keys, 'product_qty', purchase_order.state in ('purchase', 'done'))
+
+        # Ni la société ni l'état de confirmation ne sont repris d'Odoo11
+        header_vals = {key: value for key, value in order_vals.items() if key not in ('company_id', 'sync_to_confirm')}
+        vals = self._changed_vals(purchase_order, header_vals)
+        vals['sync_fingerprint'] = self._written_fingerprint(data, line_fingerprints, line_errors)
+        purchase_order.write(vals)
+        _logger.info("Commande mise à jour: %s (%s)", purchase_order.name, ', '.join(vals))
+
+        result = {
+            "status": "success",
+            "message": "Commande mise à jour",
+            "purchase_id": purchase_order.id,
+            "purchase_name": purchase_order.name,
+            "updated": True,
+        }
+        if line_errors:
+            result["line_errors"] = line_errors
+        return result
+
+    def _extract_source_taxes(self, taxes_data):
+        """Retourne {id taxe Odoo11: nom ou None} depuis [6, 0, ids] ou une liste de [id, nom]"""
+        if not taxes_data or not isinstance(taxes_data, list):
+            return {}
+        if len(taxes_data) > 2 and taxes_data[0] == 6 and isinstance(taxes_data[2], list):
+            return {tax_id: None for tax_id in taxes_data[2]}
+        return {tax[0]: tax[1] for tax in taxes_data if isinstance(tax, list) and len(tax) == 2}
+
+    def _resolve_taxes(self, lines_data, tax_use='purchase'):
+        """Retourne {id taxe Odoo11: [ids taxes locales]} pour toutes les lignes d'un document.
+
+        Les taxes sont résolues par la table de correspondance (avec le cache du
+        worker), puis par nom. Celles qui restent inconnues, souvent transmises
+        sans nom ([6, 0, ids]), sont lues dans Odoo11 (connexion du mode pull).
+        Une taxe sans correspondance fait échouer sa ligne ; avec le paramètre
+        odoo_sync_from_odoo11.unmapped_tax_default, elle retombe sur la taxe par
+        défaut (achat ou vente) de la société.
+        """
+        names_by_id = {}
+        for line_data in lines_data:
+            names_by_id.update(self._extract_source_taxes(line_data.get('taxes_id')))
+        if not names_by_id:
+            return {}
+
+        company = self.env.company
+        domain = [('type_tax_use', '=', tax_use), ('company_id', '=', company.id)]
+        # Une taxe Odoo11 correspond à une taxe locale par société et par usage
+        scope = self.env['odoo.sync.mapping']._tax_scope(company.id, tax_use)
+        local_ids = self._resolve_cached_refs('account.tax', names_by_id, domain=domain, scope=scope)
+        unknown = [source_id for source_id in names_by_id if source_id not in local_ids]
+        if unknown:
+            local_ids.update(self._resolve_remote_taxes(unknown, domain, scope))
+        taxes = {source_id: [tax_id] for source_id, tax_id in local_ids.items()}
+        unmapped = [source_id for source_id in names_by_id if source_id not in taxes]
+        if unmapped:
+            ICP = self.env['ir.config_parameter'].sudo()
+            if str2bool(ICP.get_param('odoo_sync_from_odoo11.unmapped_tax_default', 'False'), False):
+                default_tax_id = self._default_tax(company, tax_use)
+                for source_id in unmapped:
+                    taxes[source_id] = [default_tax_id] if default_tax_id else []
+            else:
+                _logger.warning("Taxe(s) Odoo11 %s sans correspondance locale (%s)", unmapped, tax_use)
+        return taxes
+
+    def _resolve_remote_taxes(self, source_ids, domain, scope):
+        """{id taxe Odoo11: id local} des taxes lues dans Odoo11, rapprochées par nom, à défaut
+        par type de calcul et montant lorsqu'une seule taxe locale correspond
+        """
+        try:
+            client = self.env['odoo.sync.pull'].sudo()._get_client()
+        except UserError:
+            # Connexion Odoo11 non configurée : seule la table de correspondance fait foi
+            return {}
+        try:
+            remote_taxes = client.search_read(
+                'account.tax', [('id', 'in', source_ids), ('active', 'in', [True, False])],
+                ['name', 'amount_type', 'amount'],
+            )
+        except Exception as e:
+            _logger.warning("Lecture des taxes Odoo11 %s impossible : %s", source_ids, e)
+            return {}
+
+        local_ids = self._resolve_cached_refs(
+            'account.tax', {tax['id']: tax['name'] for tax in remote_taxes}, domain=domain, scope=scope,
+        )
+        by_rate = {}
+        for tax in remote_taxes:
+            if tax['id'] in local_ids:
+                continue
+            candidates = self.env['account.tax'].sudo().search(domain + [
+                ('amount_type', '=', tax['amount_type']),
+                ('amount', '=', tax['amount']),
+            ], limit=2)
+            if len(candidates) == 1:
+                by_rate[tax['id']] = candidates.id
+        if by_rate:
+            stored = self.env['odoo.sync.mapping'].sudo()._set_local_ids('account.tax', by_rate, scope)
+            SYNC_CACHES['account.tax'].set_many(self.env, {(scope, source_id): tax_id for source_id, tax_id in stored.items()})
+            local_ids.update(stored)
+        return local_ids
+
+    def _line_tax_ids(self, line_data, taxes):
+        """Ids des taxes locales d'une ligne, d'après le résultat de _resolve_taxes ; une
+        taxe Odoo11 sans correspondance lève une erreur plutôt qu'un taux au hasard
+        """
+        source_ids = self._extract_source_taxes(line_data.get('taxes_id'))
+        unmapped = [str(source_id) for source_id in source_ids if source_id not in taxes]
+        if unmapped:
+            raise UserError(
+                "Taxe(s) Odoo11 %s sans correspondance locale (menu Synchronisation Odoo11 > Correspondances)"
+                % ', '.join(unmapped)
+            )
+        return list({tax_id for source_id in source_ids for tax_id in taxes[source_id]})
+
+    def _default_tax(self, company, tax_use):
+        """Première taxe d'achat ou de vente de la société, mise en cache par worker"""
+        cache = SYNC_CACHES['account.tax']
+        key = ('default_%s' % tax_use, company.id)
+        found, missing = cache.get_many(self.env, [key])
+        if found:
+            return found[key]
+        tax = self.env['account.tax'].sudo().search([
+            ('type_tax_use', '=', tax_use),
+            ('company_id', '=', company.id),
+        ], limit=1)
+        if tax:
+            cache.set_many(self.env, {key: tax.id})
+        return tax.id
+
+    def _purchase_product_vals(self, name):
+        """Valeurs de création d'un produit inconnu reçu sur une commande d'achat"""
+        return {
+            'name': name,
+            'type': 'service',  # ou 'product' selon le besoin
+            'purchase_ok': True,
+            'sale_ok': False,
+            'default_code': f"PROD_{name[:20]}",
+        }
+
+    def _find_or_create_product(self, product_data):
+        """Trouve ou crée un produit par correspondance Odoo11, sinon par nom"""
+        if not product_data:
+            # Retourner un produit générique si non spécifié
+            generic_product = self.env['product.product'].sudo().search([
+                ('default_code', '=', 'GENERIC')
+            ], limit=1)
+            
+            if not generic_product:
+                generic_product = self.env['product.product'].sudo().create({
+                    'name': 'Produit Générique',
+                    'default_code': 'GENERIC',
+                    'type': 'service',
+                    'purchase_ok': True,
+                })
+            return generic_product.id
+
+        if isinstance(product_data, list):
+            product_source_id, product_name = product_data
+            return self._resolve_cached_refs(
+                'product.product', {product_source_id: product_name}, self._purchase_product_vals,
+            )[product_source_id]
+
+        product_name = str(product_data)
+
+        # Rechercher par nom
+        product_id = self._match_names('product.product', [product_name]).get(product_name)
+
+        if not product_id:
+            # Créer le produit
+            product_id = self.env['product.product'].sudo().create(self._purchase_product_vals(product_name)).id
+            _logger.info("Nouveau produit créé: %s", product_name)
+
+        return product_id
+
+    def _fingerprint(self, data):
+        """Empreinte SHA-256 d'un payload ou d'une ligne, indépendante de l'ordre des clés.
+
+        Les valeurs vides valent absence, comme pour le schéma : un champ omis en
+        push et lu à False en pull donnent la même empreinte.
+        """
+        if isinstance(data, dict):
+            data = {key: value for key, value in data.items() if not (value is None or value is False or value == '')}
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _order_fingerprint(self, data, line_fingerprints=None, lines_key='order_lines_data'):
+        """Empreinte d'un document : en-tête puis empreintes des lignes, dans l'ordre reçu.
+
+        line_fingerprints permet de la calculer sans disposer de toutes les lignes (lecture en flux).
+        """
+        header = {key: value for key, value in data.items() if key != lines_key}
+        if line_fingerprints is None:
+            line_fingerprints = [self._fingerprint(line) for line in data.get(lines_key) or []]
+        digest = hashlib.sha256(self._fingerprint(header).encode())
+        for fingerprint in line_fingerprints:
+            digest.update(fingerprint.encode())
+        return digest.hexdigest()
+
+    def _written_fingerprint(self, data, line_fingerprints, line_errors, lines_key='order_lines_data'):
+        """Empreinte du document tel qu'il a été écrit : sans les lignes en erreur.
+
+        Une relivraison identique ne correspond donc pas et retente ces lignes.
+        """
+        failed = {error['line'] for error in line_errors}
+        return self._order_fingerprint(data, [
+            fingerprint for number, fingerprint in enumerate(line_fingerprints, start=1) if number not in failed
+        ], lines_key)
+
+    def _line_entries(self, lines_data, offset=0):
+        """[(numéro, ligne, clé, empreinte)] : la clé est la position de la ligne dans le document.
+
+        Toujours la position, même si la ligne porte son id Odoo11 : push et pull
+        doivent désigner la même ligne par la même clé.
+        """
+        return [
+            (index, line_data, '#%s' % index, self._fingerprint(line_data))
+            for index, line_data in enumerate(lines_data, start=offset + 1)
+        ]
+
+    def _synced_lines(self, order, lines_field='order_line'):
+        """{clé de synchronisation: ligne} des lignes déjà synchronisées d'un document"""
+        return {line.sync_line_key: line for line in order[lines_field] if line.sync_line_key}
+
+    def _is_line_changed(self, synced_lines, entry):
+        line = synced_lines.get(entry[2])
+        return not line or line.sync_fingerprint != entry[3]
+
+    def _changed_vals(self, record, vals):
+        """Ne garde que les valeurs qui diffèrent de celles de l'enregistrement"""
+        changed = {}
+        for fname, value in vals.items():
+            field = record._fields[fname]
+            new_value = field.convert_to_record(field.convert_to_cache(value, record), record)
+            current = record[fname]
+            if new_value != current and (new_value or current):
+                changed[fname] = value
+        return changed
+
+    def _apply_line_changes(self, order, synced_lines, vals_list):
+        """Écrit les champs modifiés des lignes existantes et crée les nouvelles d'un bloc"""
+        to_create = []
+        for vals in vals_list:
+            line = synced_lines.get(vals['sync_line_key'])
+            if line:
+                line.write(self._changed_vals(line, vals))
+            else:
+                to_create.append(vals)
+        if to_create:
+            order.order_line.create(to_create)
+
+    def _adopt_legacy_order(self, order, data, line_chunks, lines_key='order_lines_data'):
+        """Rattache un document synchronisé avant les empreintes, sans réécrire son contenu.
+
+        Ses lignes, sans clé, sont associées aux lignes reçues dans l'ordre
+        (séquence, id) lorsque le produit correspond : elles reçoivent clé et
+        empreinte. Les autres restent sans clé, donc hors de _remove_stale_lines.
+        """
+        legacy_lines = iter(order.order_line.filtered(
+            lambda line: not line.display_type and not line.sync_line_key
+        ).sorted(lambda line: (line.sequence, line.id)))
+        line_fingerprints = []
+        unmatched = []
+        for lines_data in line_chunks:
+            entries = self._line_entries(lines_data, offset=len(line_fingerprints))
+            products_data = [
+                entry[1]['product_id'] for entry in entries
+                if isinstance(entry[1], dict) and isinstance(entry[1].get('product_id'), list)
+            ]
+            # Produits existants seulement : rien n'est créé pour un rattachement
+            products = self._resolve_cached_refs('product.product', {
+                product_data[0]: product_data[1] for product_data in products_data
+            })
+            for index, line_data, key, fingerprint in entries:
+                line = next(legacy_lines, None)
+                product_data = line_data.get('product_id') if isinstance(line_data, dict) else None
+                product_id = products.get(product_data[0]) if isinstance(product_data, list) else None
+                if line and product_id and line.product_id.id == product_id:
+                    line.write({'sync_line_key': key, 'sync_fingerprint': fingerprint})
+                else:
+                    unmatched.append(index)
+            line_fingerprints += [entry[3] for entry in entries]
+        order.sync_fingerprint = self._order_fingerprint(data, line_fingerprints, lines_key)
+        if unmatched:
+            _logger.warning("%s : ligne(s) %s sans ligne locale correspondante, laissées sans clé",
+                            order.display_name, ', '.join(map(str, unmatched)))
+
+    def _remove_stale_lines(self, order, seen_keys, qty_field, confirmed):
+        """Lignes synchronisées disparues d'Odoo11 : supprimées, ou mises à quantité nulle si la
+        commande est confirmée. Les lignes sans clé (saisies localement ou d'avant les empreintes)
+        ne sont jamais touchées.
+        """
+        stale = order.order_line.filtered(
+            lambda line: not line.display_type and line.sync_line_key and line.sync_line_key not in seen_keys
+        )
+        if not stale:
+            return
+        if confirmed:
+            # Sans empreinte : si la ligne revient à l'identique, elle est réécrite avec sa quantité
+            stale.write({qty_field: 0, 'sync_fingerprint': False})
+        else:
+            stale.unlink()
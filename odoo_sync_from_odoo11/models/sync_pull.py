@@ -0,0 +1,223 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from ..tools.odoo_rpc import get_client
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Lecture Odoo11 par type de document : modèle, filtre, lignes, et champs au format
+# des payloads push {clé du payload: champ Odoo11} (voir tools/payload_schema.py)
+PULL_SPECS = {
+    'sale_order': {
+        'model': 'sale.order',
+        'fields': {
+            'name': 'name', 'partner_id': 'partner_id', 'warehouse_id': 'warehouse_id', 'user_id': 'user_id',
+            'amount_total': 'amount_total', 'project': 'analytic_account_id',
+        },
+        'domain': [('state', 'in', ['sale', 'done'])],
+        'line_model': 'sale.order.line',
+        'line_parent': 'order_id',
+        'lines_key': 'order_lines_data',
+        'line_fields': {
+            'product_id': 'product_id', 'product_uom_qty': 'product_uom_qty', 'price_unit': 'price_unit',
+            'name': 'name', 'taxes_id': 'tax_id',
+        },
+    },
+    'purchase_order': {
+        'model': 'purchase.order',
+        'fields': {
+            'name': 'name', 'partner_id': 'partner_id', 'date_order': 'date_order', 'partner_ref': 'partner_ref',
+            'date_approve': 'date_approve', 'currency_id': 'currency_id', 'notes': 'notes',
+            'dossier_data': 'dossier_id',
+        },
+        'domain': [('state', 'in', ['purchase', 'done'])],
+        'line_model': 'purchase.order.line',
+        'line_parent': 'order_id',
+        'lines_key': 'order_lines_data',
+        'line_fields': {
+            'product_id': 'product_id', 'product_qty': 'product_qty', 'price_unit': 'price_unit',
+            'name': 'name', 'date_planned': 'date_planned', 'taxes_id': 'taxes_id',
+        },
+    },
+    'account_invoice': {
+        'model': 'account.invoice',
+        'fields': {
+            'number': 'number', 'origin': 'origin', 'partner_id': 'partner_id', 'user_id': 'user_id',
+            'date_invoice': 'date_invoice', 'amount_total': 'amount_total', 'state': 'state',
+        },
+        'domain': [('type', '=', 'out_invoice'), ('state', 'in', ['open', 'paid'])],
+        'line_model': 'account.invoice.line',
+        'line_parent': 'invoice_id',
+        'lines_key': 'invoice_lines_data',
+        'line_fields': {
+            'product_id': 'product_id', 'quantity': 'quantity', 'price_unit': 'price_unit',
+            'discount': 'discount', 'name': 'name', 'taxes_id': 'invoice_line_tax_ids',
+        },
+    },
+}
+
+
+class OdooSyncPull(models.Model):
+    """Synchronisation en mode pull : lecture des documents modifiés dans Odoo11
+    depuis le dernier write_date traité (filigrane), par pages de search_read.
+
+    Odoo11 renvoie write_date tronqué à la seconde alors que la colonne garde les
+    microsecondes : le filigrane est donc une seconde entière, relue avec >=, et
+    les ids déjà traités dans cette seconde sont exclus.
+    """
+    _name = 'odoo.sync.pull'
+    _description = 'Synchronisation pull depuis Odoo11'
+    _rec_name = 'kind'
+
+    kind = fields.Selection([
+        ('sale_order', 'Commande client'),
+        ('purchase_order', "Commande d'achat"),
+        ('account_invoice', 'Facture client'),
+    ], string='Type', required=True)
+    active = fields.Boolean(default=True)
+    last_write_date = fields.Char(string='Dernier write_date Odoo11', help="Filigrane : write_date Odoo11 (UTC) du dernier document traité")
+    last_ids = fields.Text(
+        string='IDs Odoo11 traités', default='[]',
+        help="Ids (JSON) des documents déjà traités dont le write_date est la seconde du filigrane",
+    )
+    last_run = fields.Datetime(string='Dernière exécution')
+    last_error = fields.Text(string='Dernière erreur')
+
+    _sql_constraints = [
+        ('kind_uniq', 'unique(kind)', 'Un seul filigrane par type de document'),
+    ]
+
+    def write(self, vals):
+        # Filigrane déplacé à la main : les ids traités se rapportaient à l'ancienne seconde
+        if 'last_write_date' in vals and 'last_ids' not in vals:
+            vals = dict(vals, last_ids='[]')
+        return super().write(vals)
+
+    @api.model
+    def _get_client(self):
+        """Client Odoo11 : paramètres système odoo_sync_from_odoo11.remote_url, remote_db,
+        remote_login et remote_password (mot de passe ou clé API)
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        params = [ICP.get_param('odoo_sync_from_odoo11.remote_%s' % key) for key in ('url', 'db', 'login', 'password')]
+        if not all(params):
+            raise UserError("Connexion Odoo11 non configurée (paramètres odoo_sync_from_odoo11.remote_*)")
+        return get_client(*params)
+
+    @api.model
+    def _cron_pull(self):
+        """Tire les modifications Odoo11 pour chaque type de document actif"""
+        for stream in self.search([]):
+            try:
+                stream._pull()
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Synchronisation pull %s interrompue : %s", stream.kind, e)
+                stream.write({'last_error': str(e), 'last_run': fields.Datetime.now()})
+                self.env.cr.commit()
+
+    def _pull(self):
+        """Lit les documents modifiés par pages triées sur (write_date, id).
+
+        Chaque page est traitée puis validée avec le filigrane : une interruption
+        reprend à la page suivante, sans relire ce qui a été traité. Les ids traités
+        de la seconde du filigrane sont exclus de la lecture suivante : même si plus
+        d'une page de documents partagent cette seconde, chaque page avance.
+        """
+        self.ensure_one()
+        ICP = self.env['ir.config_parameter'].sudo()
+        page_size = int(ICP.get_param('odoo_sync_from_odoo11.pull_page_size', 500))
+        client = self._get_client()
+        spec = PULL_SPECS[self.kind]
+        while True:
+            domain = list(spec['domain'])
+            processed_ids = json.loads(self.last_ids or '[]')
+            if self.last_write_date:
+                domain.append(('write_date', '>=', self.last_write_date))
+                if processed_ids:
+                    domain.append(('id', 'not in', processed_ids))
+            records = client.search_read(
+                spec['model'], domain, list(spec['fields'].values()) + ['write_date'], limit=page_size, order='write_date, id',
+            )
+            if not records:
+                break
+
+            # Lignes de toute la page en un seul appel
+            lines_by_order = {}
+            if spec['line_model']:
+                parent = spec['line_parent']
+                lines = client.search_read(
+                    spec['line_model'], [(parent, 'in', [record['id'] for record in records])],
+                    list(spec['line_fields'].values()) + [parent], order='%s, sequence, id' % parent,
+                )
+                for line in lines:
+                    lines_by_order.setdefault(line[parent][0], []).append(line)
+
+            payloads = [self._to_payload(record, lines_by_order.get(record['id'], [])) for record in records]
+            self._process_payloads(payloads)
+            last_write_date = records[-1]['write_date']
+            if last_write_date != self.last_write_date:
+                processed_ids = []
+            processed_ids += [record['id'] for record in records if record['write_date'] == last_write_date]
+            self.write({
+                'last_write_date': last_write_date,
+                'last_ids': json.dumps(processed_ids),
+                'last_run': fields.Datetime.now(),
+                'last_error': False,
+            })
+            self.env.cr.commit()
+            _logger.info("Synchronisation pull %s : %s document(s) jusqu'à %s", self.kind, len(records), last_write_date)
+            if len(records) < page_size:
+                break
+
+    def _to_payload(self, record, lines):
+        """Convertit un enregistrement lu dans Odoo11 au format exact des payloads reçus en push.
+
+        Mêmes clés, mêmes formats et lignes sans id : les empreintes d'un document
+        sont identiques qu'il arrive par push ou par pull.
+        """
+        spec = PULL_SPECS[self.kind]
+        payload = {key: self._pushed_value(key, record.get(field)) for key, field in spec['fields'].items()}
+        payload[spec['lines_key']] = [
+            {key: self._pushed_value(key, line.get(field)) for key, field in spec['line_fields'].items()}
+            for line in lines
+        ]
+        return payload
+
+    def _pushed_value(self, key, value):
+        """Valeur Odoo11 lue par search_read, au format du payload push pour cette clé"""
+        if key == 'taxes_id':
+            return [6, 0, value or []]
+        if key == 'project':
+            # Compte analytique [id, nom] : le push n'en transmet que le nom
+            return value[1] if value else False
+        if key == 'dossier_data':
+            return {'name': value[1]} if value else False
+        return value
+
+    def _process_payloads(self, payloads):
+        """Même traitement que les routes HTTP ; les documents en échec passent dans la file
+        d'attente, qui les rejoue et conserve l'erreur
+        """
+        processor = self.env['odoo.sync.processor'].sudo()
+        if self.kind == 'sale_order':
+            results = processor._process_sale_orders(payloads)
+        elif self.kind == 'account_invoice':
+            results = processor._process_account_invoices(payloads)
+        else:
+            results = []
+            for payload in payloads:
+                # Le processeur isole le document et enregistre ses erreurs : un résultat
+                # en erreur ne doit rien annuler, seule une exception imprévue l'est
+                try:
+                    with self.env.cr.savepoint():
+                        result = processor._process_payload(self.kind, payload)
+                except Exception as e:
+                    result = {"status": "error", "message": str(e)}
+                results.append(result)
+
+        failed = [payload for payload, result in zip(payloads, results) if result.get('status') == 'error']
+        if failed:
+            _logger.warning("Synchronisation pull %s : %s document(s) en échec mis en file d'attente", self.kind, len(failed))
+            self.env['odoo.sync.queue'].sudo()._enqueue(self.kind, failed)
@@ -0,0 +1,124 @@
+from odoo import models, fields, api
+from odoo.service.model import PG_CONCURRENCY_EXCEPTIONS_TO_RETRY
+from odoo.tools import str2bool
+import logging
+import json
+
+_logger = logging.getLogger(__name__)
+
+
+class OdooSyncQueue(models.Model):
+    _name = 'odoo.sync.queue'
+    _description = "File d'attente des synchronisations Odoo11"
+    _order = 'id desc'
+
+    kind = fields.Selection([
+        ('sale_order', 'Commande client'),
+        ('purchase_order', "Commande d'achat"),
+        ('account_invoice', 'Facture client'),
+    ], string='Type', required=True)
+    name = fields.Char(string='Document')
+    payload = fields.Text(string='Payload', required=True)
+    company_id = fields.Many2one('res.company', string='Société', required=True, default=lambda self: self.env.company)
+    state = fields.Selection([
+        ('pending', 'En attente'),
+        ('done', 'Traité'),
+        ('error', 'En erreur'),
+    ], string='État', default='pending', required=True, index=True)
+    retry_count = fields.Integer(string='Tentatives', default=0)
+    last_error = fields.Text(string='Dernière erreur')
+    result = fields.Text(string='Résultat')
+    processed_date = fields.Datetime(string='Traité le')
+
+    @api.model
+    def _is_async_enabled(self):
+        """Mode asynchrone activé par le paramètre système odoo_sync_from_odoo11.async_mode"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        return str2bool(ICP.get_param('odoo_sync_from_odoo11.async_mode', 'False'), False)
+
+    @api.model
+    def _enqueue(self, kind, payloads):
+        """Enregistre les payloads bruts, un enregistrement par document"""
+        return self.create([{
+            'kind': kind,
+            # Facture : numéro, à défaut origine
+            'name': (payload.get('name') or payload.get('number') or payload.get('origin')) if isinstance(payload, dict) else False,
+            'payload': json.dumps(payload),
+        } for payload in payloads])
+
+    @api.model
+    def _cron_process_queue(self, batch_size=None):
+        """Vide la file par lots.
+
+        Les lignes sont réservées avec FOR UPDATE SKIP LOCKED : plusieurs crons
+        (ou shells) peuvent donc traiter la file en parallèle sans se bloquer.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = batch_size or int(ICP.get_param('odoo_sync_from_odoo11.queue_batch_size', 100))
+        last_id = 0
+        while True:
+            # Requête SQL directe : les écritures ORM en attente doivent être visibles
+            self.flush_model(['state'])
+            self.env.cr.execute("""
+                SELECT id FROM odoo_sync_queue
+                 WHERE state = 'pending' AND id > %s
+                 ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, (last_id, batch_size))
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            if not ids:
+                break
+            self.browse(ids)._process()
+            last_id = ids[-1]
+            # Commit par lot : rend le travail durable et libère les verrous
+            self.env.cr.commit()
+
+    def _process(self):
+        """Traite chaque payload et enregistre le résultat.
+
+        Le processeur isole déjà chaque document dans un savepoint et enregistre
+        ses résultats (erreurs, statuts à renvoyer) en dehors : un résultat en
+        erreur ne doit donc rien annuler. Le savepoint d'ici ne couvre que les
+        exceptions que le processeur n'a pas pu convertir en résultat.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_retries = int(ICP.get_param('odoo_sync_from_odoo11.queue_max_retries', 5))
+        for record in self:
+            # Version datée de sa réception : un rejeu de l'archive ne la remplacera pas par une plus ancienne
+            processor = self.env['odoo.sync.processor'].sudo().with_company(record.company_id).with_context(
+                sync_received_at=record.create_date,
+            )
+            try:
+                with self.env.cr.savepoint():
+                    result = processor._process_payload(record.kind, json.loads(record.payload))
+            except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY as e:
+                # Document traité en parallèle : reste en attente sans consommer de tentative
+                _logger.info("File %s (%s) reportée : %s", record.id, record.name, e)
+            except Exception as e:
+                record._record_failure(str(e), max_retries)
+            else:
+                if result.get('status') == 'error':
+                    record._record_failure(result.get('message'), max_retries, result)
+                else:
+                    record.write({
+                        'state': 'done',
+                        'result': json.dumps(result),
+                        'last_error': False,
+                        'processed_date': fields.Datetime.now(),
+                    })
+
+    def _record_failure(self, message, max_retries, result=None):
+        """Tentative échouée : de nouveau en attente, ou en erreur après max_retries"""
+        retry_count = self.retry_count + 1
+        _logger.warning("Échec traitement file %s (%s) tentative %s : %s", self.id, self.name, retry_count, message)
+        self.write({
+            'state': 'error' if retry_count >= max_retries else 'pending',
+            'retry_count': retry_count,
+            'last_error': message,
+            'result': json.dumps(result) if result else False,
+        })
+
+    def action_retry(self):
+        """Remet les payloads en erreur dans la file"""
+        self.filtered(lambda r: r.state == 'error').write({'state': 'pending', 'retry_count': 0})
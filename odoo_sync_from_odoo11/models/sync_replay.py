@@ -0,0 +1,251 @@
+from odoo import models, api
+from odoo.exceptions import UserError
+from odoo.service.model import PG_CONCURRENCY_EXCEPTIONS_TO_RETRY
+from odoo.tools import config
+from .sync_processor import SYNCED_DOCUMENTS
+from ..tools.payload_archive import (
+    archive_files, iter_archive, iter_documents, iter_partition, received_datetime, split_archive,
+)
+import logging
+import multiprocessing
+import os
+import queue
+import runpy
+import shutil
+import tempfile
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Échecs détaillés conservés dans le rapport (les suivants sont seulement comptés)
+MAX_REPORTED_FAILURES = 200
+
+
+class OdooSyncReplay(models.AbstractModel):
+    """Rejeu des payloads archivés (odoo_sync_from_odoo11.payload_archive_dir).
+
+    Les documents passent par les mêmes traitements que les routes. Une version
+    reçue avant la dernière version appliquée au document (sync_date) est ignorée :
+    rejouer une plage ne ramène jamais un document à un état antérieur.
+    Depuis odoo-bin shell :
+
+        env['odoo.sync.replay']._replay(date_from='2024-05-02', workers=4)
+
+    Les workers sont des interpréteurs neufs (multiprocessing 'spawn', voir
+    tools/replay_worker.py) : rien n'est hérité du serveur, même lancé depuis
+    une action serveur. Préférer alors des plages de dates courtes.
+    """
+    _name = 'odoo.sync.replay'
+    _description = "Rejeu des payloads Odoo11 archivés"
+
+    @api.model
+    def _replay(self, date_from=None, date_to=None, directory=None, workers=4, batch_size=50, report_interval=10):
+        """Rejoue l'archive, partitionnée par document entre workers processus.
+
+        Un document est toujours traité par le même worker, dans l'ordre de
+        réception : ses versions successives sont appliquées dans l'ordre, sauf
+        celles antérieures à la version déjà appliquée (comptées en dépassées).
+        Le rejeu a son propre curseur par worker et valide par lot de batch_size.
+        Retourne le rapport : documents, erreurs, ignorés, dépassés, durée, débit, échecs.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        directory = directory or ICP.get_param('odoo_sync_from_odoo11.payload_archive_dir')
+        if not directory:
+            raise UserError("Aucune archive : renseigner odoo_sync_from_odoo11.payload_archive_dir")
+        files = archive_files(directory, self.env.cr.dbname, date_from, date_to)
+        if not files:
+            raise UserError("Aucun fichier d'archive pour cette période")
+        workers = max(1, int(workers))
+        _logger.info("Rejeu de %s fichier(s) d'archive avec %s worker(s)", len(files), workers)
+
+        report = {'documents': 0, 'errors': 0, 'skipped': 0, 'outdated': 0, 'failures': []}
+        started = time.monotonic()
+        if workers == 1:
+            last_report = [started]
+
+            def collect(message):
+                self._collect(report, message)
+                if time.monotonic() - last_report[0] >= report_interval:
+                    self._log_progress(report, started)
+                    last_report[0] = time.monotonic()
+            with self.env.registry.cursor() as cr:
+                self.with_env(self.env(cr=cr))._replay_documents(iter_documents(iter_archive(files)), batch_size, collect)
+        else:
+            self._replay_processes(files, workers, batch_size, report, started, report_interval)
+
+        duration = time.monotonic() - started
+        report.update(duration=round(duration, 1), rate=round(report['documents'] / duration, 1) if duration else 0.0)
+        _logger.info(
+            "Rejeu terminé : %s document(s) en %.1f s (%.1f doc/s), %s erreur(s), %s ignoré(s), %s dépassé(s)",
+            report['documents'], duration, report['rate'], report['errors'], report['skipped'], report['outdated'],
+        )
+        return report
+
+    @api.model
+    def _replay_processes(self, files, workers, batch_size, report, started, report_interval):
+        """Répartit l'archive par partition, lance un processus par partition et agrège
+        leurs messages de progression
+        """
+        directory = tempfile.mkdtemp(prefix='odoo-sync-replay-')
+        try:
+            # Archive lue une seule fois : chaque worker ne lit que sa partition
+            partitions, skipped = split_archive(iter_documents(iter_archive(files)), workers, directory)
+            report['skipped'] += skipped
+
+            # spawn : interpréteur neuf, ni threads ni connexions du serveur dans l'enfant
+            context = multiprocessing.get_context('spawn')
+            messages = context.Queue()
+            worker_script = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tools', 'replay_worker.py')
+            processes = [
+                context.Process(
+                    target=runpy.run_path,
+                    args=(worker_script,),
+                    kwargs={'run_name': '__main__', 'init_globals': {
+                        'options': dict(config.options),
+                        'dbname': self.env.cr.dbname,
+                        'filename': filename,
+                        'batch_size': batch_size,
+                        'messages': messages,
+                    }},
+                    name='odoo-sync-replay-%s' % index,
+                )
+                for index, filename in enumerate(partitions)
+            ]
+            for process in processes:
+                process.start()
+            last_report = time.monotonic()
+            while any(process.is_alive() for process in processes) or not messages.empty():
+                try:
+                    self._collect(report, messages.get(timeout=1))
+                except queue.Empty:
+                    pass
+                if time.monotonic() - last_report >= report_interval:
+                    self._log_progress(report, started)
+                    last_report = time.monotonic()
+            for process in processes:
+                process.join()
+                if process.exitcode:
+                    report['errors'] += 1
+                    report['failures'].append({'worker': process.name, 'message': "Arrêt anormal (code %s)" % process.exitcode})
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @api.model
+    def _replay_file(self, filename, batch_size, report):
+        """Corps d'un worker : rejoue sa partition (voir tools/replay_worker.py)"""
+        try:
+            self._replay_documents(iter_partition(filename), batch_size, report)
+        except Exception as e:
+            _logger.exception("Worker de rejeu %s arrêté : %s", filename, e)
+            raise
+
+    @api.model
+    def _replay_documents(self, documents, batch_size, report):
+        """Rejoue les documents (type, clé, payload, réception), par lots de même type.
+
+        Un lot est coupé au changement de type et quand un document y revient :
+        les lots traitent les doublons comme une seule livraison, or le rejeu
+        doit appliquer chaque version.
+        """
+        batch_kind, batch, keys = None, [], set()
+        for kind, key, payload, received_at in documents:
+            if kind is None:
+                report(('skipped', key))
+                continue
+            if batch and (kind != batch_kind or key in keys or len(batch) >= batch_size):
+                self._replay_batch(batch_kind, batch, report)
+                batch, keys = [], set()
+            batch_kind = kind
+            batch.append((key, payload, received_at))
+            keys.add(key)
+        if batch:
+            self._replay_batch(batch_kind, batch, report)
+
+    @api.model
+    def _replay_batch(self, kind, batch, report, max_retries=3):
+        """Traite un lot et le valide ; rejoué après une erreur de concurrence.
+
+        Les versions reçues avant la dernière appliquée au document sont écartées ;
+        les documents appliqués prennent leur date de réception archivée.
+        """
+        env = self.env
+        processor = env['odoo.sync.processor'].sudo()
+        applied = self._applied_dates(kind, [key for key, payload, received_at in batch])
+        current = [
+            (key, payload, received_at) for key, payload, received_at in batch
+            if key not in applied or not received_at or received_datetime(received_at) > applied[key]
+        ]
+        if len(current) < len(batch):
+            report(('outdated', len(batch) - len(current)))
+            batch = current
+            if not batch:
+                return
+        payloads = [payload for key, payload, received_at in batch]
+        for attempt in range(max_retries + 1):
+            try:
+                if kind == 'sale_order':
+                    results = processor._process_sale_orders(payloads)
+                elif kind == 'account_invoice':
+                    results = processor._process_account_invoices(payloads)
+                else:
+                    results = [processor._process_payload(kind, payload) for payload in payloads]
+                for (key, payload, received_at), result in zip(batch, results):
+                    if received_at:
+                        processor._stamp_synced(kind, [result], received_datetime(received_at))
+                env.cr.commit()
+                break
+            except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY as e:
+                env.cr.rollback()
+                if attempt == max_retries:
+                    results = [{"status": "error", "message": str(e)}] * len(batch)
+                    break
+                time.sleep(0.5 * 2 ** attempt)
+            except Exception as e:
+                env.cr.rollback()
+                _logger.exception("Rejeu d'un lot %s impossible : %s", kind, e)
+                results = [{"status": "error", "message": str(e)}] * len(batch)
+                break
+        # Mémoire bornée : le cache ORM du lot validé n'est plus utile
+        env.invalidate_all()
+        failures = [
+            (kind, key, result.get('message'))
+            for (key, payload, received_at), result in zip(batch, results) if result.get('status') == 'error'
+        ]
+        report(('done', len(batch), failures))
+
+    @api.model
+    def _applied_dates(self, kind, keys):
+        """Date de la dernière version appliquée (sync_date) des documents existants, par clé Odoo11"""
+        model_name, id_field, key_field = SYNCED_DOCUMENTS[kind]
+        applied = {}
+        for document in self.env[model_name].sudo().search_read(
+            [(key_field, 'in', list(set(keys))), ('sync_date', '!=', False)], [key_field, 'sync_date'],
+        ):
+            key = document[key_field]
+            applied[key] = max(applied.get(key, document['sync_date']), document['sync_date'])
+        return applied
+
+    @api.model
+    def _collect(self, report, message):
+        if message[0] == 'skipped':
+            report['skipped'] += 1
+            return
+        if message[0] == 'outdated':
+            report['outdated'] += message[1]
+            return
+        done, failures = message[1], message[2]
+        report['documents'] += done
+        report['errors'] += len(failures)
+        room = MAX_REPORTED_FAILURES - len(report['failures'])
+        report['failures'] += [
+            {'kind': kind, 'name': key, 'message': error} for kind, key, error in failures[:max(room, 0)]
+        ]
+
+    @api.model
+    def _log_progress(self, report, started):
+        elapsed = time.monotonic() - started
+        _logger.info(
+            "Rejeu : %s document(s), %.1f doc/s, %s erreur(s), %s ignoré(s), %s dépassé(s)",
+            report['documents'], report['documents'] / elapsed if elapsed else 0.0,
+            report['errors'], report['skipped'], report['outdated'],
+        )
@@ -0,0 +1,4 @@
+from . import test_sync_pull
+from . import test_sync_outbox
+from . import test_sync_queue
+from . import test_sync_replay
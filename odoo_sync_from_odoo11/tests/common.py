@@ -0,0 +1,155 @@
+"""Bouchon local d'Odoo11 pour les tests : JSON-RPC (/jsonrpc) et route de retour des statuts"""
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _to_datetime(value):
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f' if '.' in value else '%Y-%m-%d %H:%M:%S')
+
+
+def _value(record, field):
+    value = record.get(field, False)
+    # Many2one lu comme [id, nom] : les domaines portent sur l'id
+    return value[0] if isinstance(value, list) and len(value) == 2 else value
+
+
+def _leaf(record, field, operator, operand):
+    value = _value(record, field)
+    if isinstance(value, datetime) and isinstance(operand, str):
+        # Comme PostgreSQL : la colonne garde les microsecondes, la valeur comparée non
+        operand = _to_datetime(operand)
+    if operator == '=':
+        return value == operand
+    if operator == '!=':
+        return value != operand
+    if operator == 'in':
+        return value in operand
+    if operator == 'not in':
+        return value not in operand
+    if operator == '>':
+        return value > operand
+    if operator == '>=':
+        return value >= operand
+    if operator == '<':
+        return value < operand
+    if operator == '<=':
+        return value <= operand
+    raise ValueError("Opérateur non géré par le bouchon : %s" % operator)
+
+
+def _evaluate(domain, record):
+    """Domaine Odoo en notation polonaise ('&', '|', '!' et feuilles)"""
+    stack = []
+    for item in reversed(domain):
+        if item in ('&', '|'):
+            first, second = stack.pop(), stack.pop()
+            stack.append(first and second if item == '&' else first or second)
+        elif item == '!':
+            stack.append(not stack.pop())
+        else:
+            stack.append(_leaf(record, *item))
+    return all(stack)
+
+
+class StubOdooServer:
+    """Odoo11 simulé : enregistrements par modèle, appels reçus, pannes programmées.
+
+    write_date est conservé avec les microsecondes et renvoyé tronqué à la
+    seconde, comme par le search_read d'Odoo11.
+    """
+
+    def __init__(self, max_calls=200):
+        self.records = {}
+        self.calls = []
+        self.statuses = []
+        self.failures = 0
+        self.max_calls = max_calls
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.url = 'http://127.0.0.1:%s' % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset(self):
+        with self.lock:
+            self.records.clear()
+            self.calls.clear()
+            self.statuses.clear()
+            self.failures = 0
+
+    def add(self, model, **vals):
+        self.records.setdefault(model, []).append(vals)
+
+    def search_read(self, model, domain, fields, limit=None, order=None):
+        records = [record for record in self.records.get(model, []) if _evaluate(domain, record)]
+        # Tris stables successifs, de la dernière clé à la première
+        for field in reversed((order or 'id').split(',')):
+            field = field.split()[0]
+            records.sort(key=lambda record: _value(record, field))
+        if limit:
+            records = records[:limit]
+        return [self._read(record, fields) for record in records]
+
+    def _read(self, record, fields):
+        values = {'id': record['id']}
+        for field in fields:
+            value = record.get(field, False)
+            if isinstance(value, datetime):
+                value = value.strftime('%Y-%m-%d %H:%M:%S')
+            values[field] = value
+        return values
+
+    def _rpc(self, service, method, args):
+        if len(self.calls) > self.max_calls:
+            raise RuntimeError("Trop d'appels : la pagination ne progresse pas")
+        if (service, method) == ('common', 'login'):
+            return 1
+        if (service, method) == ('object', 'execute_kw') and args[4] == 'search_read':
+            return self.search_read(args[3], args[5][0], **args[6])
+        raise ValueError("Appel non géré par le bouchon : %s.%s" % (service, method))
+
+    def _dispatch(self, path, body):
+        params = body.get('params') or {}
+        with self.lock:
+            if path == '/jsonrpc':
+                self.calls.append((params.get('service'), params.get('method'), params.get('args')))
+                try:
+                    return 200, {'jsonrpc': '2.0', 'id': body.get('id'), 'result': self._rpc(
+                        params.get('service'), params.get('method'), params.get('args'),
+                    )}
+                except Exception as e:
+                    return 200, {'jsonrpc': '2.0', 'id': body.get('id'), 'error': {'message': str(e)}}
+            if self.failures:
+                self.failures -= 1
+                return 500, {'error': 'indisponible'}
+            self.statuses.append(params.get('statuses'))
+            return 200, {'jsonrpc': '2.0', 'result': {'status': 'success'}}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                status, response = stub._dispatch(self.path, json.loads(self.rfile.read(length) or b'{}'))
+                content = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,84 @@
+from datetime import timedelta
+import json
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from .common import StubOdooServer
+
+
+@tagged('post_install', '-at_install')
+class TestSyncOutbox(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = StubOdooServer().start()
+        cls.addClassCleanup(cls.stub.stop)
+        cls.feedback_url = '%s/odoo11_sync/status' % cls.stub.url
+        cls.env['ir.config_parameter'].sudo().set_param('odoo_sync_from_odoo11.feedback_url', cls.feedback_url)
+        cls.Outbox = cls.env['odoo.sync.outbox'].sudo()
+
+    def setUp(self):
+        super().setUp()
+        self.stub.reset()
+        # L'envoi valide chaque lot par commit : sans effet dans la transaction du test
+        self.patch(self.env.cr, 'commit', lambda: None)
+
+    def _sent_statuses(self):
+        return [(status['name'], status['status']) for statuses in self.stub.statuses for status in statuses]
+
+    def test_only_latest_status_is_sent(self):
+        first = self.Outbox._add('sale_order', [('SO1', {'status': 'error', 'message': 'Client inconnu'})])
+        latest = self.Outbox._add('sale_order', [('SO1', {'status': 'success', 'sale_order_id': 7})])
+        other = self.Outbox._add('purchase_order', [('SO1', {'status': 'success', 'purchase_id': 3})])
+        self.Outbox._cron_send()
+
+        self.assertEqual(sorted(self._sent_statuses()), [('SO1', 'success'), ('SO1', 'success')])
+        self.assertEqual(len(self.stub.statuses), 1, "Un seul lot pour la destination")
+        self.assertEqual((first | latest | other).mapped('state'), ['sent'] * 3)
+        self.assertEqual(json.loads(latest.payload)['local_id'], 7)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        record = self.Outbox._add('sale_order', [('SO1', {'status': 'success', 'sale_order_id': 7})])
+        self.stub.failures = 1
+        before = fields.Datetime.now()
+        self.Outbox._cron_send()
+
+        self.assertEqual(record.state, 'pending')
+        self.assertEqual(record.attempt_count, 1)
+        self.assertTrue(record.last_error)
+        # Première attente : 30 s à ±20 %
+        self.assertGreaterEqual(record.next_attempt, before + timedelta(seconds=23))
+        self.assertLessEqual(record.next_attempt, before + timedelta(seconds=37))
+
+        # Pas encore dû : rien n'est renvoyé
+        self.Outbox._cron_send()
+        self.assertEqual(self.stub.statuses, [])
+
+        record.next_attempt = fields.Datetime.now() - timedelta(seconds=1)
+        self.Outbox._cron_send()
+        self.assertEqual(record.state, 'sent')
+        self.assertEqual(self._sent_statuses(), [('SO1', 'success')])
+
+    def test_backoff_grows_then_stops_at_max_attempts(self):
+        self.env['ir.config_parameter'].sudo().set_param('odoo_sync_from_odoo11.feedback_max_attempts', 3)
+        record = self.Outbox._add('sale_order', [('SO1', {'status': 'success', 'sale_order_id': 7})])
+        self.stub.failures = 3
+        delays = []
+        for attempt in range(3):
+            record.next_attempt = fields.Datetime.now() - timedelta(seconds=1)
+            now = fields.Datetime.now()
+            self.Outbox._cron_send()
+            delays.append((record.next_attempt - now).total_seconds())
+
+        self.assertEqual(record.state, 'error')
+        self.assertEqual(record.attempt_count, 3)
+        self.assertLess(delays[0], delays[1])
+        self.assertLess(delays[1], delays[2])
+        self.assertEqual(self.stub.statuses, [])
+
+        record.action_retry()
+        self.Outbox._cron_send()
+        self.assertEqual(record.state, 'sent')
+
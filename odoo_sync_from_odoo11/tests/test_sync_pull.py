@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+import json
+
+from odoo.tests import TransactionCase, tagged
+
+from .common import StubOdooServer
+
+
+@tagged('post_install', '-at_install')
+class TestSyncPull(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = StubOdooServer().start()
+        cls.addClassCleanup(cls.stub.stop)
+        ICP = cls.env['ir.config_parameter'].sudo()
+        for key, value in (('url', cls.stub.url), ('db', 'odoo11'), ('login', 'admin'), ('password', 'admin')):
+            ICP.set_param('odoo_sync_from_odoo11.remote_%s' % key, value)
+        ICP.set_param('odoo_sync_from_odoo11.pull_page_size', 2)
+        cls.pull = cls.env.ref('odoo_sync_from_odoo11.odoo_sync_pull_sale_order')
+        cls.second = datetime(2024, 5, 2, 8, 0, 0)
+
+    def setUp(self):
+        super().setUp()
+        self.stub.reset()
+        self.pull.write({'last_write_date': False})
+        self.processed = []
+        self.patch(type(self.pull), '_process_payloads', lambda pull, payloads: self.processed.extend(
+            payload['name'] for payload in payloads
+        ))
+        # Une page est validée par commit : sans effet dans la transaction du test
+        self.patch(self.env.cr, 'commit', lambda: None)
+
+    def _add_orders(self, *orders):
+        for order_id, write_date in orders:
+            self.stub.add('sale.order', id=order_id, name='SO%s' % order_id, state='sale', write_date=write_date)
+
+    def test_pages_follow_write_date(self):
+        self._add_orders(*[(order_id, self.second + timedelta(seconds=order_id)) for order_id in range(1, 6)])
+        self.pull._pull()
+        self.assertEqual(self.processed, ['SO1', 'SO2', 'SO3', 'SO4', 'SO5'])
+        self.assertEqual(self.pull.last_write_date, '2024-05-02 08:00:05')
+        self.assertEqual(json.loads(self.pull.last_ids), [5])
+
+        # Rien de nouveau : rien n'est relu
+        self.processed.clear()
+        self.pull._pull()
+        self.assertEqual(self.processed, [])
+
+    def test_write_date_ties_larger_than_a_page(self):
+        # Écriture de masse : plus d'une page dans la même seconde, microsecondes hors de l'ordre des ids
+        self._add_orders(*[
+            (order_id, self.second.replace(microsecond=microsecond))
+            for order_id, microsecond in ((5, 100), (2, 200), (4, 300), (1, 400), (3, 500))
+        ], (6, self.second + timedelta(seconds=1)))
+        self.pull._pull()
+        self.assertEqual(sorted(self.processed), ['SO1', 'SO2', 'SO3', 'SO4', 'SO5', 'SO6'])
+        self.assertEqual(len(self.processed), 6, "Chaque document est traité une seule fois")
+        self.assertEqual(self.pull.last_write_date, '2024-05-02 08:00:01')
+        self.assertEqual(json.loads(self.pull.last_ids), [6])
+
+    def test_late_document_in_watermark_second(self):
+        self._add_orders((1, self.second.replace(microsecond=10)), (2, self.second.replace(microsecond=20)))
+        self.pull._pull()
+        self.assertEqual(self.processed, ['SO1', 'SO2'])
+        self.assertEqual(json.loads(self.pull.last_ids), [1, 2])
+
+        # Validé dans Odoo11 après la lecture, avec un write_date de la même seconde
+        self.processed.clear()
+        self._add_orders((3, self.second.replace(microsecond=15)))
+        self.pull._pull()
+        self.assertEqual(self.processed, ['SO3'])
+        self.assertEqual(sorted(json.loads(self.pull.last_ids)), [1, 2, 3])
+
+    def test_modified_document_is_read_again(self):
+        self._add_orders((1, self.second), (2, self.second + timedelta(seconds=1)))
+        self.pull._pull()
+        self.processed.clear()
+        self.stub.records['sale.order'][0]['write_date'] = self.second + timedelta(seconds=2)
+        self.pull._pull()
+        self.assertEqual(self.processed, ['SO1'])
+        self.assertEqual(self.pull.last_write_date, '2024-05-02 08:00:02')
+
+    def test_moving_watermark_resets_processed_ids(self):
+        self.pull.write({'last_write_date': '2024-05-02 08:00:00', 'last_ids': '[1]'})
+        self.pull.write({'last_write_date': '2024-05-01 00:00:00'})
+        self.assertEqual(json.loads(self.pull.last_ids), [])
+
+    def test_payload_has_push_shape(self):
+        payloads = []
+        self.patch(type(self.pull), '_process_payloads', lambda pull, page: payloads.extend(page))
+        self.stub.add(
+            'sale.order', id=1, name='SO1', state='sale', write_date=self.second, partner_id=[7, 'Client'],
+            warehouse_id=False, user_id=[2, 'Vendeur'], amount_total=120.0, analytic_account_id=[4, 'Chantier A'],
+        )
+        self.stub.add(
+            'sale.order.line', id=31, order_id=[1, 'SO1'], sequence=10, product_id=[5, 'Vis'],
+            product_uom_qty=2.0, price_unit=60.0, name='Vis', tax_id=[9],
+        )
+        self.pull._pull()
+        self.assertEqual(payloads, [{
+            'name': 'SO1', 'partner_id': [7, 'Client'], 'warehouse_id': False, 'user_id': [2, 'Vendeur'],
+            'amount_total': 120.0, 'project': 'Chantier A',
+            'order_lines_data': [{
+                'product_id': [5, 'Vis'], 'product_uom_qty': 2.0, 'price_unit': 60.0, 'name': 'Vis', 'taxes_id': [6, 0, [9]],
+            }],
+        }])
+        # Même empreinte que le même document reçu en push, sans les champs vides
+        processor = self.env['odoo.sync.processor']
+        pushed = {key: value for key, value in payloads[0].items() if key != 'warehouse_id'}
+        self.assertEqual(processor._order_fingerprint(payloads[0]), processor._order_fingerprint(pushed))
@@ -0,0 +1,59 @@
+import json
+
+from odoo.tests import TransactionCase, tagged
+
+from .common import StubOdooServer
+
+
+@tagged('post_install', '-at_install')
+class TestSyncQueue(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = StubOdooServer().start()
+        cls.addClassCleanup(cls.stub.stop)
+        cls.env['ir.config_parameter'].sudo().set_param(
+            'odoo_sync_from_odoo11.feedback_url', '%s/odoo11_sync/status' % cls.stub.url,
+        )
+        cls.Queue = cls.env['odoo.sync.queue'].sudo()
+
+    def setUp(self):
+        super().setUp()
+        self.stub.reset()
+        self.patch(self.env.cr, 'commit', lambda: None)
+
+    def test_error_result_keeps_error_and_outbox(self):
+        record = self.Queue._enqueue('sale_order', [{'name': 'SO-QUEUE-1'}])
+        self.Queue._cron_process_queue()
+
+        self.assertEqual(record.state, 'pending')
+        self.assertEqual(record.retry_count, 1)
+        self.assertIn('partner_id', record.last_error)
+        errors = self.env['odoo.sync.error'].search([('name', '=', 'SO-QUEUE-1')])
+        self.assertEqual(len(errors), 1)
+        outbox = self.env['odoo.sync.outbox'].search([('name', '=', 'SO-QUEUE-1')])
+        self.assertEqual(outbox.status, 'error')
+
+        self.env['odoo.sync.outbox']._cron_send()
+        self.assertEqual(self.stub.statuses[0][0]['status'], 'error')
+
+    def test_unexpected_exception_rolls_back_business_writes(self):
+        def process_payload(processor, kind, data):
+            processor.env['res.partner'].create({'name': 'Client annulé'})
+            raise ValueError("Panne inattendue")
+        self.patch(type(self.env['odoo.sync.processor']), '_process_payload', process_payload)
+
+        record = self.Queue._enqueue('sale_order', [{'name': 'SO-QUEUE-2'}])
+        self.Queue._cron_process_queue()
+
+        self.assertEqual(record.state, 'pending')
+        self.assertEqual(record.last_error, "Panne inattendue")
+        self.assertFalse(self.env['res.partner'].search([('name', '=', 'Client annulé')]))
+
+    def test_last_retry_marks_error(self):
+        self.env['ir.config_parameter'].sudo().set_param('odoo_sync_from_odoo11.queue_max_retries', 1)
+        record = self.Queue._enqueue('sale_order', [{'name': 'SO-QUEUE-3'}])
+        self.Queue._cron_process_queue()
+        self.assertEqual(record.state, 'error')
+        self.assertEqual(json.loads(record.result)['status'], 'error')
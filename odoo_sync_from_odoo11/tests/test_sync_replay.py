@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestSyncReplay(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        partner = cls.env['res.partner'].create({'name': 'Client rejeu'})
+        cls.order = cls.env['sale.order'].create({
+            'name': 'SO-REPLAY-1',
+            'partner_id': partner.id,
+            'sync_date': datetime(2024, 5, 2, 12, 0),
+        })
+        cls.Replay = cls.env['odoo.sync.replay']
+
+    def setUp(self):
+        super().setUp()
+        self.patch(self.env.cr, 'commit', lambda: None)
+        self.processed = []
+
+        def process_sale_orders(processor, orders):
+            self.processed += [order['note'] for order in orders]
+            return [{"status": "success", "sale_order_id": self.order.id} for order in orders]
+        self.patch(type(self.env['odoo.sync.processor']), '_process_sale_orders', process_sale_orders)
+
+    def test_older_versions_are_not_replayed(self):
+        messages = []
+        self.Replay._replay_documents([
+            ('sale_order', 'SO-REPLAY-1', {'name': 'SO-REPLAY-1', 'note': 'v1'}, '2024-05-02T10:00:00+00:00'),
+            ('sale_order', 'SO-REPLAY-1', {'name': 'SO-REPLAY-1', 'note': 'v2'}, '2024-05-02T12:00:00+00:00'),
+            ('sale_order', 'SO-REPLAY-1', {'name': 'SO-REPLAY-1', 'note': 'v3'}, '2024-05-02T13:00:00+02:00'),
+        ], 50, messages.append)
+
+        self.assertEqual(self.processed, [], "Versions reçues avant ou à la dernière synchronisation")
+        self.assertEqual(messages, [('outdated', 1)] * 3)
+
+    def test_newer_version_is_replayed_and_dated(self):
+        messages = []
+        self.Replay._replay_documents([
+            ('sale_order', 'SO-REPLAY-1', {'name': 'SO-REPLAY-1', 'note': 'v4'}, '2024-05-02T14:00:00+00:00'),
+            ('sale_order', 'SO-REPLAY-1', {'name': 'SO-REPLAY-1', 'note': 'v3'}, '2024-05-02T13:00:00+00:00'),
+        ], 50, messages.append)
+
+        self.assertEqual(self.processed, ['v4'])
+        self.assertEqual(self.order.sync_date, datetime(2024, 5, 2, 14, 0))
+        self.assertEqual(messages, [('done', 1, []), ('outdated', 1)])
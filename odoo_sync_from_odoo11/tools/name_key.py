@@ -0,0 +1,13 @@
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_name(name):
+    """Clé de rapprochement d'un nom : minuscules, sans accents, espaces réduits"""
+    if not name:
+        return False
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    return _WHITESPACE.sub(' ', name.casefold()).strip() or False
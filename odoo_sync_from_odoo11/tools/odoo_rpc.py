@@ -0,0 +1,107 @@
+"""Appels JSON-RPC vers l'instance Odoo11.
+
+Les sessions HTTP sont conservées par worker : les connexions restent ouvertes
+(keep-alive) d'un appel et d'une exécution de cron à l'autre. N'importe quel
+serveur répondant au protocole JSON-RPC d'Odoo (ex. un bouchon local) convient.
+"""
+import itertools
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class OdooRpcError(Exception):
+    pass
+
+
+class OdooRpcClient:
+
+    def __init__(self, url, db, login, password, timeout=120, pool_size=4):
+        self.url = url.rstrip('/') + '/jsonrpc'
+        self.db = db
+        self.login = login
+        self.password = password
+        self.timeout = timeout
+        self.uid = None
+        self._ids = itertools.count(1)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=3)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def call(self, service, method, *args):
+        response = self.session.post(self.url, json={
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {'service': service, 'method': method, 'args': args},
+            'id': next(self._ids),
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        if body.get('error'):
+            error = body['error']
+            raise OdooRpcError((error.get('data') or {}).get('message') or error.get('message'))
+        return body.get('result')
+
+    def authenticate(self):
+        self.uid = self.call('common', 'login', self.db, self.login, self.password)
+        if not self.uid:
+            raise OdooRpcError("Authentification Odoo11 refusée pour %s" % self.login)
+        return self.uid
+
+    def execute_kw(self, model, method, args, kwargs=None):
+        if not self.uid:
+            self.authenticate()
+        return self.call('object', 'execute_kw', self.db, self.uid, self.password, model, method, args, kwargs or {})
+
+    def search_read(self, model, domain, fields, limit=None, order=None):
+        kwargs = {'fields': fields}
+        if limit:
+            kwargs['limit'] = limit
+        if order:
+            kwargs['order'] = order
+        return self.execute_kw(model, 'search_read', [domain], kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url, db, login, password):
+    """Client partagé par worker pour une même instance et un même utilisateur"""
+    key = (url, db, login, password)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = OdooRpcClient(url, db, login, password)
+        return _clients[key]
+
+
+_session = None
+
+
+def get_session(pool_size=10):
+    """Session HTTP partagée par les threads du worker, une réserve de connexions par hôte"""
+    global _session
+    with _clients_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def post_json(session, url, params, timeout=30, headers=None):
+    """POST d'un appel JSON-RPC vers une route type='json' ; lève OdooRpcError si la route répond une erreur"""
+    response = session.post(url, json={
+        'jsonrpc': '2.0',
+        'method': 'call',
+        'params': params,
+    }, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    body = response.json() if response.content else {}
+    if isinstance(body, dict) and body.get('error'):
+        error = body['error']
+        raise OdooRpcError((error.get('data') or {}).get('message') or error.get('message'))
+    return body.get('result') if isinstance(body, dict) else body
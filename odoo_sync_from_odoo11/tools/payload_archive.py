@@ -0,0 +1,139 @@
+"""Archive compressée des payloads reçus d'Odoo11 (JSON-lines gzip).
+
+Un fichier par jour et par processus, pour que les workers n'entrelacent
+jamais leurs écritures : <dossier>/<base>/payloads-AAAAMMJJ-<pid>.jsonl.gz
+"""
+import glob
+import gzip
+import heapq
+import itertools
+import json
+import os
+import re
+import zlib
+from datetime import datetime, timezone
+
+_FILENAME = re.compile(r'payloads-(\d{8})-\d+\.jsonl(\.gz)?$')
+
+# Routes archivées -> (type de document, clé de la liste des documents d'un lot)
+ROUTES = {
+    'sale_order': ('sale_order', None),
+    'sale_order_batch': ('sale_order', 'orders'),
+    'account_invoice': ('account_invoice', None),
+    'account_invoice_batch': ('account_invoice', 'invoices'),
+    'purchase_order': ('purchase_order', None),
+}
+
+
+def archive_payload(directory, dbname, route, data):
+    """Ajoute un payload à l'archive du jour"""
+    now = datetime.now(timezone.utc)
+    path = os.path.join(directory, dbname)
+    os.makedirs(path, exist_ok=True)
+    filename = os.path.join(path, 'payloads-%s-%s.jsonl.gz' % (now.strftime('%Y%m%d'), os.getpid()))
+    record = {'route': route, 'received_at': now.isoformat(), 'payload': data}
+    # Chaque ajout crée un membre gzip : les fichiers concaténés restent lisibles par gzip.open
+    with gzip.open(filename, 'ab') as archive:
+        archive.write(json.dumps(record).encode('utf-8') + b'\n')
+
+
+
+def archive_files(directory, dbname, date_from=None, date_to=None):
+    """Fichiers d'archive d'une base, éventuellement limités à des jours (AAAA-MM-JJ inclus)"""
+    files = []
+    for filename in sorted(glob.glob(os.path.join(directory, dbname, 'payloads-*.jsonl*'))):
+        match = _FILENAME.search(filename)
+        if not match:
+            continue
+        day = '%s-%s-%s' % (match.group(1)[:4], match.group(1)[4:6], match.group(1)[6:])
+        if (date_from and day < date_from) or (date_to and day > date_to):
+            continue
+        files.append((day, filename))
+    return files
+
+
+def _read_file(filename):
+    opener = gzip.open if filename.endswith('.gz') else open
+    with opener(filename, 'rb') as archive:
+        for line in archive:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_archive(files):
+    """Enregistrements {'route', 'received_at', 'payload'} des fichiers [(jour, fichier)],
+    lus à la demande et dans l'ordre de réception.
+
+    Les fichiers d'un même jour (un par processus) sont fusionnés sur received_at ;
+    un seul jour est ouvert à la fois.
+    """
+    for day, day_files in itertools.groupby(sorted(files), key=lambda entry: entry[0]):
+        yield from heapq.merge(
+            *(_read_file(filename) for day, filename in day_files),
+            key=lambda record: record['received_at'],
+        )
+
+
+def document_key(kind, payload):
+    """Identifiant Odoo11 d'un document : nom, numéro ou origine pour une facture"""
+    if not isinstance(payload, dict):
+        return False
+    if kind == 'account_invoice':
+        return payload.get('number') or payload.get('origin') or False
+    return payload.get('name') or False
+
+
+def iter_documents(records):
+    """Documents (type, clé, payload, réception) des enregistrements d'archive, lots dépliés.
+
+    Les routes en flux n'archivent que l'en-tête du document : elles sont
+    signalées avec le type None, pour être comptées sans être rejouées.
+    """
+    for record in records:
+        kind, list_key = ROUTES.get(record.get('route'), (None, None))
+        payload, received_at = record.get('payload'), record.get('received_at')
+        if kind is None:
+            yield None, record.get('route'), payload, received_at
+        elif list_key:
+            for document in (payload or {}).get(list_key) or []:
+                yield kind, document_key(kind, document), document, received_at
+        else:
+            yield kind, document_key(kind, payload), payload, received_at
+
+
+def received_datetime(received_at):
+    """Réception archivée (ISO 8601 avec fuseau) en datetime UTC naïf, comme les champs Datetime"""
+    return datetime.fromisoformat(received_at).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def partition(key, count):
+    """Partition stable d'une clé de document, identique dans tous les processus"""
+    return zlib.crc32(str(key).encode('utf-8')) % count
+
+
+def split_archive(documents, count, directory):
+    """Répartit les documents (type, clé, payload, réception) en count fichiers, par partition de leur clé.
+
+    Lecture unique de l'archive : chaque worker de rejeu ne lit ensuite que son
+    fichier, où l'ordre de réception est conservé. Retourne (fichiers, nombre de
+    documents sans type, non rejouables).
+    """
+    filenames = [os.path.join(directory, 'partition-%s.jsonl.gz' % index) for index in range(count)]
+    outputs = [gzip.open(filename, 'wb', compresslevel=1) for filename in filenames]
+    skipped = 0
+    try:
+        for kind, key, payload, received_at in documents:
+            if kind is None:
+                skipped += 1
+                continue
+            outputs[partition(key, count)].write(json.dumps([kind, key, payload, received_at]).encode('utf-8') + b'\n')
+    finally:
+        for output in outputs:
+            output.close()
+    return filenames, skipped
+
+
+def iter_partition(filename):
+    """Documents (type, clé, payload, réception) d'un fichier écrit par split_archive"""
+    for kind, key, payload, received_at in _read_file(filename):
+        yield kind, key, payload, received_at
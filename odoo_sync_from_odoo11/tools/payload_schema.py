@@ -0,0 +1,172 @@
+"""Schémas déclaratifs des payloads Odoo11, compilés une fois au chargement.
+
+Un payload est vérifié en une passe, sans requête SQL ; toutes les violations
+sont retournées avec leur chemin (ex. order_lines_data[3].product_id).
+
+Syntaxe : {champ: règle}, un champ suffixé de '!' est obligatoire. La règle
+est un type ('str', 'number', 'ref', 'date', 'taxes'), un tuple de types
+acceptés, un schéma imbriqué (dict) ou [schéma] pour une liste d'objets.
+Les valeurs vides (None, False, '') valent absence, comme dans Odoo11.
+"""
+import re
+
+_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_ref(value):
+    return (
+        isinstance(value, (list, tuple)) and len(value) == 2
+        and isinstance(value[0], int) and not isinstance(value[0], bool)
+        and isinstance(value[1], str)
+    )
+
+
+def _is_taxes(value):
+    if not isinstance(value, list):
+        return False
+    if len(value) == 3 and value[0] == 6 and isinstance(value[2], list):
+        return all(isinstance(tax_id, int) for tax_id in value[2])
+    return all(_is_ref(tax) for tax in value)
+
+
+TYPES = {
+    'str': (lambda value: isinstance(value, str), "texte attendu"),
+    'number': (_is_number, "nombre attendu"),
+    'ref': (_is_ref, "référence [id, nom] attendue"),
+    'date': (lambda value: isinstance(value, str) and bool(_DATE.match(value)), "date AAAA-MM-JJ[ HH:MM:SS] attendue"),
+    'taxes': (_is_taxes, "taxes [6, 0, ids] ou [[id, nom], ...] attendues"),
+}
+
+
+def _is_empty(value):
+    return value is None or value is False or value == ''
+
+
+def compile_schema(spec):
+    """Retourne une fonction validate(data, path='') -> liste des violations"""
+    checks = [(key.rstrip('!'), key.endswith('!'), _compile_rule(rule)) for key, rule in spec.items()]
+
+    def validate(data, path=''):
+        if not isinstance(data, dict):
+            return ['%s : objet attendu' % (path.rstrip('.') or 'payload')]
+        errors = []
+        for key, required, check in checks:
+            value = data.get(key)
+            if _is_empty(value):
+                if required:
+                    errors.append('%s%s : obligatoire' % (path, key))
+                continue
+            check(value, path + key, errors)
+        return errors
+    return validate
+
+
+def _compile_rule(rule):
+    if isinstance(rule, list):
+        validate_item = compile_schema(rule[0])
+
+        def check(value, where, errors):
+            if not isinstance(value, list):
+                errors.append('%s : liste attendue' % where)
+                return
+            for index, item in enumerate(value):
+                errors.extend(validate_item(item, '%s[%s].' % (where, index)))
+        return check
+
+    if isinstance(rule, dict):
+        validate_nested = compile_schema(rule)
+        return lambda value, where, errors: errors.extend(validate_nested(value, where + '.'))
+
+    names = rule if isinstance(rule, tuple) else (rule,)
+    tests = [TYPES[name][0] for name in names]
+    message = ' ou '.join(TYPES[name][1] for name in names)
+
+    def check(value, where, errors):
+        if not any(test(value) for test in tests):
+            errors.append('%s : %s' % (where, message))
+    return check
+
+
+SALE_ORDER_LINE = {
+    'id': 'number',
+    'product_id!': 'ref',
+    'product_uom_qty': 'number',
+    'price_unit': 'number',
+    'name': 'str',
+    'taxes_id': 'taxes',
+}
+
+SALE_ORDER = {
+    'name!': 'str',
+    'partner_id!': 'ref',
+    'warehouse_id': 'ref',
+    'user_id': 'ref',
+    'amount_total': 'number',
+    'project': 'str',
+    'order_lines_data': [SALE_ORDER_LINE],
+}
+
+PURCHASE_ORDER_LINE = {
+    'id': 'number',
+    'product_id': ('ref', 'str'),
+    'product_qty': 'number',
+    'price_unit': 'number',
+    'name': 'str',
+    'date_planned': 'date',
+    'taxes_id': 'taxes',
+}
+
+PURCHASE_ORDER = {
+    'name!': 'str',
+    'partner_id!': ('ref', 'str'),
+    'date_order': 'date',
+    'partner_ref': 'str',
+    'date_approve': 'date',
+    'currency_id': ('ref', 'str'),
+    'notes': 'str',
+    'dossier_data': {'name': 'str', 'project_name': 'str'},
+    'order_lines_data': [PURCHASE_ORDER_LINE],
+}
+
+ACCOUNT_INVOICE_LINE = {
+    'id': 'number',
+    'product_id': 'ref',
+    'quantity': 'number',
+    'price_unit': 'number',
+    'discount': 'number',
+    'name': 'str',
+    'taxes_id': 'taxes',
+}
+
+ACCOUNT_INVOICE = {
+    'number': 'str',
+    'origin': 'str',
+    'partner_id!': 'ref',
+    'user_id': 'ref',
+    'date_invoice': 'date',
+    'amount_total': 'number',
+    'state': 'str',
+    'invoice_lines_data': [ACCOUNT_INVOICE_LINE],
+}
+
+VALIDATORS = {
+    'sale_order': compile_schema(SALE_ORDER),
+    'purchase_order': compile_schema(PURCHASE_ORDER),
+    'account_invoice': compile_schema(ACCOUNT_INVOICE),
+}
+
+# Lignes lues en flux, vérifiées bloc par bloc
+validate_purchase_line = compile_schema(PURCHASE_ORDER_LINE)
+
+
+def validate_payload(kind, data):
+    """Liste des violations du payload pour son type de document (vide s'il est valide)"""
+    return VALIDATORS[kind](data)
+
+
+def invalid_result(errors):
+    return {"status": "error", "message": "Payload invalide : %s" % '; '.join(errors), "errors": errors}
@@ -0,0 +1,22 @@
+"""Worker de rejeu, lancé par odoo.sync.replay dans un interpréteur neuf.
+
+Exécuté par runpy.run_path depuis un processus multiprocessing 'spawn' : rien
+n'est hérité du serveur (threads, connexions, registre). Les variables sont
+fournies par le parent via init_globals : options (configuration Odoo), dbname,
+filename (partition écrite par split_archive), batch_size et messages (file
+de progression).
+"""
+import odoo
+from odoo import api, SUPERUSER_ID
+from odoo.modules.module import initialize_sys_path
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+for key, value in options.items():  # noqa: F821
+    config[key] = value
+odoo.netsvc.init_logger()
+initialize_sys_path()
+
+with Registry(dbname).cursor() as cr:  # noqa: F821
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['odoo.sync.replay']._replay_file(filename, batch_size, messages.put)  # noqa: F821
@@ -0,0 +1,93 @@
+"""Lecture en flux des gros payloads : décompression gzip/deflate vers un fichier
+temporaire puis analyse incrémentale des lignes de commande avec ijson.
+"""
+import logging
+import tempfile
+import zlib
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import ijson
+except ImportError:
+    _logger.warning("Le module ijson n'est pas installé : la réception en flux est désactivée. Installation requise: pip install ijson")
+    ijson = None
+
+READ_SIZE = 64 * 1024
+# Au-delà, le fichier temporaire passe de la mémoire au disque
+SPOOL_MEMORY_SIZE = 1024 * 1024
+
+
+def spool_body(stream, content_encoding=None, max_size=None):
+    """Copie le corps (décompressé) dans un fichier temporaire.
+
+    La décompression produit au plus READ_SIZE octets par appel : un bloc très
+    compressé ne peut pas dépasser max_size en mémoire avant d'être contrôlé.
+    Retourne (fichier, taille reçue).
+    """
+    if ijson is None:
+        # Sans analyse incrémentale, le document entier serait chargé en mémoire
+        raise ValueError("Réception en flux indisponible : module ijson non installé")
+    encoding = (content_encoding or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+        # Détection automatique de l'en-tête gzip ou zlib
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+    elif encoding in ('', 'identity'):
+        decompressor = None
+    else:
+        raise ValueError("Content-Encoding non supporté : %s" % content_encoding)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+    received = written = 0
+
+    def write(data):
+        nonlocal written
+        written += len(data)
+        if max_size and written > max_size:
+            spool.close()
+            raise ValueError("Payload décompressé supérieur à %s octets" % max_size)
+        spool.write(data)
+
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        received += len(chunk)
+        if not decompressor:
+            write(chunk)
+            continue
+        write(decompressor.decompress(chunk, READ_SIZE))
+        while decompressor.unconsumed_tail:
+            write(decompressor.decompress(decompressor.unconsumed_tail, READ_SIZE))
+    if decompressor:
+        write(decompressor.flush())
+    spool.seek(0)
+    return spool, received
+
+
+def read_header(spool, lines_key):
+    """Retourne les champs de premier niveau du document, sans le tableau des lignes"""
+    spool.seek(0)
+    header, key, builder = {}, None, None
+    for prefix, event, value in ijson.parse(spool, use_float=True):
+        if prefix == '' and event in ('map_key', 'end_map'):
+            if builder is not None:
+                header[key] = builder.value
+            key = value if event == 'map_key' else None
+            builder = ijson.ObjectBuilder() if key is not None and key != lines_key else None
+        elif builder is not None:
+            builder.event(event, value)
+    return header
+
+
+def iter_line_chunks(spool, lines_key, chunk_size):
+    """Produit les lignes du document par blocs de chunk_size, sans charger le tableau entier"""
+    spool.seek(0)
+    chunk = []
+    for line in ijson.items(spool, '%s.item' % lines_key, use_float=True):
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,227 @@
+"""Banc de charge des routes de synchronisation, hors d'Odoo.
+
+Génère des payloads Odoo11 réalistes (commandes client, commandes d'achat,
+factures) et les envoie à un serveur Odoo 18 avec la concurrence voulue :
+
+    python odoo_sync_from_odoo11/tools/sync_benchmark.py --url http://localhost:8069 \\
+        --db bench --login admin --password admin --kind sale_order --count 2000 \\
+        --lines 5-40 --partners 200 --products 1000 --concurrency 8
+
+Rapport : débit (documents/s), latence p50/p99 vue du client et, si un
+administrateur est fourni, requêtes SQL par document (écart des mesures de
+/odoo_sync/metrics avant et après le passage). Ces mesures sont exactes avec un
+serveur à un seul processus (--workers=0) ; avec des workers, celles des autres
+processus arrivent au plus une minute plus tard.
+
+À lancer sur une base dédiée : les clients, produits et documents générés
+(préfixe BENCH) y sont réellement créés.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Ids Odoo11 fictifs, hors de la plage des vrais ids (table de correspondance)
+SOURCE_ID_BASE = 900000000
+
+ROUTES = {
+    'sale_order': ('/odoo_sync/sale_order', '/odoo_sync/sale_order/batch', 'orders'),
+    'purchase_order': ('/odoo_sync/purchase_order', None, None),
+    'account_invoice': ('/odoo_sync/account_invoice', '/odoo_sync/account_invoice/batch', 'invoices'),
+}
+
+
+def generate_payloads(kind, count, lines=(1, 10), partners=50, products=200, run_id='1', post=False, seed=0):
+    """Payloads d'un type de document, tirés de partners clients et products produits distincts"""
+    rng = random.Random(seed)
+    payloads = []
+    for number in range(count):
+        partner = rng.randrange(partners)
+        partner_ref = [SOURCE_ID_BASE + partner, 'BENCH Partenaire %s' % partner]
+        lines_data = []
+        for position in range(rng.randint(*lines)):
+            product = rng.randrange(products)
+            line = {
+                'id': SOURCE_ID_BASE + number * 1000 + position,
+                'product_id': [SOURCE_ID_BASE + product, 'BENCH Produit %s' % product],
+                'price_unit': round(rng.uniform(1, 500), 2),
+                'name': 'BENCH Produit %s' % product,
+            }
+            quantity = rng.randint(1, 20)
+            if kind == 'sale_order':
+                line['product_uom_qty'] = quantity
+            elif kind == 'purchase_order':
+                line['product_qty'] = quantity
+                line['date_planned'] = '2024-01-15 00:00:00'
+            else:
+                line['quantity'] = quantity
+            lines_data.append(line)
+
+        name = 'BENCH-%s-%s-%s' % (kind.upper(), run_id, number)
+        if kind == 'sale_order':
+            payloads.append({'name': name, 'partner_id': partner_ref, 'order_lines_data': lines_data})
+        elif kind == 'purchase_order':
+            payloads.append({
+                'name': name, 'partner_id': partner_ref, 'date_order': '2024-01-10 00:00:00',
+                'order_lines_data': lines_data,
+            })
+        else:
+            payloads.append({
+                'number': name, 'partner_id': partner_ref, 'date_invoice': '2024-01-10',
+                'state': 'open' if post else 'draft', 'invoice_lines_data': lines_data,
+            })
+    return payloads
+
+
+def percentile(values, ratio):
+    """Percentile par rang le plus proche d'une liste de mesures"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(ratio * len(values))) - 1))]
+
+
+class SyncBenchmark:
+
+    def __init__(self, url, db=None, login=None, password=None, concurrency=4, timeout=300):
+        self.url = url.rstrip('/')
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.authenticated = False
+        if login:
+            self._call('/web/session/authenticate', {'params': {'db': db, 'login': login, 'password': password}})
+            self.authenticated = True
+
+    def _call(self, path, body):
+        response = self.session.post(self.url + path, json=body, timeout=self.timeout)
+        response.raise_for_status()
+        result = response.json()
+        if result.get('error'):
+            raise RuntimeError((result['error'].get('data') or {}).get('message') or result['error'].get('message'))
+        return result.get('result')
+
+    def _sql_totals(self, route):
+        """(appels, requêtes SQL) cumulés par le serveur pour la route, si accessible"""
+        if not self.authenticated:
+            return None
+        stats = (self._call('/odoo_sync/metrics', {'params': {'hours': 24}}) or {}).get(route)
+        if not stats:
+            return 0, 0.0
+        return stats['calls'], stats['sql_count']['avg'] * stats['calls']
+
+    def run(self, kind, payloads, batch_size=1):
+        """Envoie les payloads (un par appel, ou par lots si batch_size > 1) et retourne le rapport"""
+        single_path, batch_path, list_key = ROUTES[kind]
+        if batch_size > 1 and batch_path:
+            requests_body = [
+                {list_key: payloads[offset:offset + batch_size]} for offset in range(0, len(payloads), batch_size)
+            ]
+            path, route = batch_path, '%s_batch' % kind
+        else:
+            requests_body = payloads
+            path, route = single_path, kind
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def send(body):
+            started = time.perf_counter()
+            try:
+                failed = document_errors(self._call(path, body) or {})
+            except Exception as e:
+                # Appel en échec : tous ses documents le sont
+                failed = [str(e)] * (len(body[list_key]) if path == batch_path else 1)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                errors.extend(failed)
+
+        sql_before = self._sql_totals(route)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(send, requests_body))
+        duration = time.perf_counter() - started
+        sql_after = self._sql_totals(route)
+
+        lines = sum(
+            len(payload.get('order_lines_data') or payload.get('invoice_lines_data') or []) for payload in payloads
+        )
+        report = {
+            'route': route,
+            'documents': len(payloads),
+            'lines': lines,
+            'requests': len(requests_body),
+            'concurrency': self.concurrency,
+            'errors': len(errors),
+            'duration_s': round(duration, 2),
+            'documents_per_s': round(len(payloads) / duration, 1) if duration else 0.0,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 0.50), 1),
+                'p99': round(percentile(latencies, 0.99), 1),
+                'max': round(max(latencies), 1) if latencies else 0.0,
+            },
+            'sample_errors': errors[:5],
+        }
+        if sql_before is not None and sql_after[0] > sql_before[0]:
+            queries = sql_after[1] - sql_before[1]
+            report['sql_per_document'] = round(queries / len(payloads), 1)
+            report['sql_per_line'] = round(queries / lines, 2) if lines else None
+        return report
+
+
+def document_errors(result):
+    """Erreurs d'une réponse, une par document en échec : résultats d'un lot, documents
+    rejetés d'une mise en file d'attente, ou document unique
+    """
+    if isinstance(result.get('results'), list):
+        return [document.get('message') for document in result['results'] if document.get('status') == 'error']
+    if result.get('rejected'):
+        return ['; '.join(rejected.get('errors') or []) for rejected in result['rejected']]
+    return [result.get('message')] if result.get('status') == 'error' else []
+
+
+def _range(value):
+    low, _sep, high = value.partition('-')
+    return int(low), int(high or low)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de charge des routes de synchronisation Odoo11")
+    parser.add_argument('--url', default='http://localhost:8069')
+    parser.add_argument('--db', help="Base, pour l'authentification")
+    parser.add_argument('--login', help="Administrateur : requis pour les factures et les mesures SQL")
+    parser.add_argument('--password')
+    parser.add_argument('--kind', choices=sorted(ROUTES), default='sale_order')
+    parser.add_argument('--count', type=int, default=200, help="Nombre de documents")
+    parser.add_argument('--lines', type=_range, default=(1, 10), help="Lignes par document, ex. 5-40")
+    parser.add_argument('--partners', type=int, default=50, help="Clients/fournisseurs distincts")
+    parser.add_argument('--products', type=int, default=200, help="Produits distincts")
+    parser.add_argument('--concurrency', type=int, default=4, help="Appels simultanés")
+    parser.add_argument('--batch-size', type=int, default=1, help="Documents par appel (routes /batch)")
+    parser.add_argument('--run-id', default=None, help="Reprendre un identifiant pour mesurer les relivraisons")
+    parser.add_argument('--post', action='store_true', help="Factures à valider (état open)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    run_id = args.run_id or time.strftime('%Y%m%d%H%M%S')
+    payloads = generate_payloads(
+        args.kind, args.count, args.lines, args.partners, args.products, run_id, args.post, args.seed,
+    )
+    benchmark = SyncBenchmark(args.url, args.db, args.login, args.password, args.concurrency)
+    report = benchmark.run(args.kind, payloads, args.batch_size)
+    report['run_id'] = run_id
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
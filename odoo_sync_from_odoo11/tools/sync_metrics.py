@@ -0,0 +1,108 @@
+"""Mesures par appel des routes de synchronisation et agrégation par worker.
+
+Les mesures sont cumulées en mémoire puis fusionnées périodiquement dans
+odoo.sync.metric, sur une ligne propre à chaque worker : aucune contention
+entre requêtes sur la base.
+"""
+import bisect
+import os
+import socket
+import threading
+import time
+
+# Bornes supérieures des histogrammes (la dernière case reçoit le reste)
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+SQL_COUNT_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+FLUSH_INTERVAL = 60
+
+WORKER = '%s:%s' % (socket.gethostname(), os.getpid())
+
+
+def bucket_index(buckets, value):
+    return bisect.bisect_left(buckets, value)
+
+
+def percentile(buckets, counts, ratio):
+    """Borne supérieure de la case contenant le percentile demandé"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    threshold = total * ratio
+    running = 0
+    for index, count in enumerate(counts):
+        running += count
+        if running >= threshold:
+            return float(buckets[index]) if index < len(buckets) else float(buckets[-1])
+    return float(buckets[-1])
+
+
+class CallProbe:
+    """Mesure d'un appel : durée, nombre et temps des requêtes SQL, enregistrements créés"""
+
+    def __init__(self, cr):
+        self._cr = cr
+        self._thread = threading.current_thread()
+        self._started = time.perf_counter()
+        self._sql_count = self._query_count()
+        self._sql_time = getattr(self._thread, 'query_time', 0.0)
+        # Alimenté par la surcharge de create() sur le modèle base
+        self.created = self._thread.odoo_sync_created = {}
+
+    def _query_count(self):
+        # Compteur du thread (requête HTTP) si Odoo le tient, sinon celui du curseur
+        if hasattr(self._thread, 'query_count'):
+            return self._thread.query_count
+        return self._cr.sql_log_count
+
+    def stop(self):
+        del self._thread.odoo_sync_created
+        return {
+            'wall_ms': (time.perf_counter() - self._started) * 1000,
+            'sql_count': self._query_count() - self._sql_count,
+            'sql_time_ms': (getattr(self._thread, 'query_time', 0.0) - self._sql_time) * 1000,
+            'created': self.created,
+        }
+
+
+class MetricsBuffer:
+    """Cumul en mémoire par (base, route), vidé au plus une fois par FLUSH_INTERVAL"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, dbname, route, measure, error):
+        with self._lock:
+            stats = self._data.setdefault((dbname, route), {
+                'call_count': 0,
+                'error_count': 0,
+                'wall_time_total': 0.0,
+                'sql_count_total': 0,
+                'sql_time_total': 0.0,
+                'latency_histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                'sql_histogram': [0] * (len(SQL_COUNT_BUCKETS) + 1),
+                'created_records': {},
+            })
+            stats['call_count'] += 1
+            stats['error_count'] += 1 if error else 0
+            stats['wall_time_total'] += measure['wall_ms']
+            stats['sql_count_total'] += measure['sql_count']
+            stats['sql_time_total'] += measure['sql_time_ms']
+            stats['latency_histogram'][bucket_index(LATENCY_BUCKETS_MS, measure['wall_ms'])] += 1
+            stats['sql_histogram'][bucket_index(SQL_COUNT_BUCKETS, measure['sql_count'])] += 1
+            for model_name, count in measure['created'].items():
+                stats['created_records'][model_name] = stats['created_records'].get(model_name, 0) + count
+
+    def drain(self, dbname, force=False):
+        """Retourne {route: stats} de la base à fusionner, ou {} si l'intervalle n'est pas écoulé"""
+        with self._lock:
+            if not force and time.monotonic() - self._last_flush < FLUSH_INTERVAL:
+                return {}
+            self._last_flush = time.monotonic()
+            keys = [key for key in self._data if key[0] == dbname]
+            return {key[1]: self._data.pop(key) for key in keys}
+
+
+metrics_buffer = MetricsBuffer()
@@ -1,3 +1,4 @@
 #-*- coding: utf-8 -*-
 from . import create_project_wizard
 from . import import_data
+from . import project_import_job
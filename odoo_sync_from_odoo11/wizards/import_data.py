@@ -1,9 +1,10 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.osv import expression
 import base64
 import io
 import logging
-from datetime import datetime
+from datetime import date, datetime
 import re 
 
 _logger = logging.getLogger(__name__)
@@ -41,13 +42,103 @@ COLUMN_MAPPING = {
     'Statut': 'etat_projet',
 }
 
+# Modèles des colonnes de référence -> type d'enregistrement, résolus en une passe sur tout le fichier
+REFERENCE_MODELS = {
+    'res.users': 'users',
+    'res.partner': 'partners',
+    'res.country': 'countries',
+    'res.partner.category': 'sectors',
+}
+
+# Valeurs de cellule tenues pour vides
+EMPTY_VALUES = ('nan', 'none', 'n/a', 'na', '')
+USER_EMPTY_VALUES = EMPTY_VALUES + ('default',)
+
 # Domaine d'e-mail factice pour les utilisateurs créés
 DEFAULT_USER_EMAIL_DOMAIN = 'neuronestech.com'
 
+# Valeurs Excel (en minuscules) des champs de sélection
+SELECTION_MAPPING = {
+    'nature': {
+        'livraison': 'livraison',
+        'end to end': 'end_to_end',
+        'services pro': 'service_pro',
+        'service pro': 'service_pro',
+        'all': 'all',
+    },
+    'bu': {
+        'ict': 'ict',
+        'cloud': 'cloud',
+        'cybersecurity': 'cybersecurity',
+        'formation': 'formation',
+        'security': 'security',
+    },
+    'revenue_type': {
+        'recurrent': 'recurrent',
+        'one shot': 'oneshot',
+        'oneshot': 'oneshot',
+        'one-shot': 'oneshot',
+    },
+    'circuit': {
+        'fast track': 'fast',
+        'fast': 'fast',
+        'normal': 'normal',
+    },
+    'domaine': {
+        'datacenter facilities (dcf)': 'datacenter_facilities',
+        'modern network integration (mni)': 'modern_network_integration',
+        'agile infrastructure & cloud (aic)': 'agile_infrastructure_cloud',
+        'business data integration (bdi)': 'business_data_integration',
+        'digital workspace (dws)': 'digital_workspace',
+        'secured it (sec)': 'secured_it',
+        'expert & managed services - think': 'expert_managed_services_think',
+        'expert & managed services - build': 'expert_managed_services_build',
+        'expert & managed services - train': 'expert_managed_services_train',
+        'expert & managed services - run': 'expert_managed_services_run',
+        'none': 'none',
+        'others': 'others',
+    },
+    'etat_projet': {
+        '0-annulé': 'cancelled',
+        '1-non démarré': 'non_demarre',
+        '2-en cours': 'en_cours_production',
+        '3-en cours - provisionning': 'en_cours_provisionning',
+        '4-en cours - livraison': 'en_cours_production',
+        '5-terminé - pv/bl signé': 'termine_pv_bl_signe',
+        '6-facturé - attente df': 'facture_attente_df',
+        '7-cloturé': 'cloture',
+        '8-suivi - contrat licence': 'suivi_contrat_licence',
+        '8-suivi - contrat mixte': 'suivi_contrat_mixte',
+        '8-suivi - contrat de services': 'suivi_contrat_services',
+        '9-suspendu': 'suspendu',
+        'cloturé': 'cloture',
+        'non démarré': 'non_demarre',
+        'en cours': 'en_cours_production',
+        'terminé': 'termine_pv_bl_signe',
+        'facturé': 'facture_attente_df',
+        'draft': 'draft',
+        'suspendu': 'suspendu',
+        'cancelled': 'cancelled',
+    }
+}
 
-class ProjectImportWizard(models.TransientModel):
-    _name = 'project.import.wizard'
-    _description = "Wizard d'import de projets depuis Excel"
+# Valeurs par défaut des champs de sélection non reconnus
+SELECTION_FALLBACK = {
+    'nature': 'all',
+    'bu': 'ict',
+    'domaine': 'others',
+    'etat_projet': 'non_demarre',
+    'revenue_type': 'oneshot',
+    'circuit': 'normal'
+}
+
+
+class ProjectImportMixin(models.AbstractModel):
+    """Import de projets depuis un classeur Excel : options, compteurs et journal,
+    partagés par le wizard et les tâches d'import en arrière-plan
+    """
+    _name = 'project.import.mixin'
+    _description = "Import de projets depuis Excel"
 
     import_file = fields.Binary(
         string='Fichier Excel',
@@ -77,271 +168,290 @@ class ProjectImportWizard(models.TransientModel):
     created_categories_count = fields.Integer(string='Catégories créées', readonly=True)
 
     # --- MÉTHODES DE GESTION DES ENREGISTREMENTS EXTERNES ---
-    
-    def _find_or_create_user(self, name):
-        """ Recherche ou crée un utilisateur avec gestion des doublons et login unique """
-        if not self.create_missing_records:
-            return False
-            
-        name = str(name or '').strip()
-        if not name or name.lower() in ('nan', 'none', 'default', 'n/a', 'na', ''):
+
+    def _clean_name(self, value, empty_values=EMPTY_VALUES):
+        """ Nom nettoyé d'une cellule, False pour une cellule vide ou une valeur nulle """
+        name = str(value if value is not None else '').strip()
+        if not name or name.lower() in empty_values:
             return False
+        return name
 
-        User = self.env['res.users'].sudo()
-        
-        # Recherche plus large pour éviter les doublons
-        user = User.search([
-            '|', ('name', '=ilike', name),
-            '|', ('login', '=ilike', name),
-            '|', ('email', '=ilike', name),
-            ('partner_id.name', '=ilike', name)
-        ], limit=1)
-        
-        if user:
-            return user.id
+    def _collect_references(self, plan, rows):
+        """ Première passe : valeurs distinctes des colonnes de référence, par type d'enregistrement,
+        et nombre de lignes de données
+        """
+        columns = [(col_index, ref_kind) for col_index, odoo_field, ref_kind, convert in plan if ref_kind]
+        names = {kind: set() for kind in REFERENCE_MODELS.values()}
+        row_count = 0
+        for row in rows:
+            row_count += 1
+            for col_index, kind in columns:
+                if col_index < len(row):
+                    name = self._clean_name(row[col_index], USER_EMPTY_VALUES if kind == 'users' else EMPTY_VALUES)
+                    if name:
+                        names[kind].add(name)
+        return names, row_count
+
+    def _resolve_references(self, names):
+        """ Résout toutes les références du fichier : une recherche groupée par modèle,
+        puis une création groupée des manquants. Retourne {type: {nom: id}}.
+        """
+        return {
+            'users': self._resolve_users(names['users']),
+            'partners': self._resolve_partners(names['partners']),
+            'countries': self._resolve_misc('res.country', names['countries']),
+            'sectors': self._resolve_misc('res.partner.category', names['sectors']),
+        }
 
+    def _create_records(self, Model, vals_list, label):
+        """ Création groupée ; en cas d'échec, un enregistrement par savepoint (les
+        erreurs sont journalisées). Retourne les enregistrements créés, None en place
+        des échecs.
+        """
+        if not vals_list:
+            return []
         try:
-            # Création du login de base (ex: Berenger ASSIELOU -> berenger.assielou)
-            parts = re.findall(r'[a-zA-Z0-9]+', name.lower())
-            if len(parts) > 1:
-                login_base = ".".join(parts[:2])  # Prend seulement les 2 premières parties
-            elif len(parts) == 1:
-                login_base = parts[0]
-            else:
-                login_base = 'imported.user'
-            
-            # Nettoyer les caractères non alphanumériques sauf le point
-            login_base = re.sub(r'[^a-z0-9\.]', '', login_base)
-            
-            if not login_base or len(login_base) < 3:
-                login_base = 'imported.user'
-                
-            login_candidate = login_base
+            with self.env.cr.savepoint():
+                return list(Model.create(vals_list))
+        except Exception as e:
+            _logger.warning("Création groupée de %s %s échouée (%s), repli unitaire", len(vals_list), label, e)
+        records = []
+        for vals in vals_list:
+            try:
+                with self.env.cr.savepoint():
+                    records.append(Model.create(vals))
+            except Exception as e:
+                _logger.error("Erreur création %s '%s': %s", label, vals.get('name'), str(e))
+                self.import_log += _("Erreur: Impossible de créer %s '%s': %s\n" % (label, vals.get('name'), str(e)))
+                records.append(None)
+        return records
+
+    def _resolve_users(self, names):
+        """ Utilisateurs par login ou e-mail, puis par nom ; les manquants sont créés
+        avec un login unique (ex: Berenger ASSIELOU -> berenger.assielou)
+        """
+        if not names:
+            return {}
+        User = self.env['res.users'].sudo()
+        lowered = {name.lower(): name for name in names}
+        user_ids = {}
+        # Login et e-mail sans casse : 'J.Dupont' doit retrouver l'utilisateur 'j.dupont'
+        User.flush_model(['login', 'active', 'partner_id'])
+        self.env['res.partner'].flush_model(['email'])
+        self.env.cr.execute("""
+            SELECT u.id, u.login, p.email
+              FROM res_users u
+              JOIN res_partner p ON p.id = u.partner_id
+             WHERE u.active
+               AND (lower(u.login) = ANY(%s) OR lower(p.email) = ANY(%s))
+             ORDER BY u.id
+        """, (list(lowered), list(lowered)))
+        for user_id, login, email in self.env.cr.fetchall():
+            for value in (login, email):
+                name = lowered.get((value or '').lower())
+                if name:
+                    user_ids.setdefault(name, user_id)
+        missing = [name for name in names if name not in user_ids]
+        if missing:
+            user_ids.update(self.env['odoo.sync.name.matcher']._match('res.users', missing))
+        missing = sorted(name for name in names if name not in user_ids)
+        if not missing or not self.create_missing_records:
+            return user_ids
+
+        # Logins libres, y compris vis-à-vis des utilisateurs archivés, en une seule requête
+        login_bases = {name: self._login_base(name) for name in missing}
+        taken = set(User.with_context(active_test=False).search(expression.OR([
+            [('login', '=like', base + '%')] for base in set(login_bases.values())
+        ])).mapped('login'))
+        logins = {}
+        for name in missing:
+            login_base = login_candidate = login_bases[name]
             login_suffix = 0
-            
-            # Garantir l'unicité du login
-            while User.search([('login', '=', login_candidate)], limit=1):
+            while login_candidate in taken:
                 login_suffix += 1
                 login_candidate = f"{login_base}.{login_suffix}"
-            
-            # CRÉATION CRITIQUE : Créer d'abord le partenaire
-            Partner = self.env['res.partner'].sudo()
-            partner_vals = {
-                'name': name,
-                'is_company': False,
-                'company_type': 'person',
-                'email': f'{login_candidate}@{DEFAULT_USER_EMAIL_DOMAIN}',
-            }
-            new_partner = Partner.create(partner_vals)
-            
-            # Puis créer l'utilisateur avec le partenaire
-            user_vals = {
-                'name': name,
-                'login': login_candidate,
-                'email': f'{login_candidate}@{DEFAULT_USER_EMAIL_DOMAIN}',
-                'partner_id': new_partner.id,
-                'company_id': self.env.company.id,
-                'company_ids': [(6, 0, [self.env.company.id])],
-                'notification_type': 'email',
-                'groups_id': [(6, 0, [self.env.ref('base.group_user').id])]
-            }
-            
-            new_user = User.create(user_vals)
-            self.created_users_count += 1 
-            _logger.info(f"Utilisateur créé: {name} (login: {login_candidate})")
-            return new_user.id
-            
-        except Exception as e:
-            _logger.error("Erreur recherche/création res.users '%s': %s", name, str(e))
-            self.import_log += _("Erreur: Impossible de créer l'utilisateur '%s': %s\n" % (name, str(e)))
-            return False
+            taken.add(login_candidate)
+            logins[name] = login_candidate
 
-    def _find_or_create_partner(self, name):
-        """ Recherche ou crée un partenaire (Client) avec gestion des doublons """
-        if not self.create_missing_records:
-            return False
-            
-        name = str(name or '').strip()
-        if not name or name.lower() in ('nan', 'none', 'n/a', 'na', ''):
-            return False
-            
-        Partner = self.env['res.partner'].sudo()
-        
-        # Recherche avec différentes stratégies pour éviter les doublons
-        domain = [
-            ('name', '=ilike', name),
-            ('is_company', '=', True)
-        ]
-        partner = Partner.search(domain, limit=1)
-        
-        if not partner:
-            # Recherche plus large
-            partner = Partner.search([
-                '|', ('name', '=ilike', name),
-                ('commercial_company_name', '=ilike', name),
-                ('is_company', '=', True)
-            ], limit=1)
-        
-        if partner:
-            return partner.id
-            
-        try:
-            new_partner = Partner.create({
-                'name': name,
-                'is_company': True,
-                'company_type': 'company',
-            })
-            self.created_partners_count += 1
-            _logger.info(f"Partenaire créé: {name}")
-            return new_partner.id
-        except Exception as e:
-            _logger.error("Erreur recherche/création res.partner '%s': %s", name, str(e))
-            self.import_log += _("Erreur: Impossible de créer le partenaire '%s': %s\n" % (name, str(e)))
-            return False
+        # CRÉATION CRITIQUE : Créer d'abord les partenaires
+        partners = self._create_records(self.env['res.partner'].sudo(), [{
+            'name': name,
+            'is_company': False,
+            'company_type': 'person',
+            'email': f'{logins[name]}@{DEFAULT_USER_EMAIL_DOMAIN}',
+        } for name in missing], 'res.partner')
+        to_create = [(name, partner) for name, partner in zip(missing, partners) if partner]
 
-    def _find_or_create_misc(self, model_name, name, domain_filter=None):
-        """ Recherche ou crée d'autres enregistrements avec gestion des doublons """
-        if not self.create_missing_records:
-            return False
-            
-        name = str(name or '').strip()
-        if not name or name.lower() in ('nan', 'none', 'n/a', 'na', ''):
-            return False
+        # Puis les utilisateurs avec leur partenaire
+        group_user = self.env.ref('base.group_user').id
+        users = self._create_records(User, [{
+            'name': name,
+            'login': logins[name],
+            'email': f'{logins[name]}@{DEFAULT_USER_EMAIL_DOMAIN}',
+            'partner_id': partner.id,
+            'company_id': self.env.company.id,
+            'company_ids': [(6, 0, [self.env.company.id])],
+            'notification_type': 'email',
+            'groups_id': [(6, 0, [group_user])],
+        } for name, partner in to_create], 'res.users')
+        for (name, partner), user in zip(to_create, users):
+            if user:
+                user_ids[name] = user.id
+                self.created_users_count += 1
+                _logger.info(f"Utilisateur créé: {name} (login: {logins[name]})")
+        return user_ids
 
+    def _login_base(self, name):
+        """ Login de base : deux premières parties alphanumériques du nom, en minuscules """
+        parts = re.findall(r'[a-zA-Z0-9]+', name.lower())
+        if len(parts) > 1:
+            login_base = ".".join(parts[:2])  # Prend seulement les 2 premières parties
+        elif len(parts) == 1:
+            login_base = parts[0]
+        else:
+            login_base = 'imported.user'
+
+        # Nettoyer les caractères non alphanumériques sauf le point
+        login_base = re.sub(r'[^a-z0-9\.]', '', login_base)
+        if not login_base or len(login_base) < 3:
+            login_base = 'imported.user'
+        return login_base
+
+    def _resolve_partners(self, names):
+        """ Partenaires (Clients) par clé de nom normalisée ; les manquants sont créés en sociétés """
+        if not names:
+            return {}
+        # Recherche par clé de nom normalisée (le nom commercial d'une société est son nom)
+        partner_ids = self.env['odoo.sync.name.matcher']._match(
+            'res.partner', names, [('is_company', '=', True)],
+        )
+        missing = sorted(name for name in names if name not in partner_ids)
+        if not missing or not self.create_missing_records:
+            return partner_ids
+        partners = self._create_records(self.env['res.partner'].sudo(), [{
+            'name': name,
+            'is_company': True,
+            'company_type': 'company',
+        } for name in missing], 'res.partner')
+        for name, partner in zip(missing, partners):
+            if partner:
+                partner_ids[name] = partner.id
+                self.created_partners_count += 1
+                _logger.info(f"Partenaire créé: {name}")
+        return partner_ids
+
+    def _resolve_misc(self, model_name, names, domain_filter=None):
+        """ Autres enregistrements (pays, secteurs) par clé de nom ; les manquants sont créés """
+        if not names:
+            return {}
         Model = self.env[model_name].sudo()
-        domain = [('name', '=ilike', name)]
-        
-        if domain_filter:
-            domain.extend(domain_filter)
-            
+        record_ids = {}
         if model_name == 'res.country':
-            domain = ['|', ('name', '=ilike', name), ('code', '=ilike', name)]
-            
-        record = Model.search(domain, limit=1)
-        if record:
-            return record.id
+            # Code pays (index unique), sinon nom
+            by_code = {}
+            for name in names:
+                by_code.setdefault(name.upper(), []).append(name)
+            for country in Model.search([('code', 'in', list(by_code))]):
+                for name in by_code.get(country.code.upper(), []):
+                    record_ids[name] = country.id
 
-        try:
-            new_record = Model.create({'name': name})
-            if model_name == 'res.partner.category':
-                self.created_categories_count += 1
-                _logger.info(f"Catégorie créée: {name}")
-            return new_record.id
-        except Exception as e:
-            _logger.error("Erreur recherche/création %s '%s': %s", model_name, name, str(e))
-            self.import_log += _("Erreur: Impossible de créer %s '%s': %s\n" % (model_name, name, str(e)))
-            return False
+        missing = [name for name in names if name not in record_ids]
+        if missing:
+            record_ids.update(self.env['odoo.sync.name.matcher']._match(model_name, missing, domain_filter))
+        missing = sorted(name for name in names if name not in record_ids)
+        if not missing or not self.create_missing_records:
+            return record_ids
+        records = self._create_records(Model, [{'name': name} for name in missing], model_name)
+        for name, record in zip(missing, records):
+            if record:
+                record_ids[name] = record.id
+                if model_name == 'res.partner.category':
+                    self.created_categories_count += 1
+                    _logger.info(f"Catégorie créée: {name}")
+        return record_ids
 
     # --- LOGIQUE DE MAPPING ET IMPORTATION ---
     
     def _format_value(self, field, value):
         """ Formate les valeurs selon le type de champ """
-        if value is None or str(value).strip().lower() in ('nan', 'none', 'n/a', 'na', ''):
+        if value is None or str(value).strip().lower() in EMPTY_VALUES:
             return None
-            
+
         value_str = str(value).strip()
+        # Clés de SELECTION_MAPPING en minuscules : une recherche par dictionnaire suffit
+        odoo_val = SELECTION_MAPPING.get(field, {}).get(value_str.lower())
+        if odoo_val:
+            return odoo_val
 
-        selection_mapping = {
-            'nature': {
-                'livraison': 'livraison', 
-                'end to end': 'end_to_end',
-                'services pro': 'service_pro',
-                'service pro': 'service_pro',
-                'all': 'all',
-            },
-            'bu': {
-                'ict': 'ict', 
-                'cloud': 'cloud', 
-                'cybersecurity': 'cybersecurity',
-                'formation': 'formation', 
-                'security': 'security',
-            },
-            'revenue_type': { 
-                'recurrent': 'recurrent', 
-                'one shot': 'oneshot', 
-                'oneshot': 'oneshot',
-                'one-shot': 'oneshot',
-            },
-            'circuit': { 
-                'fast track': 'fast',
-                'fast': 'fast',
-                'normal': 'normal', 
-            },
-            'domaine': {
-                'datacenter facilities (dcf)': 'datacenter_facilities',
-                'modern network integration (mni)': 'modern_network_integration',
-                'agile infrastructure & cloud (aic)': 'agile_infrastructure_cloud',
-                'business data integration (bdi)': 'business_data_integration',
-                'digital workspace (dws)': 'digital_workspace',
-                'secured it (sec)': 'secured_it',
-                'expert & managed services - think': 'expert_managed_services_think',
-                'expert & managed services - build': 'expert_managed_services_build',
-                'expert & managed services - train': 'expert_managed_services_train',
-                'expert & managed services - run': 'expert_managed_services_run',
-                'none': 'none',
-                'others': 'others',
-            },
-            'etat_projet': { 
-                '0-annulé': 'cancelled', 
-                '1-non démarré': 'non_demarre', 
-                '2-en cours': 'en_cours_production', 
-                '3-en cours - provisionning': 'en_cours_provisionning', 
-                '4-en cours - livraison': 'en_cours_production',
-                '5-terminé - pv/bl signé': 'termine_pv_bl_signe',
-                '6-facturé - attente df': 'facture_attente_df', 
-                '7-cloturé': 'cloture', 
-                '8-suivi - contrat licence': 'suivi_contrat_licence', 
-                '8-suivi - contrat mixte': 'suivi_contrat_mixte', 
-                '8-suivi - contrat de services': 'suivi_contrat_services',
-                '9-suspendu': 'suspendu', 
-                'cloturé': 'cloture', 
-                'non démarré': 'non_demarre',
-                'en cours': 'en_cours_production', 
-                'terminé': 'termine_pv_bl_signe',
-                'facturé': 'facture_attente_df', 
-                'draft': 'draft', 
-                'suspendu': 'suspendu',
-                'cancelled': 'cancelled',
-            }
-        }
-        
-        if field in selection_mapping:
-            for excel_val, odoo_val in selection_mapping[field].items():
-                if value_str.lower() == excel_val.lower():
-                    return odoo_val
-        
         # Valeurs par défaut si non trouvé
-        fallback_values = {
-            'nature': 'all', 
-            'bu': 'ict', 
-            'domaine': 'others',
-            'etat_projet': 'non_demarre', 
-            'revenue_type': 'oneshot', 
-            'circuit': 'normal'
-        }
-        
-        return fallback_values.get(field, value_str)
+        return SELECTION_FALLBACK.get(field, value_str)
 
-    def _show_result_wizard(self):
-        """Affiche le wizard avec les résultats"""
-        return {
-            'type': 'ir.actions.act_window',
-            'res_model': 'project.import.wizard',
-            'view_mode': 'form',
-            'res_id': self.id,
-            'target': 'new',
-            'context': self.env.context,
-        }
+    def _convert_date(self, value):
+        """ Date IN : date Excel, sinon texte dans l'un des formats courants """
+        if isinstance(value, date):
+            return value.strftime('%Y-%m-%d')
+        if isinstance(value, str):
+            # Essayer différents formats de date
+            for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y']:
+                try:
+                    return datetime.strptime(value.strip(), fmt).strftime('%Y-%m-%d')
+                except ValueError:
+                    continue
+            _logger.warning(f"Format de date invalide pour {value}")
+        return None
 
-    def action_import_projects(self):
-        """Logique principale d'importation des projets."""
-        self.import_log = ""
-        self.success_count = 0
-        self.error_count = 0
-        self.created_users_count = 0
-        self.created_partners_count = 0
-        self.created_categories_count = 0
-        
+    def _convert_amount(self, value):
+        """ Champs monétaires (CAS) : nombre, ou texte nettoyé (séparateur décimal , ou .) """
+        try:
+            if isinstance(value, (int, float)):
+                return float(value)
+            elif isinstance(value, str):
+                cleaned_value = re.sub(r'[^\d\.\,]', '', str(value))
+                return float(cleaned_value.replace(',', '.') or 0)
+            return 0.0
+        except (ValueError, TypeError) as e:
+            _logger.warning(f"Valeur monétaire invalide pour {value}: {e}")
+            return 0.0
+
+    def _column_plan(self, headers):
+        """ Plan de colonnes compilé une fois depuis l'en-tête : [(index de colonne, champ,
+        type de référence, conversion)]. La conversion dépend du type du champ de
+        project.project : une colonne ajoutée à COLUMN_MAPPING est prise en charge
+        sans autre code si son type l'est.
+        """
+        Project = self.env['project.project']
+        plan = []
+        for excel_header, odoo_field in COLUMN_MAPPING.items():
+            if excel_header not in headers:
+                continue
+            field = Project._fields.get(odoo_field)
+            ref_kind = REFERENCE_MODELS.get(field.comodel_name) if field and field.type == 'many2one' else None
+            convert = self._column_converter(field, ref_kind) if field else None
+            if not convert:
+                _logger.warning("Colonne '%s' ignorée : champ %s non pris en charge", excel_header, odoo_field)
+                continue
+            plan.append((headers.index(excel_header), odoo_field, ref_kind, convert))
+        return plan
+
+    def _column_converter(self, field, ref_kind):
+        """ Conversion convert(valeur, références) -> valeur du champ, None pour ne rien écrire """
+        if field.type == 'many2one':
+            if not ref_kind:
+                return None
+            empty_values = USER_EMPTY_VALUES if ref_kind == 'users' else EMPTY_VALUES
+            return lambda value, refs: refs[ref_kind].get(self._clean_name(value, empty_values))
+        if field.type == 'selection':
+            return lambda value, refs: self._format_value(field.name, value)
+        if field.type == 'date':
+            return lambda value, refs: self._convert_date(value)
+        if field.type in ('float', 'monetary'):
+            return lambda value, refs: self._convert_amount(value)
+        if field.type in ('char', 'text', 'html'):
+            return lambda value, refs: str(value).strip()
+        return None
+
+    def _run_import(self, start_row=2):
+        """Logique principale d'importation des projets, à partir de la ligne start_row."""
         Project = self.env['project.project'].sudo()
 
         if not openpyxl:
@@ -350,138 +460,235 @@ class ProjectImportWizard(models.TransientModel):
         try:
             data = base64.b64decode(self.import_file)
             f = io.BytesIO(data)
-            workbook = openpyxl.load_workbook(f)
+            # Lecture en flux : les lignes sont lues à la demande en tuples de valeurs,
+            # sans graphe d'objets cellule (mémoire constante quel que soit le nombre de lignes)
+            workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
             sheet = workbook.active
-            
+            # Dimensions déclarées parfois fausses selon le logiciel d'origine : lecture jusqu'à la fin
+            sheet.reset_dimensions()
+            header_row = next(sheet.iter_rows(max_row=1, values_only=True), None) or ()
+
         except Exception as e:
             raise UserError(_("Erreur lors de la lecture du fichier : %s. Assurez-vous qu'il s'agit d'un fichier .xlsx valide." % str(e)))
 
-        headers = [str(cell.value).strip() if cell.value is not None else '' for cell in sheet[1]]
-        _logger.info(f"En-têtes détectés: {headers}")
-        
-        for row_index, row in enumerate(sheet.iter_rows(min_row=2), start=2):
+        try:
+            headers = [str(value).strip() if value is not None else '' for value in header_row]
+            _logger.info(f"En-têtes détectés: {headers}")
+            plan = self._column_plan(headers)
+
+            # Première passe : références distinctes du fichier, résolues en bloc
+            names, row_count = self._collect_references(plan, sheet.iter_rows(min_row=2, values_only=True))
+            self._set_total_rows(row_count)
+            refs = self._resolve_references(names)
+            # Seconde passe : les lignes, avec les références déjà en mémoire
+            self._import_rows(Project, plan, sheet.iter_rows(min_row=start_row, values_only=True), refs, start_row)
+        finally:
+            # En lecture seule, le classeur garde le fichier ouvert jusqu'à sa fermeture
+            workbook.close()
+
+        # Résumé final
+        self.import_log += "\n--- RÉSUMÉ ---\n"
+        self.import_log += _("Total Projets importés/mis à jour: %d\n" % self.success_count)
+        self.import_log += _("Total Erreurs: %d\n" % self.error_count)
+        self.import_log += _("Total Utilisateurs créés: %d\n" % self.created_users_count)
+        self.import_log += _("Total Clients créés: %d\n" % self.created_partners_count)
+        self.import_log += _("Total Catégories créées: %d\n" % self.created_categories_count)
+
+        _logger.info(f"Import terminé: {self.success_count} succès, {self.error_count} erreurs")
+
+    def _set_total_rows(self, row_count):
+        """Nombre de lignes de données du fichier, connu après la première passe"""
+
+    def _checkpoint(self, last_row, row_count):
+        """Bloc terminé jusqu'à la ligne last_row (row_count lignes), enregistré avant son commit"""
+
+    def _import_rows(self, Project, plan, rows, refs, start_row=2):
+        """Importe les lignes (tuples de valeurs) du classeur, à partir de la ligne start_row, selon
+        le plan de _column_plan ; refs vient de _resolve_references : aucune requête par
+        cellule de référence.
+
+        Les projets sont écrits par blocs (paramètre odoo_sync_from_odoo11.import_chunk_size),
+        validés (commit) bloc par bloc : une erreur tardive n'annule pas les blocs précédents.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        chunk_size = int(ICP.get_param('odoo_sync_from_odoo11.import_chunk_size', 500))
+        chunk = []
+        chunk_names = set()
+        log = []
+        error_count = 0
+        row_index = first_row = start_row - 1
+        for row_index, row in enumerate(rows, start=start_row):
             project_name = None
             try:
                 values = {}
                 
-                for excel_header, odoo_field in COLUMN_MAPPING.items():
-                    if excel_header not in headers:
-                        continue 
-                        
-                    col_index = headers.index(excel_header) 
-                    cell_value = row[col_index].value
-                    
+                for col_index, odoo_field, ref_kind, convert in plan:
+                    # Les cellules vides en fin de ligne ne sont pas lues en mode flux
+                    cell_value = row[col_index] if col_index < len(row) else None
                     if cell_value is None or str(cell_value).strip() == '':
                         continue
-                    
-                    _logger.debug(f"Traitement: {excel_header} -> {odoo_field} = {cell_value}")
-                    
-                    # Champs Many2one sur res.users (PM, AM, Presales, SC)
-                    if odoo_field in ['user_id', 'am', 'presales', 'sc']:
-                        user_id = self._find_or_create_user(cell_value)
-                        if user_id:
-                            values[odoo_field] = user_id
-
-                    # Many2one sur res.country (Pays)
-                    elif odoo_field == 'pays':
-                        country_id = self._find_or_create_misc('res.country', cell_value)
-                        if country_id:
-                            values[odoo_field] = country_id
-
-                    # Champ date (Date IN)
-                    elif odoo_field == 'date_in':
-                        if isinstance(cell_value, datetime):
-                            values[odoo_field] = cell_value.strftime('%Y-%m-%d')
-                        elif isinstance(cell_value, str):
-                            try:
-                                # Essayer différents formats de date
-                                for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y']:
-                                    try:
-                                        values[odoo_field] = datetime.strptime(cell_value, fmt).strftime('%Y-%m-%d')
-                                        break
-                                    except ValueError:
-                                        continue
-                            except ValueError:
-                                _logger.warning(f"Format de date invalide pour {cell_value}")
-
-                    # Many2one sur res.partner (Customer)
-                    elif odoo_field == 'partner_id':
-                        partner_id = self._find_or_create_partner(cell_value)
-                        if partner_id:
-                            values[odoo_field] = partner_id
-                            
-                    # Many2one sur res.partner.category (Secteur)
-                    elif odoo_field == 'secteur':
-                        category_id = self._find_or_create_misc('res.partner.category', cell_value)
-                        if category_id:
-                            values[odoo_field] = category_id
-                            
-                    # Champs de sélection
-                    elif odoo_field in ['nature', 'bu', 'domaine', 'revenue_type', 'circuit', 'etat_projet']:
-                        formatted_value = self._format_value(odoo_field, cell_value)
-                        if formatted_value:
-                            values[odoo_field] = formatted_value
-                            
-                    # Champs monétaires (CAS)
-                    elif odoo_field in ['cas_build', 'cas_run', 'cas_train', 'cas_sw', 'cas_hw', 'cas']:
-                        try:
-                            if isinstance(cell_value, (int, float)):
-                                values[odoo_field] = float(cell_value)
-                            elif isinstance(cell_value, str):
-                                cleaned_value = re.sub(r'[^\d\.\,]', '', str(cell_value))
-                                values[odoo_field] = float(cleaned_value.replace(',', '.') or 0)
-                            else:
-                                values[odoo_field] = 0.0
-                        except (ValueError, TypeError) as e:
-                            _logger.warning(f"Valeur monétaire invalide pour {cell_value}: {e}")
-                            values[odoo_field] = 0.0
-                            
-                    # Champ texte (Nom)
-                    elif odoo_field == 'name':
-                        project_name = str(cell_value).strip()
-                        values[odoo_field] = project_name
-                        
-                    # Champs de texte simples
-                    elif odoo_field in ['description', 'cat_recurrent']:
-                        values[odoo_field] = str(cell_value).strip()
+                    converted = convert(cell_value, refs)
+                    if converted is not None:
+                        values[odoo_field] = converted
+                project_name = values.get('name')
 
                 if not project_name:
-                    self.error_count += 1
-                    self.import_log += _("Ligne %d: Nom du projet manquant, ligne ignorée.\n" % row_index)
+                    error_count += 1
+                    log.append(_("Ligne %d: Nom du projet manquant, ligne ignorée.\n" % row_index))
                     continue
 
-                # Recherche du projet existant
-                existing_project = Project.search([('name', '=', project_name)], limit=1)
-
-                # Opérations sur le projet
-                if existing_project and self.update_existing:
-                    existing_project.write(values)
-                    self.import_log += _("Ligne %d: Projet '%s' mis à jour.\n" % (row_index, project_name))
-                    self.success_count += 1
-                    _logger.info(f"Projet mis à jour: {project_name}")
-                    
-                elif not existing_project and self.create_missing:
-                    new_project = Project.create(values)
-                    self.import_log += _("Ligne %d: Projet '%s' créé.\n" % (row_index, project_name))
-                    self.success_count += 1
-                    _logger.info(f"Projet créé: {project_name} (ID: {new_project.id})")
-                else:
-                    self.import_log += _("Ligne %d: Projet '%s' ignoré (existe déjà et mise à jour désactivée).\n" % (row_index, project_name))
-                
             except Exception as e:
-                self.error_count += 1
+                error_count += 1
                 error_message = _("Erreur ligne %d pour projet '%s': %s" % (row_index, project_name or "N/A", str(e)))
                 _logger.error(error_message)
-                self.import_log += error_message + "\n"
-                
-        # Résumé final
-        self.import_log += "\n--- RÉSUMÉ ---\n"
-        self.import_log += _("Total Projets importés/mis à jour: %d\n" % self.success_count)
-        self.import_log += _("Total Erreurs: %d\n" % self.error_count)
-        self.import_log += _("Total Utilisateurs créés: %d\n" % self.created_users_count)
-        self.import_log += _("Total Clients créés: %d\n" % self.created_partners_count)
-        self.import_log += _("Total Catégories créées: %d\n" % self.created_categories_count)
+                log.append(error_message + "\n")
+                continue
 
-        _logger.info(f"Import terminé: {self.success_count} succès, {self.error_count} erreurs")
+            # Un projet présent deux fois dans un bloc : la seconde ligne s'applique après la première
+            if len(chunk) >= chunk_size or project_name in chunk_names:
+                self._flush_chunk(Project, chunk, log, error_count, row_index - 1, row_index - 1 - first_row)
+                chunk, chunk_names, log, error_count = [], set(), [], 0
+                first_row = row_index - 1
+            chunk.append((row_index, project_name, values))
+            chunk_names.add(project_name)
+        self._flush_chunk(Project, chunk, log, error_count, row_index, row_index - first_row)
+
+    def _flush_chunk(self, Project, chunk, log, error_count, last_row, row_count):
+        """Écrit un bloc de projets (lignes jusqu'à last_row), reporte journal, compteurs et
+        point de reprise, puis valide
+        """
+        success_count, upsert_errors = self._upsert_projects(Project, chunk, log)
+        self.write({
+            'import_log': (self.import_log or '') + ''.join(log),
+            'success_count': self.success_count + success_count,
+            'error_count': self.error_count + error_count + upsert_errors,
+        })
+        self._checkpoint(last_row, row_count)
+        self.env.cr.commit()
+        # Mémoire bornée : les projets des blocs validés quittent le cache
+        self.env.invalidate_all()
+
+    def _upsert_projects(self, Project, chunk, log):
+        """Crée ou met à jour les projets d'un bloc [(ligne, nom, valeurs)].
+
+        Une recherche pour tous les noms du bloc, un create() pour les nouveaux
+        projets et un write() par groupe de valeurs identiques. Retourne
+        (succès, erreurs) ; le journal des lignes est ajouté à log.
+        """
+        if not chunk:
+            return 0, 0
+        existing = {}
+        for project in Project.search([('name', 'in', list({name for index, name, values in chunk}))]):
+            existing.setdefault(project.name, project)
+
+        to_create = []
+        to_write = {}
+        for row_index, project_name, values in chunk:
+            project = existing.get(project_name)
+            if project and self.update_existing:
+                # Projet retrouvé par son nom : le nom n'est pas réécrit, et sans lui
+                # les lignes aux mêmes valeurs partagent un seul write()
+                items = tuple(sorted((key, value) for key, value in values.items() if key != 'name'))
+                to_write.setdefault(items, []).append((row_index, project_name, project.id))
+            elif not project and self.create_missing:
+                to_create.append((row_index, project_name, values))
+            else:
+                log.append(_("Ligne %d: Projet '%s' ignoré (existe déjà et mise à jour désactivée).\n" % (row_index, project_name)))
+
+        errors = self._run_grouped(to_create, lambda vals_list: Project.create(vals_list))
+        for row_index, project_name, values in to_create:
+            if row_index not in errors:
+                log.append(_("Ligne %d: Projet '%s' créé.\n" % (row_index, project_name)))
+        for items, targets in to_write.items():
+            values = dict(items)
+            write_errors = self._run_grouped(targets, lambda project_ids: Project.browse(project_ids).write(values))
+            for row_index, project_name, project_id in targets:
+                if row_index not in write_errors:
+                    log.append(_("Ligne %d: Projet '%s' mis à jour.\n" % (row_index, project_name)))
+            errors.update(write_errors)
+
+        for row_index, project_name, values in chunk:
+            if row_index in errors:
+                error_message = _("Erreur ligne %d pour projet '%s': %s" % (row_index, project_name, errors[row_index]))
+                _logger.error(error_message)
+                log.append(error_message + "\n")
+        success_count = len(to_create) + sum(len(targets) for targets in to_write.values()) - len(errors)
+        _logger.info(f"Bloc importé jusqu'à la ligne {chunk[-1][0]}: {success_count} projets créés/mis à jour, {len(errors)} erreurs")
+        return success_count, len(errors)
+
+    def _run_grouped(self, entries, func):
+        """Appelle func sur les arguments de toutes les entrées [(ligne, nom, argument)] dans un
+        savepoint ; s'il échoue, une entrée par savepoint. Retourne {ligne: erreur}.
+        """
+        if not entries:
+            return {}
+        try:
+            with self.env.cr.savepoint():
+                func([argument for row_index, name, argument in entries])
+            return {}
+        except Exception as e:
+            _logger.warning("Écriture groupée de %s projet(s) échouée (%s), repli ligne par ligne", len(entries), e)
+        errors = {}
+        for row_index, name, argument in entries:
+            try:
+                with self.env.cr.savepoint():
+                    func([argument])
+            except Exception as e:
+                errors[row_index] = str(e)
+        return errors
+
+
+class ProjectImportWizard(models.TransientModel):
+    _name = 'project.import.wizard'
+    _inherit = 'project.import.mixin'
+    _description = "Wizard d'import de projets depuis Excel"
+
+    job_id = fields.Many2one('project.import.job', string="Tâche d'import", readonly=True)
+    job_state = fields.Selection(related='job_id.state', string='État')
+    job_progress = fields.Float(related='job_id.progress', string='Progression')
+    job_processed_rows = fields.Integer(related='job_id.processed_rows', string='Lignes traitées')
+    job_total_rows = fields.Integer(related='job_id.total_rows', string='Lignes')
+    job_rows_per_sec = fields.Float(related='job_id.rows_per_sec', string='Lignes/s')
+    job_eta = fields.Char(related='job_id.eta', string='Fin estimée dans')
+
+    def _show_result_wizard(self):
+        """Affiche le wizard avec les résultats"""
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'project.import.wizard',
+            'view_mode': 'form',
+            'res_id': self.id,
+            'target': 'new',
+            'context': self.env.context,
+        }
+
+    def action_import_projects(self):
+        """Crée la tâche d'import en arrière-plan et affiche sa progression.
+
+        L'import s'exécute par cron, bloc par bloc, hors de la requête HTTP : un gros
+        fichier ne dépasse plus limit_time_real et reprend à son dernier bloc validé.
+        """
+        self.ensure_one()
+        self.job_id = self.env['project.import.job'].create({
+            'import_file': self.import_file,
+            'import_filename': self.import_filename,
+            'update_existing': self.update_existing,
+            'create_missing': self.create_missing,
+            'create_missing_records': self.create_missing_records,
+        })
+        self.env.ref('odoo_sync_from_odoo11.ir_cron_project_import_job').sudo()._trigger()
+        return self.action_refresh()
 
-        return self._show_result_wizard()
\ No newline at end of file
+    def action_refresh(self):
+        """Recopie journal et compteurs de la tâche sur le wizard"""
+        self.ensure_one()
+        job = self.job_id
+        self.write({
+            'import_log': job.import_log,
+            'success_count': job.success_count,
+            'error_count': job.error_count,
+            'created_users_count': job.created_users_count,
+            'created_partners_count': job.created_partners_count,
+            'created_categories_count': job.created_categories_count,
+        })
+        return self._show_result_wizard()
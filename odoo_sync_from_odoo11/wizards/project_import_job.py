@@ -0,0 +1,128 @@
+from odoo import models, fields, api
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class ProjectImportJob(models.Model):
+    """Import de projets exécuté en arrière-plan par cron.
+
+    Chaque bloc de lignes est validé avec le point de reprise (dernière ligne
+    traitée) : après un arrêt du worker ou un dépassement de limit_time_real_cron,
+    la tâche reprend au bloc suivant, sans refaire les lignes déjà validées.
+    Elle s'exécute avec les droits et la société de l'utilisateur qui l'a demandée.
+    """
+    _name = 'project.import.job'
+    _inherit = 'project.import.mixin'
+    _description = "Tâche d'import de projets"
+    _order = 'id desc'
+    _rec_name = 'import_filename'
+
+    state = fields.Selection([
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'En échec'),
+    ], string='État', default='pending', required=True, index=True)
+    user_id = fields.Many2one('res.users', string='Demandé par', default=lambda self: self.env.user, readonly=True)
+    company_id = fields.Many2one('res.company', string='Société', default=lambda self: self.env.company, readonly=True)
+    checkpoint_row = fields.Integer(string='Dernière ligne validée', default=1, readonly=True)
+    total_rows = fields.Integer(string='Lignes', readonly=True)
+    processed_rows = fields.Integer(string='Lignes traitées', readonly=True)
+    run_rows = fields.Integer(string="Lignes traitées depuis la reprise", readonly=True)
+    run_started = fields.Datetime(string='Reprise le', readonly=True)
+    heartbeat = fields.Datetime(string='Dernier bloc validé', readonly=True)
+    attempt_count = fields.Integer(
+        string='Exécutions sans progression', readonly=True,
+        help="Exécutions interrompues avant de valider un bloc ; remis à zéro à chaque bloc validé",
+    )
+    last_error = fields.Text(string='Dernière erreur', readonly=True)
+    progress = fields.Float(string='Progression', compute='_compute_progress')
+    rows_per_sec = fields.Float(string='Lignes/s', compute='_compute_progress')
+    eta = fields.Char(string='Fin estimée dans', compute='_compute_progress')
+
+    @api.depends('processed_rows', 'total_rows', 'run_rows', 'run_started', 'heartbeat', 'state')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = 100.0 * job.processed_rows / job.total_rows if job.total_rows else 0.0
+            elapsed = (job.heartbeat - job.run_started).total_seconds() if job.heartbeat and job.run_started else 0
+            job.rows_per_sec = job.run_rows / elapsed if elapsed > 0 else 0.0
+            remaining = max(job.total_rows - job.processed_rows, 0)
+            if job.state == 'running' and job.rows_per_sec and remaining:
+                job.eta = str(timedelta(seconds=int(remaining / job.rows_per_sec)))
+            else:
+                job.eta = False
+
+    def _set_total_rows(self, row_count):
+        self.total_rows = row_count
+
+    def _checkpoint(self, last_row, row_count):
+        self.write({
+            'checkpoint_row': last_row,
+            'processed_rows': self.processed_rows + row_count,
+            'run_rows': self.run_rows + row_count,
+            'heartbeat': fields.Datetime.now(),
+            # Seules les exécutions sans bloc validé mènent à l'abandon
+            'attempt_count': 0,
+        })
+
+    @api.model
+    def _cron_run_jobs(self):
+        """Exécute les tâches en attente, et reprend celles dont le worker s'est arrêté.
+
+        Une tâche « en cours » sans bloc validé depuis
+        odoo_sync_from_odoo11.import_stale_minutes est tenue pour interrompue ;
+        après odoo_sync_from_odoo11.import_max_attempts exécutions de suite sans bloc
+        validé, elle passe en échec. Une tâche longue qui progresse n'est jamais abandonnée.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        stale_minutes = int(ICP.get_param('odoo_sync_from_odoo11.import_stale_minutes', 15))
+        max_attempts = int(ICP.get_param('odoo_sync_from_odoo11.import_max_attempts', 5))
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM project_import_job
+                 WHERE state = 'pending'
+                    OR (state = 'running' AND COALESCE(heartbeat, run_started) < %s)
+                 ORDER BY id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+            """, (fields.Datetime.now() - timedelta(minutes=stale_minutes),))
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            job = self.browse(row[0])
+            if job.attempt_count >= max_attempts:
+                job.write({'state': 'failed', 'last_error': "Interrompue %s fois sans progresser, abandonnée" % job.attempt_count})
+                self.env.cr.commit()
+                continue
+            # Droits et société du demandeur, pas ceux de l'utilisateur du cron
+            job.with_user(job.user_id or self.env.user).with_company(job.company_id or self.env.company)._run()
+
+    def _run(self):
+        """Exécute la tâche à partir de son point de reprise"""
+        self.ensure_one()
+        if self.checkpoint_row > 1:
+            _logger.info("Reprise de l'import %s après la ligne %s", self.import_filename, self.checkpoint_row)
+        self.write({
+            'state': 'running',
+            'attempt_count': self.attempt_count + 1,
+            'run_started': fields.Datetime.now(),
+            'run_rows': 0,
+            'heartbeat': False,
+            'import_log': self.import_log or '',
+        })
+        self.env.cr.commit()
+        try:
+            self._run_import(start_row=self.checkpoint_row + 1)
+            self.write({'state': 'done', 'last_error': False})
+        except Exception as e:
+            self.env.cr.rollback()
+            _logger.exception("Import %s en échec après la ligne %s : %s", self.import_filename, self.checkpoint_row, e)
+            self.write({'state': 'failed', 'last_error': str(e)})
+        self.env.cr.commit()
+
+    def action_resume(self):
+        """Relance les tâches en échec à partir de leur dernier bloc validé"""
+        self.filtered(lambda job: job.state == 'failed').write({'state': 'pending', 'attempt_count': 0})
+        self.env.ref('odoo_sync_from_odoo11.ir_cron_project_import_job').sudo()._trigger()